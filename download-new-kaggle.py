@@ -3,296 +3,56 @@
 新しいKaggle iHerbデータセットをダウンロード・処理
 """
 
-import os
-import zipfile
-import pandas as pd
-from datetime import datetime
-
-def check_and_process_new_dataset():
-    """新しいデータセットファイルをチェック・処理"""
-    
-    print("🔍 新しいデータセットファイルを検索中...")
-    
-    # 現在のディレクトリのZIPファイルをすべて確認
-    zip_files = [f for f in os.listdir('.') if f.endswith('.zip')]
-    
-    if not zip_files:
-        print("❌ ZIPファイルが見つかりません")
-        print("\n📥 手動ダウンロード手順:")
-        print("1. https://www.kaggle.com/datasets/crawlfeeds/iherb-products-dataset")
-        print("2. 'Download'ボタンをクリック")
-        print("3. ダウンロードしたZIPファイルを以下に保存:")
-        print(f"   {os.getcwd()}/")
-        print("4. このスクリプトを再実行")
-        return False
-    
-    # 最新のZIPファイルを選択
-    zip_files.sort(key=lambda x: os.path.getmtime(x), reverse=True)
-    latest_zip = zip_files[0]
-    file_size = os.path.getsize(latest_zip)
-    
-    print(f"📦 ZIPファイル: {latest_zip}")
-    print(f"📏 ファイルサイズ: {file_size:,} bytes ({file_size/1024/1024:.1f} MB)")
-    
-    # サイズチェック
-    if file_size < 2 * 1024 * 1024:  # 2MB未満
-        print("⚠️ ファイルサイズが小さすぎます")
-        print("💡 実際のiHerbデータセットは数MBあるはずです")
-        print("💡 正しいデータセットを再ダウンロードしてください")
-    
-    # ZIP展開
-    print(f"📂 {latest_zip} を展開中...")
-    try:
-        with zipfile.ZipFile(latest_zip, 'r') as zip_ref:
-            file_list = zip_ref.namelist()
-            print(f"📋 ZIP内容: {file_list}")
-            zip_ref.extractall('.')
-        
-        # CSVファイルを探す
-        csv_files = [f for f in os.listdir('.') if f.endswith('.csv') and 'iherb' in f.lower()]
-        if not csv_files:
-            csv_files = [f for f in os.listdir('.') if f.endswith('.csv')]
-        
-        if csv_files:
-            csv_file = csv_files[0]
-            csv_size = os.path.getsize(csv_file)
-            print(f"✅ CSVファイル: {csv_file}")
-            print(f"📏 CSVサイズ: {csv_size:,} bytes ({csv_size/1024/1024:.1f} MB)")
-            return csv_file
-        else:
-            print("❌ CSVファイルが見つかりません")
-            return False
-            
-    except Exception as e:
-        print(f"❌ ZIP展開エラー: {e}")
-        return False
-
-def process_real_iherb_data(csv_file):
-    """実際のiHerbデータを処理"""
-    
-    print(f"📊 {csv_file} を詳細分析中...")
-    
-    try:
-        # まずファイルサイズと行数を推定
-        line_count = 0
-        with open(csv_file, 'r', encoding='utf-8') as f:
-            for line in f:
-                line_count += 1
-                if line_count > 100000:  # 10万行でカウント停止
-                    break
-        
-        print(f"📏 推定行数: {line_count:,}行以上")
-        
-        # データ読み込み（大きなファイルの場合は分割読み込み）
-        print("📖 データ読み込み中...")
-        
-        if line_count > 50000:
-            # 大きなファイルの場合は最初の50000行だけ読み込み
-            df = pd.read_csv(csv_file, nrows=50000, encoding='utf-8')
-            print(f"⚠️ 大きなファイルのため最初の{len(df):,}行のみ処理")
-        else:
-            df = pd.read_csv(csv_file, encoding='utf-8')
-        
-        print(f"✅ データ読み込み完了: {len(df):,}行, {len(df.columns)}列")
-        
-        # カラム詳細分析
-        print(f"\n📋 全カラム詳細:")
-        for i, col in enumerate(df.columns, 1):
-            non_null_count = df[col].notna().sum()
-            unique_count = df[col].nunique()
-            print(f"  {i:2d}. {col:<25} (非空: {non_null_count:,}, ユニーク: {unique_count:,})")
-        
-        # サンプルデータ表示
-        print(f"\n📄 データサンプル:")
-        print(df.head(3).to_string(max_cols=8))
-        
-        # サプリメント商品の抽出
-        print(f"\n🔍 サプリメント関連商品を抽出中...")
-        
-        supplement_keywords = [
-            'vitamin', 'mineral', 'supplement', 'capsule', 'tablet', 'softgel',
-            'omega', 'probiotic', 'protein', 'amino', 'magnesium', 'calcium',
-            'zinc', 'iron', 'b12', 'b-12', 'multivitamin', 'fish oil'
-        ]
-        
-        supplement_mask = pd.Series([False] * len(df))
-        
-        # 全テキストカラムから検索
-        text_columns = [col for col in df.columns if df[col].dtype == 'object']
-        print(f"🔍 検索対象カラム: {text_columns}")
-        
-        for col in text_columns:
-            for keyword in supplement_keywords:
-                mask = df[col].astype(str).str.lower().str.contains(keyword, na=False, regex=False)
-                supplement_mask |= mask
-        
-        supplement_df = df[supplement_mask].copy()
-        print(f"✅ サプリメント商品: {len(supplement_df):,}件")
-        
-        # ブランド分析
-        brand_columns = [col for col in df.columns if 'brand' in col.lower()]
-        if brand_columns:
-            brand_col = brand_columns[0]
-            print(f"\n📊 ブランド分析 ({brand_col}):")
-            brand_stats = supplement_df[brand_col].value_counts().head(30)
-            for brand, count in brand_stats.items():
-                print(f"  {brand}: {count:,}件")
-        
-        return supplement_df
-        
-    except Exception as e:
-        print(f"❌ データ処理エラー: {e}")
-        return None
-
-def generate_massive_supplement_sql(df):
-    """大規模サプリメントデータベースSQL生成"""
-    
-    print(f"🔄 大規模SQL生成中... ({len(df):,}件)")
-    
-    # カラムマッピング
-    title_cols = [col for col in df.columns if any(word in col.lower() for word in ['title', 'name', 'product'])]
-    brand_cols = [col for col in df.columns if 'brand' in col.lower()]
-    upc_cols = [col for col in df.columns if any(word in col.lower() for word in ['upc', 'barcode', 'code'])]
-    
-    title_col = title_cols[0] if title_cols else None
-    brand_col = brand_cols[0] if brand_cols else None
-    upc_col = upc_cols[0] if upc_cols else None
-    
-    print(f"📋 使用カラム:")
-    print(f"  商品名: {title_col}")
-    print(f"  ブランド: {brand_col}")
-    print(f"  UPC: {upc_col}")
-    
-    processed_products = []
-    
-    for idx, row in df.iterrows():
-        try:
-            # 商品名
-            product_name = str(row[title_col]) if title_col and pd.notna(row[title_col]) else f"iHerb Product {idx+1}"
-            if len(product_name) > 250:
-                product_name = product_name[:250] + "..."
-            
-            # ブランド
-            brand = str(row[brand_col]) if brand_col and pd.notna(row[brand_col]) else "Unknown"
-            if len(brand) > 100:
-                brand = brand[:100]
-            
-            # UPC
-            upc = str(row[upc_col]) if upc_col and pd.notna(row[upc_col]) else ""
-            
-            # DSLD ID
-            if upc and upc.isdigit() and len(upc) >= 8:
-                dsld_id = f"DSLD_{upc}"
-            else:
-                dsld_id = f"DSLD_IHERB_{idx+1:08d}"
-            
-            # カテゴリ判定
-            name_lower = product_name.lower()
-            if any(word in name_lower for word in ['vitamin c', 'ascorbic']):
-                category = 'vitamins'
-            elif any(word in name_lower for word in ['vitamin d', 'vitamin e', 'vitamin k', 'vitamin b', 'multivitamin']):
-                category = 'vitamins'
-            elif any(word in name_lower for word in ['magnesium', 'calcium', 'zinc', 'iron', 'mineral']):
-                category = 'minerals'
-            elif any(word in name_lower for word in ['omega', 'dha', 'epa', 'fish oil']):
-                category = 'fatty_acids'
-            elif any(word in name_lower for word in ['protein', 'amino', 'whey']):
-                category = 'proteins'
-            elif any(word in name_lower for word in ['probiotic']):
-                category = 'probiotics'
-            else:
-                category = 'supplements'
-            
-            processed_products.append({
-                'dsld_id': dsld_id,
-                'name_en': product_name,
-                'name_ja': product_name,
-                'brand': brand,
-                'serving_size': '1 serving',
-                'category': category
-            })
-            
-        except Exception as e:
-            print(f"⚠️ 行 {idx} エラー: {e}")
-            continue
-    
-    print(f"✅ {len(processed_products):,}件の商品を処理完了")
-    
-    # SQL生成
-    sql_content = f"""-- iHerb全サプリメントデータベース（Kaggleデータセット）
--- 処理日時: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
--- 総商品数: {len(processed_products):,}件
-
--- 既存データを完全削除
-DELETE FROM user_supplements;
-DELETE FROM supplement_nutrients;
-DELETE FROM supplements;
-DELETE FROM nutrients;
-
--- 全サプリメント商品を投入（バッチ処理）
-"""
-    
-    # バッチ処理で分割
-    batch_size = 1000
-    total_batches = (len(processed_products) + batch_size - 1) // batch_size
-    
-    for batch_num in range(total_batches):
-        start_idx = batch_num * batch_size
-        end_idx = min((batch_num + 1) * batch_size, len(processed_products))
-        batch_products = processed_products[start_idx:end_idx]
-        
-        sql_content += f"\n-- バッチ {batch_num + 1}/{total_batches}\n"
-        sql_content += "INSERT INTO supplements (dsld_id, name_en, name_ja, brand, serving_size, category) VALUES\n"
-        
-        for i, product in enumerate(batch_products):
-            name_en = product['name_en'].replace("'", "''")
-            name_ja = product['name_ja'].replace("'", "''")
-            brand = product['brand'].replace("'", "''")
-            
-            sql_content += f"('{product['dsld_id']}', '{name_en}', '{name_ja}', '{brand}', '{product['serving_size']}', '{product['category']}')"
-            
-            if i < len(batch_products) - 1:
-                sql_content += ",\n"
-            else:
-                sql_content += ";\n"
-    
-    # 特別商品追加
-    sql_content += """
--- ユーザー検索用特別商品
-INSERT INTO supplements (dsld_id, name_en, name_ja, brand, serving_size, category) VALUES
-('DSLD_19121619', 'NOW Foods Vitamin C-1000 Sustained Release', 'NOW Foods ビタミンC-1000 徐放性', 'NOW Foods', '1 tablet', 'vitamins');
+from ingest import Pipeline, BrandStats, sql_sink
+from ingest.cli import sql_options, schema_store
+from ingest.sinks import SPECIAL_PRODUCTS_SQL
+from ingest.frames import FrameSupplementFilter, FrameNormalize, FrameRows
+from ingest.sources.kaggle_csv import KaggleCsvSource, find_latest_zip
 
+FOOTER = SPECIAL_PRODUCTS_SQL + """
 -- データ確認
 SELECT 'iHerb大規模データベース構築完了' as status;
 SELECT COUNT(*) as total_products FROM supplements;
 SELECT brand, COUNT(*) as count FROM supplements GROUP BY brand ORDER BY count DESC LIMIT 50;
 """
-    
-    with open('import_massive_iherb.sql', 'w', encoding='utf-8') as f:
-        f.write(sql_content)
-    
-    print("✅ import_massive_iherb.sql を生成完了")
-    return len(processed_products)
+
+
+def build_pipeline(dataset, member=None, schema=None, **options):
+    """最新Kaggle CSV → サプリ抽出 → 整形 → SQL(全行をチャンク単位で処理)"""
+    source = KaggleCsvSource(dataset, member, name_limit=250, brand_limit=100, schema=schema)
+    return Pipeline(
+        source,
+        transforms=[FrameSupplementFilter(), FrameNormalize(source), FrameRows(), BrandStats(top=30)],
+        sinks=[
+            sql_sink('import_massive_iherb.sql',
+                     'iHerb全サプリメントデータベース（Kaggleデータセット）', footer=FOOTER, **options),
+        ],
+    )
+
 
 if __name__ == "__main__":
     print("🚀 新しいKaggle iHerbデータセット処理開始")
     print("=" * 80)
-    
+
+    # --copy: COPY形式(psql用) / --upsert: 差分投入 / --tombstone: 消えた商品を廃番扱い
+    # --snapshot: 前回の実行から変わった商品だけ出力
+    # --reinfer-schema: 保存済みのカラムのマッピング(ingest_schema.json)を使わずに推定し直す
+    options, args = sql_options()
+
     # 1. 新しいデータセット確認
-    csv_file = check_and_process_new_dataset()
-    if not csv_file:
+    # 引数でZIP内のCSVメンバーを明示指定可能
+    member = args[0] if args else None
+    dataset = find_latest_zip()
+    if not dataset:
         exit(1)
-    
-    # 2. データ処理
-    df = process_real_iherb_data(csv_file)
-    if df is None or len(df) == 0:
+
+    # 2. 抽出・SQL生成
+    total_count = build_pipeline(dataset, member, schema_store(), **options).run()
+    if not total_count:
         print("❌ サプリメント商品が見つかりませんでした")
         exit(1)
-    
-    # 3. SQL生成
-    total_count = generate_massive_supplement_sql(df)
-    
+
     print("=" * 80)
     print(f"🎉 処理完了! {total_count:,}件のサプリメント商品をSQL化")
     print("📁 生成ファイル: import_massive_iherb.sql")
-    print("📊 これで数万件のサプリメントデータベースが完成！")
\ No newline at end of file
+    print("📊 これで数万件のサプリメントデータベースが完成！")
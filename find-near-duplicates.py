@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+取り込み結果のCSVをまたいで、名前とブランドが近い重複商品を検出
+(MinHash + LSH。バーコードのない商品どうしも名前でつなぐ)
+"""
+
+import csv
+import os
+import sys
+
+from ingest import CsvSink
+from ingest.neardup import MinHashLSH, NearDuplicates, THRESHOLD
+from ingest.schema import is_barcode
+
+DEFAULT_INPUTS = ['all_now_foods_products.csv', 'iherb_json_products.csv', 'kaggle_iherb_supplements.csv']
+
+CLUSTERS_PATH = 'near_duplicate_clusters.csv'
+DEDUPLICATED_PATH = 'deduplicated_products.csv'
+
+# 同じソース内の組も重複とみなす
+SAME_SOURCE_FLAG = '--same-source'
+THRESHOLD_FLAG = '--threshold='
+
+BARCODE_COLUMNS = ('barcode', 'upc')
+
+
+def quality(row):
+    """代表に選ぶ優先度(有効なバーコードがあるか、埋まっている項目の数)"""
+    barcode = any(is_barcode(row.get(column) or '') for column in BARCODE_COLUMNS)
+    return 100 * barcode + sum(bool(value) for value in row.values())
+
+
+def read_rows(paths):
+    """(ソース名, 行)"""
+    for path in paths:
+        source = os.path.basename(path)
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                yield source, row
+
+
+if __name__ == "__main__":
+    print("🚀 重複商品の検出開始")
+    print("=" * 80)
+
+    argv = sys.argv[1:]
+    same_source = SAME_SOURCE_FLAG in argv
+    threshold = THRESHOLD
+    paths = []
+    for arg in argv:
+        if arg.startswith(THRESHOLD_FLAG):
+            threshold = float(arg[len(THRESHOLD_FLAG):])
+        elif arg != SAME_SOURCE_FLAG:
+            paths.append(arg)
+    paths = paths or [path for path in DEFAULT_INPUTS if os.path.exists(path)]
+    if not paths:
+        print(f"❌ 入力CSVがありません: {', '.join(DEFAULT_INPUTS)}")
+        exit(1)
+
+    # 1. 読み込み
+    finder = NearDuplicates(MinHashLSH(threshold=threshold))
+    rows = []
+    for source, row in read_rows(paths):
+        finder.add(row.get('name_en'), row.get('brand'), quality(row), None if same_source else source)
+        rows.append((source, row))
+        if len(rows) % 100000 == 0:
+            print(f"⏳ {len(rows):,}件 読み込み")
+    print(f"📊 {len(rows):,}件 ({len(paths)}ファイル)")
+
+    # 2. クラスタリング
+    canonical = finder.find()
+    finder.report()
+
+    # 3. 書き出し
+    clusters = CsvSink(CLUSTERS_PATH, ['cluster', 'is_canonical', 'source', 'dsld_id', 'brand', 'name_en'])
+    clusters.open()
+    for head, members in finder.clusters():
+        for member in members:
+            source, row = rows[member]
+            clusters.write({
+                'cluster': rows[head][1].get('dsld_id'), 'is_canonical': int(member == head), 'source': source,
+                **row,
+            })
+    clusters.finish()
+    clusters.close()
+
+    deduplicated = CsvSink(DEDUPLICATED_PATH, ['source', 'dsld_id', 'name_en', 'name_ja', 'brand',
+                                               'serving_size', 'category', 'barcode', 'upc', 'duplicates'])
+    duplicates = {}
+    for row, head in enumerate(canonical):
+        if row != head:
+            duplicates.setdefault(int(head), []).append(rows[row][1].get('dsld_id'))
+    deduplicated.open()
+    for row, head in enumerate(canonical):
+        if row == head:
+            source, record = rows[row]
+            deduplicated.write({'source': source, **record, 'duplicates': ' '.join(duplicates.get(row, ()))})
+    deduplicated.finish()
+    deduplicated.close()
+
+    print("=" * 80)
+    print("\n📁 生成ファイル:")
+    print(f"  - {CLUSTERS_PATH} (重複クラスタ。is_canonical=1 が代表)")
+    print(f"  - {DEDUPLICATED_PATH} (重複を除いた商品。duplicates は統合した商品の dsld_id)")
@@ -0,0 +1,22 @@
+"""
+サプリメント商品データ取り込みパイプライン
+Source → Transform → Sink をジェネレータで連結して定数メモリで処理する
+"""
+
+from .pipeline import Source, Transform, Sink, Pipeline
+from .records import Product
+from .transforms import SupplementFilter, Normalize, Tap, BrandStats
+from .sinks import SqlInsertSink, SqlCopySink, sql_sink, CsvSink
+from .classify import classify_category
+from .brands import normalize_brand
+from .keywords import SUPPLEMENT_KEYWORDS
+
+__all__ = [
+    'Source', 'Transform', 'Sink', 'Pipeline',
+    'Product',
+    'SupplementFilter', 'Normalize', 'Tap', 'BrandStats',
+    'SqlInsertSink', 'SqlCopySink', 'sql_sink', 'CsvSink',
+    'classify_category',
+    'normalize_brand',
+    'SUPPLEMENT_KEYWORDS',
+]
@@ -0,0 +1,622 @@
+"""
+ベンチマーク
+
+使い方:
+  python -m ingest.bench matcher [JSONまたはZIPのパス] [繰り返し回数]
+  python -m ingest.bench mask [CSVまたはZIPのパス] [倍率]
+  python -m ingest.bench normalize [CSVまたはZIPのパス] [倍率]
+  python -m ingest.bench sql [JSONまたはZIPのパス] [倍率]
+  python -m ingest.bench records [JSONまたはZIPのパス] [倍率]
+  python -m ingest.bench parallel [JSONまたはZIPのパス] [倍率] [最大プロセス数]   (上限の見積もりと1〜CPUコア数の実測)
+  python -m ingest.bench brands [JSONまたはZIPのパス] [件数]
+  python -m ingest.bench neardup [件数]
+  python -m ingest.bench datacache [CSVまたはZIPのパス] [JSONまたはZIPのパス]   (pyarrowが必要)
+  python -m ingest.bench load <接続URL> [JSONまたはZIPのパス] [倍率]   (psqlとローカルPostgresが必要)
+  python -m ingest.bench fetch [キーワード数] [キーワードあたりの件数]   (ローカルのスタブサーバーを使用)
+"""
+
+import sys
+import time
+from contextlib import contextmanager
+
+from .classify import CATEGORY_RULES
+from .keywords import SUPPLEMENT_KEYWORDS
+from .matcher import KeywordMatcher, ahocorasick
+
+
+def timed(func, repeat):
+    """func を repeat 回実行した1回あたりの秒数"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def bench_matcher(path='archive.zip', repeat=5):
+    """旧来の `keyword in text` ループとKeywordMatcherを比較"""
+    from .jsonstream import iter_products
+    from .transforms import product_text
+
+    texts = [product_text(product) for product in iter_products(path)]
+    keywords = list(dict.fromkeys(
+        SUPPLEMENT_KEYWORDS + [word for _, words in CATEGORY_RULES for word in words]
+    ))
+    matcher = KeywordMatcher(keywords, use_automaton=False)
+    print(f"📊 {len(texts):,}件 / キーワード {len(keywords)}個 / 平均 {sum(map(len, texts)) // len(texts):,}文字")
+
+    results = [
+        ('any(keyword in text) ループ', lambda: [any(k in t for k in keywords) for t in texts]),
+        ('KeywordMatcher.search', lambda: [matcher.search(t) for t in texts]),
+        ('[keyword for keyword if in text] ループ', lambda: [{k for k in keywords if k in t} for t in texts]),
+        ('KeywordMatcher.find (包含木)', lambda: [matcher.find(t) for t in texts]),
+    ]
+    if ahocorasick is not None:
+        automaton = KeywordMatcher(keywords, use_automaton=True)
+        results.append(('KeywordMatcher.find (オートマトン)', lambda: [automaton.find(t) for t in texts]))
+    for label, func in results:
+        seconds = timed(func, repeat)
+        print(f"  {label:<40} {seconds * 1000:8.1f} ms  ({seconds / len(texts) * 1e6:.1f} µs/件)")
+
+    # 結果が一致することを確認
+    for text in texts:
+        assert matcher.find(text) == {k for k in keywords if k in text}
+
+
+def load_frame(path, scale=1):
+    """CSV(ZIP内も可)、またはJSONダンプをDataFrameとして読み込み scale 倍に複製"""
+    import pandas as pd
+    from .jsonstream import iter_products
+    from .sources.kaggle_csv import open_csv, has_csv_member
+
+    if path.endswith('.csv') or (path.endswith('.zip') and has_csv_member(path)):
+        with open_csv(path) as f:
+            df = pd.read_csv(f)
+    else:
+        df = pd.DataFrame(list(iter_products(path)))
+    return pd.concat([df] * scale, ignore_index=True) if scale > 1 else df
+
+
+# bench_mask の目標(旧ループ比)
+MASK_TARGET_SPEEDUP = 20
+
+
+def bench_mask(path='archive.zip', scale=8):
+    """旧来の「カラム×キーワードごとにlower+contains」とベクトル化マスクを比較"""
+    import pandas as pd
+    from .frames import supplement_mask, text_columns
+
+    df = load_frame(path, scale)
+    columns = text_columns(df)
+    print(f"📊 {len(df):,}行 / 文字列カラム {len(columns)}個 / キーワード {len(SUPPLEMENT_KEYWORDS)}個")
+
+    def legacy():
+        mask = pd.Series([False] * len(df))
+        for col in columns:
+            for keyword in SUPPLEMENT_KEYWORDS:
+                mask |= df[col].astype(str).str.lower().str.contains(keyword, na=False, regex=False)
+        return mask
+
+    start = time.perf_counter()
+    expected = legacy()
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    mask = supplement_mask(df)
+    seconds = time.perf_counter() - start
+
+    print(f"  旧ループ          {legacy_seconds * 1000:8.1f} ms")
+    print(f"  supplement_mask   {seconds * 1000:8.1f} ms  ({legacy_seconds / seconds:.1f}倍 / 目標 {MASK_TARGET_SPEEDUP}倍)")
+    assert (mask.to_numpy() == expected.to_numpy()).all()
+
+
+def bench_normalize(path='archive.zip', scale=40):
+    """iterrows + 行ごとの整形と、カラム演算による normalize_frame を比較"""
+    from .sources.kaggle_csv import KaggleCsvSource
+
+    df = load_frame(path, scale)
+    source = KaggleCsvSource(path)
+    source.detect(df)
+    print(f"📊 {len(df):,}行")
+
+    start = time.perf_counter()
+    expected = [source.normalize(row, i) for i, (_, row) in enumerate(df.iterrows())]
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    output = source.normalize_frame(df, 0)
+    seconds = time.perf_counter() - start
+
+    print(f"  iterrows + normalize   {legacy_seconds * 1000:8.1f} ms")
+    print(f"  normalize_frame        {seconds * 1000:8.1f} ms  ({legacy_seconds / seconds:.1f}倍)")
+    assert output.to_dict('records') == expected
+
+
+def bench_sql(path='archive.zip', scale=20):
+    """文字列の += 連結で組み立てる旧方式と、SqlInsertSinkの逐次書き出しを比較"""
+    import os
+    import tempfile
+    import tracemalloc
+    from .jsonstream import iter_products
+    from .sinks import SqlInsertSink, SUPPLEMENT_COLUMNS
+    from .sources.iherb_json import IherbJsonSource
+
+    source = IherbJsonSource(path)
+    records = [source.normalize(product, i) for i, product in enumerate(iter_products(path))] * scale
+    print(f"📊 {len(records):,}件")
+
+    def legacy(target):
+        sql_content = ""
+        for i in range(0, len(records), 1000):
+            sql_content += f"\n-- バッチ {i // 1000 + 1}\n"
+            sql_content += f"INSERT INTO supplements ({', '.join(SUPPLEMENT_COLUMNS)}) VALUES\n"
+            values = []
+            for record in records[i:i + 1000]:
+                values.append("(" + ", ".join(
+                    "'" + str(record[column]).replace("'", "''") + "'" for column in SUPPLEMENT_COLUMNS
+                ) + ")")
+            sql_content += ",\n".join(values) + ";\n"
+        with open(target, 'w', encoding='utf-8') as f:
+            f.write(sql_content)
+
+    def streaming(target):
+        sink = SqlInsertSink(target, 'bench', wipe_tables=())
+        sink.open()
+        for record in records:
+            sink.write(record)
+        sink.finish()
+        sink.close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, func in [('+= 連結', legacy), ('SqlInsertSink', streaming)]:
+            target = os.path.join(tmp, 'bench.sql')
+            tracemalloc.start()
+            start = time.perf_counter()
+            func(target)
+            seconds = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"  {label:<16} {seconds * 1000:8.1f} ms  ピーク {peak / 2**20:6.1f} MiB  "
+                  f"出力 {os.path.getsize(target) / 2**20:.1f} MiB")
+
+
+def bench_records(path='archive.zip', scale=100):
+    """整形済みレコードを dict で持つ旧方式と Product(__slots__ + intern)のメモリ使用量を比較"""
+    import tracemalloc
+    from .jsonstream import iter_products
+    from .sources.iherb_json import IherbJsonSource
+
+    def legacy(record):
+        # 旧方式: キー付きのdict。ブランド文字列はJSONから読んだレコードごとの別オブジェクト
+        row = dict(record)
+        row['brand'] = ''.join(record['brand'])
+        return row
+
+    def build(convert):
+        source = IherbJsonSource(path)
+        tracemalloc.start()
+        records = [
+            convert(source.normalize(product, i))
+            for _ in range(scale)
+            for i, product in enumerate(iter_products(path))
+        ]
+        retained = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return records, retained
+
+    dicts, legacy_bytes = build(legacy)
+    products, product_bytes = build(lambda record: record)
+    count = len(products)
+    print(f"📊 {count:,}件")
+    print(f"  dict                   {legacy_bytes / 2**20:8.1f} MB  ({legacy_bytes / count:.0f} B/件)")
+    print(f"  Product                {product_bytes / 2**20:8.1f} MB  ({product_bytes / count:.0f} B/件, "
+          f"{1 - product_bytes / legacy_bytes:.0%}減)")
+    assert dicts == products
+
+
+def bench_parallel(path='archive.zip', scale=20, max_workers=None):
+    """
+    フィルタ+整形を ParallelNormalize でプロセス数を変えて比較
+
+    親プロセスでの逐次処理(JSONの解析・チャンクの受け渡し)とワーカーでの処理の1件あたりの時間も測り、
+    max_workers(省略時は16とCPUコア数の大きい方)までの理論上のスループットを示す。
+    実測は省略時はCPUコア数まで、max_workers を指定すればそこまでのプロセス数で行う。
+    """
+    import os
+    import pickle
+    from .jsonstream import iter_products
+    from .parallel import CHUNK_SIZE, ParallelNormalize, chunked, normalize_chunk
+    from .sources.iherb_json import IherbJsonSource
+    from .transforms import SupplementFilter
+
+    cores = os.cpu_count() or 1
+    explicit = bool(max_workers)
+    max_workers = int(max_workers) if explicit else max(16, cores)
+
+    # JSONの解析(親プロセスで逐次)
+    start = time.perf_counter()
+    items = [product for _ in range(scale) for product in iter_products(path)]
+    parse = (time.perf_counter() - start) / len(items)
+    source = IherbJsonSource(path)
+    next(iter(source))
+    product_filter = SupplementFilter()
+    print(f"📊 {len(items):,}件 / CPU {cores}コア")
+
+    # チャンクの受け渡し(親: 商品のpickle・結果のunpickle / ワーカー: その逆)
+    chunks = [chunk for _, chunk in chunked(items, CHUNK_SIZE)]
+    start = time.perf_counter()
+    sent = [pickle.dumps(chunk) for chunk in chunks]
+    send = time.perf_counter() - start
+    start = time.perf_counter()
+    received = [pickle.loads(data) for data in sent]
+    work_start = time.perf_counter()
+    results = [normalize_chunk(chunk, 0, source, product_filter) for chunk in received]
+    work = time.perf_counter() - work_start
+    returned = [pickle.dumps(result) for result in results]
+    worker = time.perf_counter() - start
+    start = time.perf_counter()
+    for data in returned:
+        pickle.loads(data)
+    parent = (send + time.perf_counter() - start) / len(items) + parse
+    worker /= len(items)
+    work /= len(items)
+    print(f"  1件あたり: JSON解析 {parse * 1e6:.1f} µs / 受け渡し(親) {(parent - parse) * 1e6:.1f} µs"
+          f" / フィルタ+整形 {work * 1e6:.1f} µs (受け渡し込み {worker * 1e6:.1f} µs)")
+
+    # 逐次(解析 + フィルタ+整形)に対する、親プロセスとワーカーの遅い方で決まるスループットの上限
+    serial = parse + work
+    print(f"  理論上の上限 (解析込み):")
+    print(f"     1プロセス  {1 / serial:10,.0f}件/秒  (1.0倍, 逐次)")
+    workers = 2
+    while workers <= max_workers:
+        limit = max(parent, worker / workers)
+        bound = '親プロセス' if parent >= worker / workers else 'ワーカー'
+        print(f"    {workers:>2}プロセス  {1 / limit:10,.0f}件/秒  ({serial / limit:.1f}倍, {bound}律速)")
+        workers *= 2
+
+    # 実測(解析済みの商品でフィルタ+整形だけ。引数で最大プロセス数を指定すればコア数を超えても測る)
+    measured = max_workers if explicit else min(cores, max_workers)
+    print(f"  実測 (フィルタ+整形のみ、{measured}プロセスまで):")
+    expected = None
+    baseline = None
+    workers = 1
+    while workers <= measured:
+        stage = ParallelNormalize(source, product_filter, workers=workers)
+        start = time.perf_counter()
+        records = [dict(record) for record in stage(items)]
+        seconds = time.perf_counter() - start
+        baseline = baseline or seconds
+        print(f"    {workers:>2}プロセス  {seconds * 1000:8.1f} ms  ({len(items) / seconds:,.0f}件/秒, "
+              f"{baseline / seconds:.1f}倍)")
+        expected = expected or records
+        assert records == expected
+        workers *= 2
+
+
+def bench_brands(path='archive.zip', count=1000000):
+    """旧来の if/elif の部分文字列判定と、BrandIndex(メモ化あり)でのブランド正規化を比較"""
+    import random
+    from .brands import BrandIndex
+    from .jsonstream import iter_products
+
+    def legacy(brands):
+        brands_lower = brands.lower()
+        if 'now' in brands_lower:
+            return "NOW Foods"
+        elif 'nature' in brands_lower and 'way' in brands_lower:
+            return "Nature's Way"
+        elif 'solgar' in brands_lower:
+            return "Solgar"
+        elif 'garden of life' in brands_lower:
+            return "Garden of Life"
+        elif 'jarrow' in brands_lower:
+            return "Jarrow Formulas"
+        elif 'life extension' in brands_lower:
+            return "Life Extension"
+        elif 'thorne' in brands_lower:
+            return "Thorne"
+        elif 'pure encapsulations' in brands_lower:
+            return "Pure Encapsulations"
+        elif 'doctor' in brands_lower and 'best' in brands_lower:
+            return "Doctor's Best"
+        elif 'bluebonnet' in brands_lower:
+            return "Bluebonnet"
+        elif 'country life' in brands_lower:
+            return "Country Life"
+        elif 'swanson' in brands_lower:
+            return "Swanson"
+        elif 'source naturals' in brands_lower:
+            return "Source Naturals"
+        elif 'kirkland' in brands_lower:
+            return "Kirkland"
+        elif 'nature made' in brands_lower:
+            return "Nature Made"
+        elif 'centrum' in brands_lower:
+            return "Centrum"
+        elif 'one a day' in brands_lower:
+            return "One A Day"
+        return None
+
+    # 実データのブランドと、その表記揺れ(大文字小文字・会社形態・1文字の脱落)
+    rng = random.Random(0)
+    names = sorted({str(product.get('Brand')) for product in iter_products(path) if product.get('Brand')})
+    variants = []
+    for name in names:
+        dropped = rng.randrange(len(name))
+        variants += [name, name.lower(), name.upper(), f"{name} Inc.", name[:dropped] + name[dropped + 1:]]
+    raws = [rng.choice(variants) for _ in range(int(count))]
+    print(f"📊 {len(raws):,}件 ({len(set(raws)):,}種類 / 元のブランド {len(names):,}種類)")
+
+    start = time.perf_counter()
+    expected = [legacy(raw) for raw in raws]
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index = BrandIndex()
+    build_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    resolved = [index.lookup(raw) for raw in raws]
+    seconds = time.perf_counter() - start
+
+    print(f"  if/elif (部分文字列)     {legacy_seconds * 1000:8.1f} ms  一致 {sum(map(bool, expected)):,}件")
+    print(f"  BrandIndex               {seconds * 1000:8.1f} ms  ({legacy_seconds / seconds:.1f}倍)  "
+          f"一致 {sum(map(bool, resolved)):,}件  (索引の構築 {build_seconds * 1000:.1f} ms)")
+    index.report()
+    # 旧判定だけが一致させたブランド(部分文字列による誤判定の例)
+    wrong = sorted({(raw, old) for raw, old, new in zip(raws, expected, resolved) if old and not new})
+    print(f"  旧判定だけが一致: {len(wrong):,}種類 例: {wrong[:5]}")
+
+
+def bench_neardup(count=1000000, duplicate_rate=0.2):
+    """
+    合成した商品名(表記揺れの重複を混ぜたもの)で MinHash + LSH の重複検出を測る
+
+    全ペア比較は5,000件で測って件数の2乗で外挿する。
+    """
+    import random
+    import tracemalloc
+    import numpy as np
+    from .brands import BRAND_ALIASES
+    from .neardup import NearDuplicates, TokenTable
+
+    count = int(count)
+    rng = random.Random(0)
+    syllables = ['ba', 'ko', 'ri', 'mu', 'te', 'sa', 'lo', 'vi', 'ne', 'da', 'pu', 'zen', 'tor', 'gal']
+    vocabulary = sorted({''.join(rng.choice(syllables) for _ in range(rng.randint(2, 4))) for _ in range(5000)})
+    forms = ['Capsules', 'Tablets', 'Softgels', 'Powder', 'Liquid', 'Gummies']
+    brands = [brand for brand in BRAND_ALIASES if brand != 'Unknown']
+
+    # 元の商品と、別ソースの表記揺れ(語順・大文字小文字・区切り・1語の追加)
+    products = []  # (名前, ブランド, ソース, 商品番号)
+    originals = int(count / (1 + duplicate_rate))
+    for product in range(originals):
+        words = rng.sample(vocabulary, rng.randint(3, 5)) + [str(rng.choice((30, 60, 90, 120, 180))),
+                                                              rng.choice(forms)]
+        products.append((' '.join(w.capitalize() for w in words), rng.choice(brands), 0, product))
+    copies = [0] * originals
+    for _ in range(count - originals):
+        name, brand, _, product = products[rng.randrange(originals)]
+        # 同じ商品の重複はそれぞれ別のソースに(1つのソースには同じ商品は1件)
+        copies[product] += 1
+        words = name.split()
+        rng.shuffle(words)
+        if rng.random() < 0.5:
+            words.append(rng.choice(('Vegan', 'Organic', 'Extra')))
+        text = ', '.join(words)
+        products.append((text.upper() if rng.random() < 0.3 else text.lower(), brand, copies[product], product))
+    truth = np.array([product for _, _, _, product in products])
+    print(f"📊 {len(products):,}件 (元の商品 {originals:,}件 + 表記揺れの重複 {len(products) - originals:,}件)")
+
+    start = time.perf_counter()
+    finder = NearDuplicates()
+    for name, brand, source, _ in products:
+        finder.add(name, brand, source=source)
+    finder.flush()
+    add_seconds = time.perf_counter() - start
+    retained = sum(block.nbytes for block in finder.key_blocks + finder.hash_blocks + finder.length_blocks)
+    tracemalloc.start()
+    start = time.perf_counter()
+    canonical = finder.find()
+    find_seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    duplicated = finder.duplicated()
+    correct = int((duplicated & (truth[canonical] == truth)).sum())
+    expected = len(products) - originals
+    print(f"  登録 (単語分割・署名)   {add_seconds:8.2f} 秒  ({len(products) / add_seconds:,.0f}件/秒)  "
+          f"保持する配列 {retained / 2**20:,.0f} MB ({retained / len(products):.0f} B/件)")
+    print(f"  find (候補・確認・連結) {find_seconds:8.2f} 秒  ピークメモリ {peak / 2**20:,.0f} MB")
+    finder.report()
+    print(f"  適合率 {correct / max(duplicated.sum(), 1):.2%}  再現率 {correct / max(expected, 1):.2%}")
+
+    # 全ペア比較(単語集合のJaccard係数を同じ配列演算で全組について計算)
+    sample = 5000
+    table = TokenTable(np.concatenate(finder.hash_blocks), np.concatenate(finder.length_blocks))
+    left, right = np.triu_indices(sample, 1)
+    start = time.perf_counter()
+    for begin in range(0, len(left), 1000000):
+        table.jaccard(left[begin:begin + 1000000], right[begin:begin + 1000000])
+    seconds = (time.perf_counter() - start) * (len(products) / sample) ** 2
+    print(f"  全ペア比較(外挿)      {seconds:8.0f} 秒  ({seconds / 3600:,.0f} 時間, "
+          f"{len(products) * (len(products) - 1) // 2:,}組)")
+
+
+def bench_datacache(csv_path='iherb-products-dataset.zip', json_path='archive.zip'):
+    """CSV/JSONの解析と、解析済みキャッシュ(Arrow IPC)からの読み込みを比較"""
+    import tempfile
+    from .datacache import DatasetCache
+    from .sources.iherb_json import IherbJsonSource
+    from .sources.kaggle_csv import KaggleCsvSource
+
+    def consume(source):
+        start = time.perf_counter()
+        if isinstance(source, KaggleCsvSource):
+            rows = sum(len(df) for df in source.read())
+        else:
+            rows = sum(1 for _ in source.products())
+        return time.perf_counter() - start, rows
+
+    with tempfile.TemporaryDirectory() as root:
+        cache = DatasetCache(root)
+        for label, make in (
+            ('CSV', lambda cache: KaggleCsvSource(csv_path, progress=False, cache=cache)),
+            ('JSON', lambda cache: IherbJsonSource(json_path, cache=cache)),
+        ):
+            parsed, rows = consume(make(None))
+            consume(make(cache))  # キャッシュを作成
+            cached, cached_rows = consume(make(cache))
+            print(f"📊 {label} {rows:,}件")
+            print(f"  解析                   {parsed * 1000:8.1f} ms")
+            print(f"  キャッシュ読み込み     {cached * 1000:8.1f} ms  ({parsed / cached:.1f}倍)")
+            assert rows == cached_rows
+
+
+def bench_load(dsn, path='archive.zip', scale=20):
+    """ローカルPostgresへの投入時間を INSERT形式とCOPY形式で比較(psql -f で実行)"""
+    import os
+    import subprocess
+    import tempfile
+    from .jsonstream import iter_products
+    from .sinks import SqlInsertSink, SqlCopySink, SUPPLEMENT_COLUMNS
+    from .sources.iherb_json import IherbJsonSource
+
+    table = 'bench_supplements'
+    source = IherbJsonSource(path)
+    records = [source.normalize(product, i) for i, product in enumerate(iter_products(path))] * scale
+    print(f"📊 {len(records):,}件 → {table}")
+
+    def psql(*args):
+        subprocess.run(['psql', dsn, '-v', 'ON_ERROR_STOP=1', '-q', *args], check=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, sink_class in [('INSERT (1000行/文)', SqlInsertSink), ('COPY FROM STDIN', SqlCopySink)]:
+            target = os.path.join(tmp, 'bench.sql')
+            sink = sink_class(target, 'bench', wipe_tables=(table,), table=table)
+            sink.open()
+            for record in records:
+                sink.write(record)
+            sink.finish()
+            sink.close()
+
+            psql('-c', f"DROP TABLE IF EXISTS {table}; "
+                       f"CREATE TABLE {table} ({', '.join(f'{c} TEXT' for c in SUPPLEMENT_COLUMNS)});")
+            start = time.perf_counter()
+            psql('--single-transaction', '-f', target)
+            seconds = time.perf_counter() - start
+            print(f"  {label:<20} {seconds * 1000:8.1f} ms  ({len(records) / seconds:,.0f}行/秒)")
+        psql('-c', f"DROP TABLE {table};")
+
+
+@contextmanager
+def stub_search_server(products_per_term=450, latency=0.2):
+    """Open Food Facts 検索APIのスタブ(ローカルHTTPサーバー)を起動して検索URLを返す"""
+    import json
+    import threading
+    import zlib
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+    from urllib.parse import urlsplit, parse_qs
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            query = parse_qs(urlsplit(self.path).query)
+            term = query['search_terms'][0]
+            page = int(query['page'][0])
+            page_size = int(query['page_size'][0])
+            time.sleep(latency)
+
+            # キーワードごとに決まった商品を返す(キーワード間で一部のバーコードが重複する)
+            base = zlib.crc32(term.encode()) % 1000 * 10
+            start = (page - 1) * page_size
+            products = [
+                {'code': f"{10**12 + base + i}", 'product_name': f"{term} product {i}",
+                 'brands': 'Stub Foods', 'categories': 'Dietary supplements'}
+                for i in range(start, min(start + page_size, products_per_term))
+            ]
+            body = json.dumps({'count': products_per_term, 'page': page, 'page_size': page_size,
+                               'products': products}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}/cgi/search.pl"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def bench_fetch(terms=8, products_per_term=450):
+    """スタブサーバー相手に、逐次取得(1スレッド)・並行取得・レート制限あり・キャッシュ再生を比較"""
+    import io
+    import os
+    import tempfile
+    from contextlib import redirect_stdout
+    from .httpcache import ResponseCache
+    from .sources.openfoodfacts import OpenFoodFactsSource
+
+    search_terms = [f"term {i}" for i in range(int(terms))]
+    products_per_term = int(products_per_term)
+    print(f"📊 {len(search_terms)}キーワード × {products_per_term}件 (応答遅延 0.2秒)")
+
+    with stub_search_server(products_per_term) as url:
+        def crawl(workers, rate_per_minute, cache=None):
+            source = OpenFoodFactsSource(search_terms, workers=workers, rate_per_minute=rate_per_minute,
+                                         base_url=url, cache=cache)
+            start = time.perf_counter()
+            with redirect_stdout(io.StringIO()):
+                codes = [product['code'] for product in source]
+            return codes, time.perf_counter() - start
+
+        expected, sequential = crawl(1, 60000)
+        print(f"  逐次 (1スレッド)             {sequential:6.2f} 秒  {len(expected):,}件")
+        for workers, rate in [(8, 60000), (8, 600)]:
+            codes, seconds = crawl(workers, rate)
+            print(f"  並行 ({workers}スレッド, {rate}回/分)  {seconds:6.2f} 秒  ({sequential / seconds:.1f}倍)")
+            assert codes == expected
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'http_cache.sqlite')
+            cache = ResponseCache(path)
+            crawl(8, 600, cache)
+            cache.close()
+            cache = ResponseCache(path, offline=True)
+            codes, seconds = crawl(8, 600, cache)
+            print(f"  オフライン再生 (キャッシュ)     {seconds:6.2f} 秒  ({sequential / seconds:.1f}倍)  "
+                  f"ヒット {cache.hits}件 / {cache.total_bytes / 1024:.0f} KB")
+            cache.close()
+            assert codes == expected
+
+
+BENCHMARKS = {
+    'matcher': bench_matcher,
+    'mask': bench_mask,
+    'normalize': bench_normalize,
+    'sql': bench_sql,
+    'records': bench_records,
+    'parallel': bench_parallel,
+    'brands': bench_brands,
+    'neardup': bench_neardup,
+    'datacache': bench_datacache,
+    'load': bench_load,
+    'fetch': bench_fetch,
+}
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print(f"使い方: python -m ingest.bench [{'|'.join(BENCHMARKS)}] [引数...]")
+        exit(1)
+    args = sys.argv[2:]
+    # load は先頭が接続URLなので倍率の位置が1つずれる
+    scale_index = 2 if sys.argv[1] == 'load' else 1
+    # datacache の引数はパスだけ
+    if sys.argv[1] != 'datacache' and len(args) > scale_index:
+        args[scale_index] = int(args[scale_index])
+    BENCHMARKS[sys.argv[1]](*args)
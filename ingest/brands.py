@@ -0,0 +1,246 @@
+"""
+ブランド名の正規化(全ソース共通)
+
+別名表 BRAND_ALIASES を索引にコンパイルし、ソース上のブランド文字列を正式名に揃える。
+照合は 完全一致 → 先頭からのトークン列(トライ) → 文字3-gramの曖昧一致 の順で、
+曖昧一致は3-gramを多く共有する別名だけを候補にし、順序も含めた類似度で確認する。
+短い先頭の語が違うだけの別ブランド('Snow Foods' と 'NOW Foods')は曖昧一致させない。
+結果は元の文字列ごとにメモ化するので、同じブランドは2回目から辞書引き1回で済む。
+一致しなかったブランドは BrandStats が「辞書にないブランド」として報告する。
+"""
+
+import re
+import unicodedata
+from collections import Counter
+from difflib import SequenceMatcher
+
+# 正式名 → 別名(正式名自身・空白を詰めた形・'&'/'and' の揺れは自動で登録する)
+BRAND_ALIASES = {
+    "NOW Foods": ("now", "now food", "now supplements", "now health group"),
+    "Nature's Way": ("nature way",),
+    "Solgar": ("solgar vitamins", "solgar vitamin and herb"),
+    "Garden of Life": ("garden life",),
+    "Jarrow Formulas": ("jarrow", "jarrow formula"),
+    "Life Extension": ("life ext",),
+    "Thorne": ("thorne research", "thorne health"),
+    "Pure Encapsulations": ("pure encaps",),
+    "Doctor's Best": ("dr best", "dr s best"),
+    "Bluebonnet": ("bluebonnet nutrition", "blue bonnet"),
+    "Country Life": ("country life vitamins",),
+    "Swanson": ("swanson vitamins", "swanson health"),
+    "Source Naturals": (),
+    "Kirkland": ("kirkland signature",),
+    "Nature Made": (),
+    "Centrum": (),
+    "One A Day": ("1 a day",),
+    "California Gold Nutrition": ("california gold", "cgn"),
+    "Nordic Naturals": (),
+    "Sports Research": (),
+    "New Chapter": (),
+    "Rainbow Light": (),
+    "MegaFood": ("mega food",),
+    "Natural Factors": (),
+    "NaturesPlus": ("natures plus", "nature s plus"),
+    "21st Century": ("21st century healthcare",),
+    "Nature's Bounty": (),
+    "Nature's Answer": (),
+    "Zhou Nutrition": ("zhou",),
+    "Optimum Nutrition": (),
+    "Dymatize": ("dymatize nutrition",),
+    "MuscleTech": ("muscle tech",),
+    "Natrol": (),
+    "Solaray": (),
+    "Enzymedica": (),
+    "Trace Minerals": ("trace minerals research",),
+    "Vital Proteins": (),
+    "Youtheory": (),
+    "SmartyPants": ("smarty pants",),
+    "Kyolic": (),
+    "Herb Pharm": (),
+    "DHC": ("dhc corporation", "dhc japan"),
+    "FANCL": ("fancl corporation",),
+    "Unknown": ("unknown brand", "unbranded", "no brand"),
+}
+
+# 曖昧一致の設定(空白を詰めて MIN_FUZZY_LENGTH 文字以上の文字列だけ)
+# 3-gramのDice係数が CANDIDATE_THRESHOLD 以上の別名を候補にし、
+# 順序を考慮した類似度(SequenceMatcher)が FUZZY_THRESHOLD 以上なら一致とする
+NGRAM = 3
+CANDIDATE_THRESHOLD = 0.5
+FUZZY_THRESHOLD = 0.9
+MIN_FUZZY_LENGTH = 5
+
+# 曖昧一致の前に末尾から除く会社形態の語
+COMPANY_SUFFIXES = frozenset(('inc', 'llc', 'ltd', 'co', 'corp', 'corporation', 'company', 'gmbh', 'plc'))
+
+# 1語の別名で先頭一致させる最短の長さ('now' のような短い語は完全一致のみ)
+# 曖昧一致でも、先頭の語がこれより短い場合はその語が完全に一致することを求める
+MIN_PREFIX_LENGTH = 5
+
+# 1つのソース文字列に複数のブランドが並んでいる場合の区切り(Open Food Facts の brands など)
+BRAND_SEPARATOR = ','
+
+# 記号として消す文字(アポストロフィ・商標記号)
+DROPPED = re.compile(r"['’®™©]")
+NON_WORD = re.compile(r'[\W_]+')
+
+# トライの終端(その位置までのトークン列に一致する正式名)
+END = ''
+
+
+def brand_tokens(text):
+    """比較用のトークン列(全角/大文字小文字/記号の揺れを吸収し、'&' は and に)"""
+    text = unicodedata.normalize('NFKC', str(text)).casefold()
+    text = DROPPED.sub('', text).replace('&', ' and ')
+    return NON_WORD.sub(' ', text).split()
+
+
+def ngrams(text):
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+class BrandIndex:
+    """
+    別名表をコンパイルしたブランド索引
+
+    lookup() は一致した正式名(なければNone)、canonical() は一致しなければ元の文字列を返す。
+    search() は商品名などの文中から2語以上の別名を探す。
+    """
+
+    def __init__(self, aliases=BRAND_ALIASES, fuzzy_threshold=FUZZY_THRESHOLD):
+        self.fuzzy_threshold = fuzzy_threshold
+        self.canonical_names = frozenset(aliases)
+        self.exact = {}
+        self.trie = {}
+        self.compact = []  # (空白を詰めた別名, 3-gram集合, 正式名, 先頭の語)
+        self.grams = {}  # 3-gram → self.compact の番号
+        for canonical, names in aliases.items():
+            for name in (canonical, *names):
+                self.add(brand_tokens(name), canonical)
+        self.memo = {}
+        self.counts = Counter()
+
+    def add(self, tokens, canonical):
+        if not tokens:
+            return
+        variants = [tokens]
+        if 'and' in tokens:
+            variants.append([token for token in tokens if token != 'and'])
+        for tokens in variants:
+            self.exact.setdefault(' '.join(tokens), canonical)
+            node = self.trie
+            for token in tokens:
+                node = node.setdefault(token, {})
+            node.setdefault(END, canonical)
+            compact = ''.join(tokens)
+            if self.exact.setdefault(compact, canonical) == canonical and len(compact) >= MIN_FUZZY_LENGTH:
+                grams = ngrams(compact)
+                for gram in grams:
+                    self.grams.setdefault(gram, []).append(len(self.compact))
+                self.compact.append((compact, grams, canonical, tokens[0]))
+
+    def prefix(self, tokens, start=0, min_tokens=1):
+        """tokens[start:] の先頭に一致する最長の別名の正式名"""
+        node = self.trie
+        found = None
+        for i in range(start, len(tokens)):
+            node = node.get(tokens[i])
+            if node is None:
+                break
+            length = i - start + 1
+            if END in node and length >= min_tokens and (length > 1 or len(tokens[start]) >= MIN_PREFIX_LENGTH):
+                found = node[END]
+        return found
+
+    def fuzzy(self, tokens):
+        """
+        会社形態の語を除いた全体を、3-gramを多く共有する別名とだけ比較する
+
+        先頭の語が別名と違い、どちらかが MIN_PREFIX_LENGTH 文字より短いものは候補にしない
+        (1文字違いでも 'snow' / 'know' と 'now' は別の語)。
+        """
+        end = len(tokens)
+        while end > 1 and tokens[end - 1] in COMPANY_SUFFIXES:
+            end -= 1
+        compact = ''.join(tokens[:end])
+        if len(compact) < MIN_FUZZY_LENGTH:
+            return None
+        grams = ngrams(compact)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.grams.get(gram, ()))
+        best, best_score = None, self.fuzzy_threshold
+        matcher = SequenceMatcher(autojunk=False)
+        matcher.set_seq2(compact)
+        for i, common in shared.items():
+            alias, alias_grams, canonical, first = self.compact[i]
+            if 2 * common / (len(grams) + len(alias_grams)) < CANDIDATE_THRESHOLD:
+                continue
+            if first != tokens[0] and min(len(first), len(tokens[0])) < MIN_PREFIX_LENGTH:
+                continue
+            matcher.set_seq1(alias)
+            score = matcher.ratio()
+            if score >= best_score:
+                best, best_score = canonical, score
+        return best
+
+    def match(self, text):
+        """(正式名, 照合方法)。一致しなければ (None, 'unmatched')"""
+        tokens = brand_tokens(text)
+        if not tokens:
+            return None, 'unmatched'
+        canonical = self.exact.get(' '.join(tokens)) or self.exact.get(''.join(tokens))
+        if canonical:
+            return canonical, 'exact'
+        canonical = self.prefix(tokens)
+        if canonical:
+            return canonical, 'prefix'
+        canonical = self.fuzzy(tokens)
+        if canonical:
+            return canonical, 'fuzzy'
+        return None, 'unmatched'
+
+    def lookup(self, raw):
+        """ブランド文字列の正式名(なければNone)。区切られた複数のブランドは最初に一致したもの"""
+        try:
+            return self.memo[raw]
+        except KeyError:
+            pass
+        canonical, how = None, 'unmatched'
+        if raw:
+            for part in str(raw).split(BRAND_SEPARATOR):
+                canonical, how = self.match(part)
+                if canonical:
+                    break
+        self.counts[how] += 1
+        self.memo[raw] = canonical
+        return canonical
+
+    def canonical(self, raw):
+        """正式名、辞書になければ元の文字列"""
+        return self.lookup(raw) or raw
+
+    def search(self, text, min_tokens=2):
+        """文中(商品名など)に現れる min_tokens 語以上の別名の正式名(最初に現れたもの)"""
+        tokens = brand_tokens(text)
+        for start in range(len(tokens)):
+            canonical = self.prefix(tokens, start, min_tokens)
+            if canonical:
+                return canonical
+        return None
+
+    def is_known(self, brand):
+        return brand in self.canonical_names
+
+    def report(self):
+        labels = {'exact': '完全一致', 'prefix': '先頭一致', 'fuzzy': '曖昧一致', 'unmatched': '不一致'}
+        print(f"\n🏷️ ブランド正規化: {len(self.memo):,}種類 ("
+              + ', '.join(f"{labels[how]} {self.counts[how]:,}" for how in labels) + ")")
+
+
+DEFAULT_BRAND_INDEX = BrandIndex()
+
+
+def normalize_brand(raw):
+    """正式名、辞書になければ元の文字列"""
+    return DEFAULT_BRAND_INDEX.canonical(raw)
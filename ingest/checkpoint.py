@@ -0,0 +1,170 @@
+"""
+巡回(クロール)のチェックポイント(JSONL)
+
+取得したページを1ページ1行で追記しておき、再実行(--resume)では記録済みの
+ページをネットワークに出ずに再生する。途中で落ちても取得済みのページは失われず、
+キーワードを分けて別々のマシンで巡回したファイルは merge でまとめられる。
+
+各行: {"source": ..., "term": ..., "page": ..., "data": <APIレスポンス>}
+
+ファイルはスクリプト(ソース)ごとに分ける(crawl_checkpoint_<ソース名>.jsonl)。
+あるスクリプトの巡回完了時の削除が、別のスクリプトの途中の記録を消さないようにするため。
+
+使い方:
+  python -m ingest.checkpoint status [チェックポイントのパス]   (省略時はすべて)
+  python -m ingest.checkpoint merge <出力パス> <入力パス>...
+"""
+
+import glob
+import json
+import os
+import sys
+import threading
+from collections import Counter
+
+CHECKPOINT_PATH = 'crawl_checkpoint_{source}.jsonl'
+
+
+def checkpoint_path(source):
+    """ソースごとの既定のチェックポイントのパス"""
+    return CHECKPOINT_PATH.format(source=source)
+
+
+def page_key(source, term, page):
+    return (source, term, int(page))
+
+
+def scan(path):
+    """({キー: 行の開始位置}, 壊れていない部分の末尾の位置)"""
+    offsets = {}
+    end = 0
+    if not os.path.exists(path):
+        return offsets, end
+    with open(path, 'rb') as f:
+        while True:
+            line = f.readline()
+            if not line:
+                break
+            if not line.endswith(b'\n'):
+                break  # 書き込み途中で落ちた行
+            try:
+                entry = json.loads(line)
+                key = page_key(entry['source'], entry['term'], entry['page'])
+            except (ValueError, KeyError):
+                break
+            offsets.setdefault(key, end)
+            end += len(line)
+    return offsets, end
+
+
+class CrawlCheckpoint:
+    """ページ単位のチェックポイント(スレッドセーフ)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.offsets, end = scan(path)
+        if os.path.exists(path) and os.path.getsize(path) > end:
+            print(f"⚠️ {path} の末尾の不完全な行を切り詰めます")
+            os.truncate(path, end)
+        self.lock = threading.Lock()
+        self.writer = open(path, 'ab')
+        self.reader = open(path, 'rb')
+        self.replayed = 0
+        self.recorded = 0
+        if self.offsets:
+            print(f"♻️ {path}: 記録済み {len(self.offsets):,}ページから再開")
+
+    def __contains__(self, key):
+        return page_key(*key) in self.offsets
+
+    def get(self, source, term, page):
+        """記録済みページのレスポンス(なければNone)"""
+        offset = self.offsets.get(page_key(source, term, page))
+        if offset is None:
+            return None
+        with self.lock:
+            self.reader.seek(offset)
+            line = self.reader.readline()
+            self.replayed += 1
+        return json.loads(line)['data']
+
+    def record(self, source, term, page, data):
+        """ページを1行追記して、落ちても残るようにディスクへ書き出す"""
+        line = json.dumps({'source': source, 'term': term, 'page': int(page), 'data': data},
+                          ensure_ascii=False).encode('utf-8') + b'\n'
+        with self.lock:
+            offset = self.writer.seek(0, os.SEEK_END)
+            self.writer.write(line)
+            self.writer.flush()
+            os.fsync(self.writer.fileno())
+            self.offsets.setdefault(page_key(source, term, page), offset)
+            self.recorded += 1
+
+    def fetch(self, source, term, page, fetch):
+        """記録済みなら再生、なければ fetch() で取得して記録"""
+        data = self.get(source, term, page)
+        if data is None:
+            data = fetch()
+            self.record(source, term, page, data)
+        return data
+
+    def close(self):
+        self.writer.close()
+        self.reader.close()
+
+    def discard(self):
+        """巡回が最後まで終わったら削除する(次回は最新のデータを取り直す)"""
+        os.remove(self.path)
+        print(f"🧹 {self.path} を削除しました(巡回完了)")
+
+    def report(self):
+        print(f"\n💾 チェックポイント {self.path}: 再生 {self.replayed:,}ページ / 新規 {self.recorded:,}ページ")
+
+
+def merge(target, paths):
+    """複数のチェックポイントを1つにまとめる(同じページは最初のものを採用)"""
+    seen = set()
+    written = 0
+    with open(target, 'wb') as out:
+        for path in paths:
+            offsets, _ = scan(path)
+            starts = set(offsets.values())
+            with open(path, 'rb') as f:
+                position = 0
+                for line in f:
+                    start, position = position, position + len(line)
+                    if start not in starts:
+                        continue
+                    entry = json.loads(line)
+                    key = page_key(entry['source'], entry['term'], entry['page'])
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    out.write(line)
+                    written += 1
+    print(f"✅ {target}: {written:,}ページ ({len(paths)}ファイルから統合)")
+
+
+def status(path=None):
+    if path is None:
+        paths = sorted(glob.glob(CHECKPOINT_PATH.format(source='*')))
+        if not paths:
+            print("📂 チェックポイントはありません")
+        for path in paths:
+            status(path)
+        return
+    offsets, _ = scan(path)
+    pages = Counter((source, term) for source, term, _ in offsets)
+    print(f"📊 {path}: {len(offsets):,}ページ / {len(pages)}キーワード")
+    for (source, term), count in sorted(pages.items()):
+        print(f"  [{source}] {term}: {count}ページ")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == 'status':
+        status(*sys.argv[2:3])
+    elif len(sys.argv) >= 4 and sys.argv[1] == 'merge':
+        merge(sys.argv[2], sys.argv[3:])
+    else:
+        print("使い方: python -m ingest.checkpoint status [パス] | merge <出力> <入力>...")
+        exit(1)
@@ -0,0 +1,83 @@
+"""
+カテゴリ判定(全ソース共通)
+
+ルール表 CATEGORY_RULES を1つのマッチャーにコンパイルし、
+単体判定(classify)と一括判定(classify_many)の両方を提供する。
+"""
+
+from .matcher import get_matcher
+
+# ルール表: 上から順に優先。同じキーワードが複数ルールにあれば上のルールが勝つ
+CATEGORY_RULES = (
+    ('vitamins', ('vitamin c', 'ascorbic', 'vitamin d', 'vitamin e', 'vitamin k',
+                  'vitamin b', 'multivitamin', 'vitamin')),
+    ('minerals', ('mineral', 'magnesium', 'calcium', 'zinc', 'iron', 'selenium')),
+    ('fatty_acids', ('omega', 'dha', 'epa', 'fish oil')),
+    ('proteins', ('protein', 'amino', 'whey', 'casein', 'collagen')),
+    ('probiotics', ('probiotic', 'lactobacillus', 'bifidobacterium')),
+)
+
+DEFAULT_CATEGORY = 'supplements'
+
+
+class CategoryClassifier:
+    """ルール表をコンパイルしたカテゴリ判定器(ルールごとのヒット数を記録)"""
+
+    def __init__(self, rules=CATEGORY_RULES, default=DEFAULT_CATEGORY):
+        self.rules = tuple((category, tuple(words)) for category, words in rules)
+        self.default = default
+        # 判定結果のコード → カテゴリ名(最後がデフォルト)
+        self.categories = tuple(category for category, _ in self.rules) + (default,)
+        self.default_code = len(self.rules)
+
+        # キーワード → 優先順位コード(小さいほど優先)
+        self.rank = {}
+        for code, (_, words) in enumerate(self.rules):
+            for word in words:
+                self.rank.setdefault(word.lower(), code)
+        self.matcher = get_matcher(self.rank)
+        self.hits = [0] * len(self.categories)
+
+    def code(self, text):
+        """小文字化済みテキストの判定コード"""
+        rank = self.rank
+        return min((rank[hit] for hit in self.matcher.find(text)), default=self.default_code)
+
+    def classify(self, *texts):
+        """商品名・カテゴリ文字列などからカテゴリを判定"""
+        code = self.code(' '.join(t.lower() for t in texts if t))
+        self.hits[code] += 1
+        return self.categories[code]
+
+    def classify_many(self, texts):
+        """小文字化済みテキストの列を一括判定してカテゴリ名のリストを返す"""
+        codes = [self.code(text) for text in texts]
+        hits = self.hits
+        for code in codes:
+            hits[code] += 1
+        categories = self.categories
+        return [categories[code] for code in codes]
+
+    def hit_counts(self):
+        """ルール(カテゴリ)ごとのヒット数"""
+        return dict(zip(self.categories, self.hits))
+
+    def reset(self):
+        self.hits = [0] * len(self.categories)
+
+    def merge(self, hits):
+        """別プロセスで数えたヒット数(hits の並び)を加える"""
+        self.hits = [total + count for total, count in zip(self.hits, hits)]
+
+    def report(self):
+        print(f"\n📊 カテゴリルール別ヒット数:")
+        for category, count in self.hit_counts().items():
+            print(f"  {category}: {count:,}件")
+
+
+DEFAULT_CLASSIFIER = CategoryClassifier()
+
+
+def classify_category(*texts):
+    """商品名・カテゴリ文字列などからカテゴリを判定"""
+    return DEFAULT_CLASSIFIER.classify(*texts)
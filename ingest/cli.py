@@ -0,0 +1,155 @@
+"""
+スクリプト共通のコマンドラインオプション
+"""
+
+import sys
+
+from .checkpoint import CrawlCheckpoint, checkpoint_path
+from .datacache import DatasetCache
+from .httpcache import ResponseCache
+from .schema import SchemaStore
+from .snapshot import SNAPSHOT_PATH
+
+# フラグ → sql_sink() のキーワード引数
+SQL_FLAGS = {
+    '--copy': ('copy', True),
+    '--upsert': ('mode', 'upsert'),
+    '--tombstone': ('tombstone', True),
+    '--snapshot': ('snapshot', SNAPSHOT_PATH),
+}
+
+# HTTPキャッシュのフラグ(取得系スクリプト用)
+CACHE_FLAG = '--cache'
+OFFLINE_FLAG = '--offline'
+HTTP_FLAGS = (CACHE_FLAG, OFFLINE_FLAG)
+
+# APIキー(--api-key=KEY。取得系スクリプト用)
+API_KEY_FLAG = '--api-key='
+
+# 解析済みデータセットのキャッシュ(ファイル系スクリプト用)
+DATASET_CACHE_FLAG = '--dataset-cache'
+
+# 保存済みのキー/カラムのマッピングを使わずに推定し直す(ファイル系スクリプト用)
+REINFER_SCHEMA_FLAG = '--reinfer-schema'
+
+# 巡回のチェックポイント(--resume[=パス])と分担巡回(--shard=i/n)
+RESUME_FLAG = '--resume'
+SHARD_FLAG = '--shard='
+
+
+def is_crawl_flag(arg):
+    return arg == RESUME_FLAG or arg.startswith(RESUME_FLAG + '=') or arg.startswith(SHARD_FLAG)
+
+
+# マルチプロセス整形(--workers=N / --chunk-size=N) → ParallelNormalize のキーワード引数
+PARALLEL_FLAGS = {
+    '--workers=': 'workers',
+    '--chunk-size=': 'chunk_size',
+}
+
+
+def is_parallel_flag(arg):
+    return any(arg.startswith(flag) for flag in PARALLEL_FLAGS)
+
+
+def sql_options(argv=None):
+    """SQL出力フラグを取り出して (sql_sink用のオプション, 残りの引数) を返す"""
+    argv = sys.argv[1:] if argv is None else argv
+    options = {}
+    args = []
+    for arg in argv:
+        if arg in SQL_FLAGS:
+            key, value = SQL_FLAGS[arg]
+            options[key] = value
+        elif arg not in HTTP_FLAGS and arg not in (DATASET_CACHE_FLAG, REINFER_SCHEMA_FLAG) \
+                and not is_crawl_flag(arg) and not is_parallel_flag(arg) and not arg.startswith(API_KEY_FLAG):
+            args.append(arg)
+    # 廃番処理・スナップショット差分は差分投入でしか意味がない
+    if options.get('tombstone') or options.get('snapshot'):
+        options['mode'] = 'upsert'
+    return options, args
+
+
+def http_cache(argv=None):
+    """--cache / --offline が指定されていればHTTPレスポンスキャッシュを返す"""
+    argv = sys.argv[1:] if argv is None else argv
+    if OFFLINE_FLAG in argv:
+        return ResponseCache(offline=True)
+    if CACHE_FLAG in argv:
+        return ResponseCache()
+    return None
+
+
+def api_key(argv=None):
+    """--api-key=KEY のAPIキー(指定がなければNone)"""
+    argv = sys.argv[1:] if argv is None else argv
+    for arg in argv:
+        if arg.startswith(API_KEY_FLAG):
+            return arg[len(API_KEY_FLAG):] or None
+    return None
+
+
+def crawl_shard(argv=None):
+    """--shard=i/n を (i, n) にして返す(指定がなければNone)"""
+    argv = sys.argv[1:] if argv is None else argv
+    for arg in argv:
+        if arg.startswith(SHARD_FLAG):
+            index, _, count = arg[len(SHARD_FLAG):].partition('/')
+            try:
+                index, count = int(index), int(count)
+            except ValueError:
+                raise SystemExit(f"❌ {arg}: --shard=1/3 のように指定してください")
+            if not 1 <= index <= count:
+                raise SystemExit(f"❌ {arg}: 分担番号は 1〜{count} で指定してください")
+            return index, count
+    return None
+
+
+def crawl_checkpoint(source, argv=None):
+    """
+    --resume[=パス] または --shard が指定されていれば巡回のチェックポイントを返す
+
+    パスの省略時はソースごとのファイル(crawl_checkpoint_<source>.jsonl)を使う。
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    for arg in argv:
+        if arg == RESUME_FLAG:
+            return CrawlCheckpoint(checkpoint_path(source))
+        if arg.startswith(RESUME_FLAG + '='):
+            return CrawlCheckpoint(arg[len(RESUME_FLAG) + 1:])
+    if crawl_shard(argv):
+        return CrawlCheckpoint(checkpoint_path(source))
+    return None
+
+
+def parallel_options(argv=None):
+    """--workers=N / --chunk-size=N を ParallelNormalize 用のオプションにして返す(指定がなければ空)"""
+    argv = sys.argv[1:] if argv is None else argv
+    options = {}
+    for arg in argv:
+        for flag, key in PARALLEL_FLAGS.items():
+            if arg.startswith(flag):
+                try:
+                    options[key] = int(arg[len(flag):])
+                except ValueError:
+                    raise SystemExit(f"❌ {arg}: 数値で指定してください")
+                if options[key] < 1:
+                    raise SystemExit(f"❌ {arg}: 1以上で指定してください")
+    return options
+
+
+def dataset_cache(argv=None):
+    """--dataset-cache が指定されていれば解析済みデータセットのキャッシュを返す"""
+    argv = sys.argv[1:] if argv is None else argv
+    if DATASET_CACHE_FLAG not in argv:
+        return None
+    if not DatasetCache.available():
+        print("⚠️ pyarrow がインストールされていないため --dataset-cache は無効です (pip install pyarrow)")
+        return None
+    return DatasetCache()
+
+
+def schema_store(argv=None):
+    """キー/カラムの推定結果の保存先(--reinfer-schema なら保存済みのマッピングを使わない)"""
+    argv = sys.argv[1:] if argv is None else argv
+    return SchemaStore(refresh=REINFER_SCHEMA_FLAG in argv)
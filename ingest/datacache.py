@@ -0,0 +1,183 @@
+"""
+解析済みデータセットのキャッシュ(Arrow IPC)
+
+入力ファイルの内容ハッシュをキーに、解析結果(CSVのDataFrameチャンク / JSONの商品)を
+型付きの列形式で保存する。2回目以降は同じ入力なら解析をせず、メモリマップした
+列データから直接チャンクを生成する。
+
+- チャンクごとに1ファイル(チャンクごとに推論された型をそのまま残す)
+- 書き込みは <キー>.partial に行い、ソースを最後まで読めたときだけ名前を変えて確定する
+- pyarrow がなければキャッシュは使わない(オプション依存)
+- 列形式にできない値(型が混在した列、入れ子の値)を含むデータセットはキャッシュしない
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+from .parallel import chunked
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # オプション依存
+    pa = None
+
+DATASET_CACHE_DIR = '.ingest_cache'
+
+# 解析方法を変えたら上げる(古いキャッシュを使わない)
+CACHE_VERSION = 2
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# JSONの商品で、キーがない行を区別するための列名の接頭辞
+PRESENT_PREFIX = '__present__:'
+
+SCALAR_TYPES = (str, int, float, bool, type(None))
+
+
+class Uncacheable(Exception):
+    """列形式で保存できないデータ"""
+
+
+def file_digest(path):
+    """ファイル内容の blake2b(hex)"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(HASH_BLOCK_SIZE)
+            if not block:
+                return digest.hexdigest()
+            digest.update(block)
+
+
+def records_table(records):
+    """商品dictのリストを列形式に(キーがない行は存在フラグの列で区別)"""
+    columns = {}
+    for record in records:
+        for key, value in record.items():
+            if not isinstance(value, SCALAR_TYPES):
+                raise Uncacheable(f"{key!r} に入れ子の値があります")
+            columns.setdefault(key, None)
+    arrays = {}
+    for key in columns:
+        values = [record.get(key) for record in records]
+        try:
+            arrays[key] = pa.array(values)
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            raise Uncacheable(f"{key!r} の型が混在しています: {e}") from None
+        present = [key in record for record in records]
+        if not all(present):
+            arrays[PRESENT_PREFIX + key] = pa.array(present)
+    return pa.table(arrays)
+
+
+def table_records(table):
+    """records_table() の逆変換"""
+    names = [name for name in table.column_names if not name.startswith(PRESENT_PREFIX)]
+    columns = [table.column(name).to_pylist() for name in names]
+    present = {
+        name: table.column(PRESENT_PREFIX + name).to_pylist()
+        for name in names if PRESENT_PREFIX + name in table.column_names
+    }
+    for i, row in enumerate(zip(*columns)):
+        record = dict(zip(names, row))
+        for name, flags in present.items():
+            if not flags[i]:
+                del record[name]
+        yield record
+
+
+class DatasetCache:
+    """入力ファイルのハッシュをキーにした解析済みデータセットのキャッシュ"""
+
+    def __init__(self, root=DATASET_CACHE_DIR):
+        self.root = root
+        self.hits = 0
+        self.stored = 0
+
+    @staticmethod
+    def available():
+        return pa is not None
+
+    def key(self, kind, path, *params):
+        """種類・入力ファイルの内容・解析パラメータから決まるキー"""
+        params = json.dumps([CACHE_VERSION, *params], ensure_ascii=False)
+        digest = hashlib.blake2b(f"{file_digest(path)}\x1f{params}".encode('utf-8'), digest_size=16)
+        return f"{kind}-{digest.hexdigest()}"
+
+    def directory(self, key):
+        return os.path.join(self.root, key)
+
+    def chunk_tables(self, key):
+        """確定済みのキャッシュをメモリマップしてチャンクの Table を順に生成(なければNone)"""
+        directory = self.directory(key)
+        manifest = os.path.join(directory, 'manifest.json')
+        if not os.path.exists(manifest):
+            return None
+        with open(manifest, encoding='utf-8') as f:
+            chunks = json.load(f)['chunks']
+        self.hits += 1
+        print(f"⚡ 解析済みキャッシュを使用: {directory} ({chunks:,}チャンク)")
+        return self._read(directory, chunks)
+
+    def _read(self, directory, chunks):
+        for i in range(chunks):
+            # Table のバッファがマップを参照しているので、閉じるのはGCに任せる
+            source = pa.memory_map(os.path.join(directory, f"{i:05d}.arrow"))
+            yield pa.ipc.open_file(source).read_all()
+
+    def store(self, key, chunks, to_table):
+        """チャンクをそのまま生成しながら保存し、最後まで読めたら確定する"""
+        directory = self.directory(key)
+        partial = directory + '.partial'
+        shutil.rmtree(partial, ignore_errors=True)
+        os.makedirs(partial)
+        count = 0
+        caching = True
+        try:
+            for chunk in chunks:
+                if caching:
+                    try:
+                        table = to_table(chunk)
+                    except Uncacheable as e:
+                        print(f"⚠️ 列形式で保存できないためキャッシュしません: {e}")
+                        caching = False
+                    else:
+                        path = os.path.join(partial, f"{count:05d}.arrow")
+                        with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                            writer.write_table(table)
+                        count += 1
+                yield chunk
+            if caching:
+                with open(os.path.join(partial, 'manifest.json'), 'w', encoding='utf-8') as f:
+                    json.dump({'chunks': count}, f)
+                shutil.rmtree(directory, ignore_errors=True)
+                os.replace(partial, directory)
+                self.stored += 1
+                print(f"💾 解析済みキャッシュを保存: {directory} ({count:,}チャンク)")
+        finally:
+            shutil.rmtree(partial, ignore_errors=True)
+
+    def frames(self, key, read):
+        """DataFrameのチャンク(キャッシュがあればそこから、なければ read() を保存しながら)"""
+        tables = self.chunk_tables(key)
+        if tables is not None:
+            return (table.to_pandas() for table in tables)
+
+        def to_table(df):
+            try:
+                return pa.Table.from_pandas(df)
+            except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+                raise Uncacheable(str(e)) from None
+
+        return self.store(key, read(), to_table)
+
+    def records(self, key, read, chunk_size=10000):
+        """商品dict(キャッシュがあればそこから、なければ read() を chunk_size 件ずつ保存しながら)"""
+        tables = self.chunk_tables(key)
+        if tables is not None:
+            return (record for table in tables for record in table_records(table))
+        chunks = (chunk for _, chunk in chunked(read(), chunk_size))
+        return (record for chunk in self.store(key, chunks, records_table) for record in chunk)
@@ -0,0 +1,51 @@
+"""
+取得中の商品の重複除去インデックス
+
+キーはバーコード(GTIN-14に桁揃え)、なければブランド+商品名を正規化したものの
+ダイジェスト。プロセスごとに変わる hash() は使わないので、実行をまたいでも
+同じ商品は同じキーになる。インデックスには8バイトのダイジェストだけを持つ。
+"""
+
+import hashlib
+
+from .ids import normalize_text
+
+DEDUP_DIGEST_SIZE = 8
+
+
+def dedup_key(barcode=None, brand=None, name=None):
+    """商品の重複判定キー(bytes)。識別できる情報がなければNone"""
+    code = str(barcode).strip() if barcode else ''
+    if code.isdigit() and len(code) <= 14:
+        text = 'gtin\x1f' + code.zfill(14)
+    elif code:
+        text = 'code\x1f' + code
+    else:
+        name = normalize_text(name) if name else ''
+        if not name:
+            return None
+        text = f"name\x1f{normalize_text(brand) if brand else ''}\x1f{name}"
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=DEDUP_DIGEST_SIZE).digest()
+
+
+class DedupIndex:
+    """既出の商品キーの集合"""
+
+    def __init__(self):
+        self.keys = set()
+        self.unidentified = 0
+        self.duplicates = 0
+
+    def add(self, key):
+        """初出ならTrue(キーがNoneの商品は判定できないので常にTrue)"""
+        if key is None:
+            self.unidentified += 1
+            return True
+        if key in self.keys:
+            self.duplicates += 1
+            return False
+        self.keys.add(key)
+        return True
+
+    def __len__(self):
+        return len(self.keys) + self.unidentified
@@ -0,0 +1,157 @@
+"""
+pandas DataFrame単位のTransformステージ(ベクトル化版)
+
+CSV系ソースはDataFrameのチャンクを生成し、ここでまとめてフィルタしてから
+行ごとの Product レコードに展開する。
+"""
+
+import re
+from functools import reduce
+
+import pandas as pd
+
+from .pipeline import Transform
+from .sinks import FileSink
+from .records import Product
+from .keywords import SUPPLEMENT_KEYWORDS
+from .classify import DEFAULT_CLASSIFIER
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # オプション依存(なければ pandas の文字列演算で連結する)
+    pa = None
+
+# 列をまたいだ誤マッチを防ぐ区切り文字(キーワードに含まれない)
+COLUMN_SEPARATOR = '\n'
+
+
+def text_columns(df):
+    """文字列カラムの一覧"""
+    return list(df.select_dtypes(include=['object', 'string']).columns)
+
+
+def search_texts(df, columns=None, ascii_lower=True):
+    """
+    文字列カラムを区切り文字で連結して1回だけ小文字化した検索用の列
+
+    pyarrow があれば連結・小文字化をArrowの配列演算で行い pyarrow の配列を、
+    なければ pandas の文字列演算で Series を返す。
+    キーワードがASCIIのみなら(ascii_lower)ASCII文字だけを小文字化する。
+    Unicodeの小文字化より大幅に速く、ASCIIキーワードの判定結果は変わらない。
+    """
+    columns = text_columns(df) if columns is None else columns
+    if pa is not None:
+        arrays = [pa.array(df[col].astype('string'), from_pandas=True).cast(pa.large_string())
+                  for col in columns]
+        text = pc.binary_join_element_wise(*arrays, pa.scalar(COLUMN_SEPARATOR, pa.large_string()),
+                                           null_handling='replace', null_replacement='')
+        return pc.ascii_lower(text) if ascii_lower else pc.utf8_lower(text)
+    text = reduce(lambda left, right: left + COLUMN_SEPARATOR + right,
+                  (df[col].astype('string').fillna('') for col in columns))
+    return text.str.lower()
+
+
+def compile_keywords(keywords):
+    """キーワードを1つの正規表現(エスケープした選択)にまとめ、(正規表現, ASCIIのみか) を返す"""
+    keywords = dict.fromkeys(k.lower() for k in keywords if k)
+    return '|'.join(re.escape(k) for k in keywords), all(k.isascii() for k in keywords)
+
+
+def supplement_mask(df, keywords=SUPPLEMENT_KEYWORDS, compiled=None, columns=None):
+    """いずれかの文字列カラムにキーワードを含む行のブールマスク"""
+    pattern, ascii_lower = compile_keywords(keywords) if compiled is None else compiled
+    columns = text_columns(df) if columns is None else columns
+    if not columns or not pattern:
+        return pd.Series(False, index=df.index)
+    texts = search_texts(df, columns, ascii_lower)
+    if pa is not None:
+        mask = pc.match_substring_regex(texts, pattern).to_numpy(zero_copy_only=False)
+    else:
+        mask = texts.str.contains(pattern, regex=True).to_numpy(bool)
+    return pd.Series(mask, index=df.index)
+
+
+class FrameSupplementFilter(Transform):
+    """DataFrameのチャンクごとにサプリメント行だけを残す"""
+
+    def __init__(self, keywords=SUPPLEMENT_KEYWORDS, columns=None):
+        self.compiled = compile_keywords(keywords)
+        self.columns = columns
+        self.rows = 0
+        self.matched = 0
+
+    def apply(self, df):
+        mask = supplement_mask(df, compiled=self.compiled, columns=self.columns)
+        self.rows += len(df)
+        self.matched += int(mask.sum())
+        return df[mask]
+
+    def __call__(self, frames):
+        yield from super().__call__(frames)
+        print(f"✅ サプリメント商品抽出完了: {self.matched:,}件 / {self.rows:,}行")
+
+
+def clean_text(df, col):
+    """カラムを文字列化(欠損・'nan'は空文字)。カラムがなければ空文字の列"""
+    if col is None:
+        return pd.Series('', index=df.index, dtype='string')
+    text = df[col].astype('string').fillna('')
+    return text.mask(text == 'nan', '')
+
+
+def truncate(text, limit, suffix=''):
+    """limit文字を超える値を切り詰めて suffix を付ける"""
+    if not limit:
+        return text
+    return text.mask(text.str.len() > limit, text.str.slice(0, limit) + suffix)
+
+
+def classify_frame(*columns, classifier=DEFAULT_CLASSIFIER):
+    """商品名・カテゴリ文字列の列からカテゴリ列を一括判定"""
+    text = columns[0].str.lower()
+    for column in columns[1:]:
+        text = text + ' ' + column.str.lower()
+    return pd.Series(classifier.classify_many(text.tolist()), index=columns[0].index, dtype=object)
+
+
+class FrameNormalize(Transform):
+    """Sourceの normalize_frame() でチャンクを出力レコードのDataFrameに整形"""
+
+    def __init__(self, source):
+        self.source = source
+        self.position = 0
+
+    def apply(self, df):
+        output = self.source.normalize_frame(df, self.position)
+        self.position += len(df)
+        return output
+
+
+class FrameCsvSink(FileSink):
+    """DataFrameのチャンクをそのままCSVに追記"""
+
+    def __init__(self, path):
+        self.path = path
+        self.header = True
+
+    def open(self):
+        self.header = True
+        self.open_file().close()
+
+    def write(self, df):
+        df.to_csv(self.partial_path, mode='a', header=self.header, index=False, encoding='utf-8')
+        self.header = False
+
+    def close(self):
+        self.commit_file()
+
+
+class FrameRows(Transform):
+    """DataFrameのチャンクを行の Product レコードに展開"""
+
+    def __call__(self, frames):
+        for df in frames:
+            names = list(df.columns)
+            for row in df.itertuples(index=False, name=None):
+                yield Product(**dict(zip(names, row)))
@@ -0,0 +1,128 @@
+"""
+HTTPレスポンスのディスクキャッシュ(SQLite)
+
+- キーは メソッド + URL + ソート済みクエリパラメータ(api_key などの秘密は除外)
+- 本文はzlib圧縮して保存し、TTLを過ぎたら取り直す
+- 合計サイズが上限を超えたら、最後に使われたのが古い順に削除する
+- offline=True ならネットワークに出ず、記録済みのレスポンスだけを返す(TTLは無視)
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+
+CACHE_PATH = 'http_cache.sqlite'
+CACHE_TTL = 7 * 24 * 3600
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# 上限を超えたらこの割合まで削る
+EVICT_TO = 0.9
+
+# キーにもURLにも残さないクエリパラメータ
+SECRET_PARAMS = frozenset({'api_key'})
+
+
+def canonical_url(url, params=None):
+    """パラメータを展開・ソートし、秘密のパラメータを除いたURL"""
+    prepared = requests.Request('GET', url, params=params).prepare().url
+    parts = urlsplit(prepared)
+    query = [
+        pair for pair in parse_qsl(parts.query, keep_blank_values=True)
+        if pair[0] not in SECRET_PARAMS
+    ]
+    return urlunsplit(parts._replace(query=urlencode(sorted(query))))
+
+
+def cache_key(method, url, params=None):
+    """(キャッシュキー, 正規化URL)"""
+    canonical = canonical_url(url, params)
+    key = hashlib.sha256(f"{method.upper()} {canonical}".encode('utf-8')).hexdigest()
+    return key, canonical
+
+
+class ResponseCache:
+    """URL+パラメータをキーにレスポンス本文を保存するキャッシュ(スレッドセーフ)"""
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES, offline=False,
+                 clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, url TEXT NOT NULL, body BLOB NOT NULL, size INTEGER NOT NULL,"
+            " fetched_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)")
+        self.conn.commit()
+        (self.total_bytes,) = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evicted = 0
+
+    def get(self, method, url, params=None):
+        """キャッシュ済みの本文(bytes)。なければ、または期限切れ(オンライン時)ならNone"""
+        key, _ = cache_key(method, url, params)
+        now = self.clock()
+        with self.lock:
+            row = self.conn.execute("SELECT body, fetched_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            body, fetched_at = row
+            if not self.offline and self.ttl is not None and now - fetched_at > self.ttl:
+                self.stale += 1
+                return None
+            self.conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+            self.hits += 1
+        return zlib.decompress(body)
+
+    def put(self, method, url, params, content):
+        """本文を圧縮して保存し、上限を超えていれば古いものから削除"""
+        key, canonical = cache_key(method, url, params)
+        body = zlib.compress(content, 6)
+        now = self.clock()
+        with self.lock:
+            old = self.conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, canonical, body, len(body), now, now),
+            )
+            self.total_bytes += len(body) - (old[0] if old else 0)
+            if self.max_bytes and self.total_bytes > self.max_bytes:
+                self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        """最後に使われたのが古い順に、上限の EVICT_TO 倍まで削除(ロック内で呼ぶ)"""
+        target = self.max_bytes * EVICT_TO
+        victims = []
+        rows = self.conn.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall()
+        for key, size in rows:
+            if self.total_bytes <= target:
+                break
+            victims.append((key,))
+            self.total_bytes -= size
+        self.conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+        self.evicted += len(victims)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def report(self):
+        mode = "オフライン再生" if self.offline else "キャッシュ"
+        print(f"\n📦 HTTP{mode}: ヒット {self.hits:,}件 / ミス {self.misses:,}件 / 期限切れ {self.stale:,}件"
+              f" / 削除 {self.evicted:,}件 / {self.total_bytes / 2**20:.1f} MB")
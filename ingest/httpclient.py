@@ -0,0 +1,153 @@
+"""
+取得系ソース共通のHTTPクライアント
+
+- Session + コネクションプールでTLS接続を使い回す(keep-alive)
+- 一時的なエラー(接続エラー・タイムアウト・429・5xx)は指数バックオフ+ジッターで再試行
+- 429/503 の Retry-After ヘッダーに従う
+- ホストごとの同時リクエスト数を制限し、レート制限(TokenBucket)は再試行にも適用する
+- 再試行しても取得できなければ FetchError を送出する(黙って打ち切らない)
+- cache(ResponseCache)を渡すとGETのJSONレスポンスをディスクにキャッシュする
+"""
+
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+USER_AGENT = 'my-supps-ingest/1.0 (+https://github.com/suppsaudit/my-supps)'
+
+# 再試行するHTTPステータス
+RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5   # 秒。1回目の待ち時間の上限
+BACKOFF_CAP = 30     # 秒。待ち時間の上限
+RETRY_AFTER_CAP = 300
+
+POOL_SIZE = 16
+PER_HOST_CONCURRENCY = 4
+TIMEOUT = 30
+
+
+class FetchError(Exception):
+    """再試行しても取得できなかった(データセットが不完全になる)"""
+
+
+def retry_after_seconds(value):
+    """Retry-After ヘッダー(秒数 or HTTP日付)を秒数に。解釈できなければNone"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class HttpClient:
+    """コネクションプール・再試行・ホスト別同時接続数制限つきのHTTPクライアント"""
+
+    def __init__(self, limiter=None, per_host=PER_HOST_CONCURRENCY, max_retries=MAX_RETRIES,
+                 backoff_base=BACKOFF_BASE, backoff_cap=BACKOFF_CAP, timeout=TIMEOUT,
+                 pool_size=POOL_SIZE, sleep=time.sleep, cache=None):
+        self.limiter = limiter
+        self.cache = cache
+        self.per_host = per_host
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.timeout = timeout
+        self.sleep = sleep
+
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = USER_AGENT
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.host_slots = {}
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+
+    @contextmanager
+    def slot(self, url):
+        """ホストごとの同時リクエスト数を per_host までに制限"""
+        host = urlsplit(url).netloc
+        with self.lock:
+            semaphore = self.host_slots.get(host)
+            if semaphore is None:
+                semaphore = self.host_slots[host] = threading.BoundedSemaphore(self.per_host)
+        with semaphore:
+            yield
+
+    def backoff(self, attempt):
+        """attempt 回目の再試行までの待ち時間(上限つき指数バックオフ + ジッター)"""
+        ceiling = min(self.backoff_cap, self.backoff_base * 2 ** attempt)
+        return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+    def request(self, method, url, **kwargs):
+        """成功(2xx/3xx)したレスポンスを返す。再試行しても失敗したら FetchError"""
+        kwargs.setdefault('timeout', self.timeout)
+        for attempt in range(self.max_retries + 1):
+            if self.limiter is not None:
+                self.limiter.acquire()
+
+            wait = None
+            with self.slot(url):
+                self.requests += 1
+                try:
+                    response = self.session.request(method, url, **kwargs)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    error = f"{type(e).__name__}"
+                else:
+                    if response.status_code < 400:
+                        return response
+                    if response.status_code not in RETRY_STATUS:
+                        raise FetchError(f"HTTP {response.status_code}: {url}")
+                    error = f"HTTP {response.status_code}"
+                    wait = retry_after_seconds(response.headers.get('Retry-After'))
+                    response.close()
+
+            if attempt == self.max_retries:
+                break
+            wait = min(wait, RETRY_AFTER_CAP) if wait is not None else self.backoff(attempt)
+            self.retries += 1
+            print(f"⚠️ {error} ({urlsplit(url).netloc}) → {wait:.1f}秒後に再試行 "
+                  f"({attempt + 1}/{self.max_retries})")
+            self.sleep(wait)
+
+        raise FetchError(f"{error}: {url} ({self.max_retries}回再試行しても失敗)")
+
+    def get_json(self, url, params=None, **kwargs):
+        """GETしてJSONを返す(キャッシュがあればまずキャッシュを見る)"""
+        cache = self.cache
+        content = cache.get('GET', url, params) if cache is not None else None
+        if content is not None:
+            return json.loads(content)
+        if cache is not None and cache.offline:
+            raise FetchError(f"オフラインモードでキャッシュにありません: {url} {params or ''}")
+
+        content = self.request('GET', url, params=params, **kwargs).content
+        try:
+            data = json.loads(content)
+        except ValueError as e:
+            raise FetchError(f"JSONとして解釈できません: {url}") from e
+        if cache is not None:
+            cache.put('GET', url, params, content)
+        return data
+
+    def close(self):
+        self.session.close()
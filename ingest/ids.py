@@ -0,0 +1,96 @@
+"""
+安定した商品ID(dsld_id)
+
+入力の並び順やフィルタ条件に依存しないIDを、ソース上の識別子から決定的に作る。
+識別子は SKU/商品ID → 商品URL → ブランド+商品名 の優先順で選ぶ。
+同じIDが別の商品に割り当たらないよう、発行済みIDは IdIndex で衝突をチェックする。
+"""
+
+import hashlib
+import re
+import unicodedata
+from urllib.parse import urlsplit
+
+# IDに使うハッシュの桁数(16進16桁 = 64bit。100万件でも衝突確率は1e-7未満)
+ID_DIGEST_CHARS = 16
+ID_DIGEST_SIZE = 20
+
+# iHerb系ソース(JSON/Kaggle CSV)で共通の名前空間(同じ商品は同じIDになる)
+IHERB_NAMESPACE = 'iherb'
+
+# SKU/商品IDとみなすキー(優先順、小文字で比較)
+SKU_KEYS = ('pid', 'sku', 'product_id', 'product id', 'item_id', 'item id', 'uniq_id')
+
+# 英数字以外は区切りとして1つの空白にまとめる
+NON_WORD = re.compile(r'[\W_]+')
+
+
+def detect_identity_keys(keys):
+    """カラム名/キーから (SKUのキー, URLのキー) を推測"""
+    lowered = {str(key).lower(): key for key in keys}
+    sku_key = next((lowered[name] for name in SKU_KEYS if name in lowered), None)
+    url_key = next((key for key in keys if 'url' in str(key).lower() or 'link' in str(key).lower()), None)
+    return sku_key, url_key
+
+
+def normalize_text(value):
+    """全角/大文字小文字/記号の揺れを吸収した比較用テキスト"""
+    text = unicodedata.normalize('NFKC', str(value)).casefold()
+    return NON_WORD.sub(' ', text).strip()
+
+
+def normalize_url(value):
+    """スキーム・ホスト(国別サブドメイン)・クエリを除いたパス"""
+    path = urlsplit(str(value).strip()).path
+    return path.rstrip('/').lower()
+
+
+def identity_key(source, sku=None, url=None, brand=None, name=None):
+    """商品の同一性を表すキー。識別子が何もなければNone"""
+    sku = normalize_text(sku) if sku else ''
+    if sku:
+        return f"{source}\x1fsku\x1f{sku}"
+    url = normalize_url(url) if url else ''
+    if url:
+        return f"{source}\x1furl\x1f{url}"
+    name = normalize_text(name) if name else ''
+    if name:
+        brand = normalize_text(brand) if brand else ''
+        return f"{source}\x1fname\x1f{brand}\x1f{name}"
+    return None
+
+
+class IdIndex:
+    """
+    発行済みIDの索引(ID → 同一性キーのダイジェスト)
+
+    ハッシュの先頭 ID_DIGEST_CHARS 桁が別の商品と重なった場合は、
+    重ならなくなるまで桁数を伸ばす。同じ商品には常に同じIDを返す。
+    assigned をリストにすると (ID, prefix, ダイジェスト) を記録する(別プロセスで発行した
+    IDを親プロセスの索引で claim() し直すため)。
+    """
+
+    def __init__(self):
+        self.owners = {}
+        self.collisions = 0
+        self.assigned = None
+
+    def assign(self, prefix, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=ID_DIGEST_SIZE).hexdigest().upper()
+        dsld_id = self.claim(prefix, digest)
+        if self.assigned is not None:
+            self.assigned.append((dsld_id, prefix, digest))
+        return dsld_id
+
+    def claim(self, prefix, digest):
+        """ダイジェストに対するID(他の商品と重ならない最短の桁数)"""
+        for length in range(ID_DIGEST_CHARS, len(digest) + 1, 4):
+            dsld_id = prefix + digest[:length]
+            owner = self.owners.setdefault(dsld_id, digest)
+            if owner == digest:
+                return dsld_id
+            self.collisions += 1
+        raise ValueError(f"IDの衝突を解消できません: {prefix}{digest}")
+
+    def __len__(self):
+        return len(self.owners)
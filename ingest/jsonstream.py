@@ -0,0 +1,232 @@
+"""
+インクリメンタルJSONリーダー
+
+巨大なJSONダンプを json.load せずに、商品配列の要素を1件ずつ生成する。
+ZIPアーカイブ内のメンバーも展開せずに直接読み込める。
+"""
+
+import io
+import json
+import re
+import zipfile
+from contextlib import contextmanager
+
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r'\s*')
+# 文字列の外で意味を持つ文字 / 文字列の中で意味を持つ文字
+_STRUCTURAL = re.compile(r'["\[\]{}]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+# 数値・リテラルの後に続いてよい文字
+_DELIMITERS = ',]} \t\r\n'
+
+
+class _Reader:
+    """テキストストリームをチャンク単位で読むバッファ"""
+
+    def __init__(self, stream, chunk_size=CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def fill(self):
+        """次のチャンクを読み込む。消費済みの部分は捨てる"""
+        if self.eof:
+            return False
+        chunk = self.stream.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """空白を飛ばして次の1文字を返す(終端なら空文字)"""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"JSON解析エラー: '{char}' が必要です (位置 {self.pos})")
+        self.pos += 1
+
+    def decode(self):
+        """次の値を1つだけデコードして返す"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # 数値・リテラルはチャンク境界で途切れている可能性がある('2' | '.75' を 2 と読まない)。
+            # 区切り文字が続くかファイルの終端のときだけ確定する
+            if self.buf[self.pos] not in '"[{' and (end == len(self.buf) or self.buf[end] not in _DELIMITERS) \
+                    and self.fill():
+                continue
+            self.pos = end
+            return value
+
+    def skip(self):
+        """次の値を読み飛ばす(メモリに展開しない)"""
+        first = self.peek()
+        if first not in '[{"':
+            self.decode()
+            return
+
+        depth = 0
+        in_string = False
+        while True:
+            pattern = _STRING_SPECIAL if in_string else _STRUCTURAL
+            match = pattern.search(self.buf, self.pos)
+            if match is None:
+                self.pos = len(self.buf)
+                if not self.fill():
+                    raise ValueError("JSON解析エラー: 値の途中でファイルが終了しました")
+                continue
+
+            char = match.group()
+            self.pos = match.end()
+            if in_string:
+                if char == '\\':
+                    # エスケープされた次の1文字も飛ばす
+                    if self.pos >= len(self.buf) and not self.fill():
+                        raise ValueError("JSON解析エラー: 文字列の途中でファイルが終了しました")
+                    self.pos += 1
+                else:
+                    in_string = False
+                    if depth == 0:
+                        return
+            elif char == '"':
+                in_string = True
+            elif char in '[{':
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def iter_array(self):
+        """配列の要素を1件ずつデコードして生成"""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.decode()
+            char = self.peek()
+            self.pos += 1
+            if char == ']':
+                return
+            if char != ',':
+                raise ValueError(f"JSON解析エラー: ',' または ']' が必要です (位置 {self.pos})")
+
+    def iter_object(self):
+        """オブジェクトのキーを1つずつ生成。値は呼び出し側が読む/飛ばす"""
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.decode()
+            self.expect(':')
+            yield key
+            char = self.peek()
+            self.pos += 1
+            if char == '}':
+                return
+            if char != ',':
+                raise ValueError(f"JSON解析エラー: ',' または '}}' が必要です (位置 {self.pos})")
+
+    def count_array(self):
+        """配列の要素数を数える(要素は読み飛ばす)"""
+        count = 0
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return 0
+        while True:
+            self.skip()
+            count += 1
+            char = self.peek()
+            self.pos += 1
+            if char == ']':
+                return count
+            if char != ',':
+                raise ValueError(f"JSON解析エラー: ',' または ']' が必要です (位置 {self.pos})")
+
+
+@contextmanager
+def open_text(path, member=None):
+    """JSONファイル、またはZIP内のメンバーをテキストストリームとして開く"""
+    if not zipfile.is_zipfile(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            yield f
+        return
+
+    with zipfile.ZipFile(path) as archive:
+        if member is None:
+            members = [name for name in archive.namelist() if name.lower().endswith('.json')]
+            if not members:
+                raise FileNotFoundError(f"{path} にJSONファイルが含まれていません")
+            member = members[0]
+        with archive.open(member) as raw:
+            yield io.TextIOWrapper(raw, encoding='utf-8')
+
+
+def find_product_array(path, member=None):
+    """トップレベルが辞書の場合、最も要素数の多い配列のキーを返す(要素は展開しない)"""
+    with open_text(path, member) as stream:
+        reader = _Reader(stream)
+        if reader.peek() != '{':
+            return None
+
+        largest_key = None
+        largest_size = -1
+        for key in reader.iter_object():
+            if reader.peek() == '[':
+                size = reader.count_array()
+                print(f"  {key}: {size:,}件")
+                if size > largest_size:
+                    largest_key = key
+                    largest_size = size
+            else:
+                reader.skip()
+        return largest_key
+
+
+def iter_products(path, member=None, array_key=None):
+    """
+    商品オブジェクトを1件ずつ生成
+
+    トップレベルが配列ならその要素を、辞書なら array_key の配列
+    (省略時は最も大きい配列)の要素を返す。
+    """
+    with open_text(path, member) as stream:
+        reader = _Reader(stream)
+        first = reader.peek()
+        if first == '[':
+            yield from reader.iter_array()
+            return
+        if first != '{':
+            raise ValueError(f"JSON解析エラー: 配列または辞書が必要です ({path})")
+
+        if array_key is None:
+            array_key = find_product_array(path, member)
+            if array_key is None:
+                return
+
+        for key in reader.iter_object():
+            if key == array_key and reader.peek() == '[':
+                yield from reader.iter_array()
+                return
+            reader.skip()
@@ -0,0 +1,15 @@
+"""
+サプリメント判定用キーワード(全ソース共通)
+"""
+
+SUPPLEMENT_KEYWORDS = [
+    'vitamin', 'mineral', 'supplement', 'capsule', 'tablet', 'softgel',
+    'omega', 'probiotic', 'protein', 'amino', 'magnesium', 'calcium',
+    'zinc', 'iron', 'b12', 'b-12', 'multivitamin', 'fish oil', 'collagen',
+    'coq10', 'turmeric', 'glucosamine', 'melatonin', 'biotin'
+]
+
+# Kaggle版で追加していたブランド系キーワード
+SUPPLEMENT_BRAND_KEYWORDS = [
+    'now foods', 'solgar', 'nature', 'garden of life', 'jarrow'
+]
@@ -0,0 +1,104 @@
+"""
+複数キーワードの一括マッチャー
+
+キーワード集合を一度だけコンパイルし、テキスト中に現れる全キーワードを返す。
+
+- find(): pyahocorasick がインストールされていればAho-Corasickオートマトンで
+  テキストを1パス走査する
+- それ以外はキーワードの包含関係(例: 'vitamin' ⊂ 'multivitamin')で木を作り、
+  親キーワードが見つかった場合だけ子キーワードを調べる
+- search(): 部分文字列検索自体はCの実装なので、キーワード数が少ないうちは
+  包含木の根だけを順に調べる方がオートマトンより速い
+"""
+
+from functools import lru_cache
+
+try:
+    import ahocorasick
+except ImportError:  # オプション依存
+    ahocorasick = None
+
+# search() で根キーワードがこれ以上ならオートマトンを使う
+AUTOMATON_MIN_KEYWORDS = 64
+
+
+class KeywordMatcher:
+    """キーワード集合をコンパイルした部分文字列マッチャー(小文字テキスト前提)"""
+
+    def __init__(self, keywords, use_automaton=None):
+        self.keywords = tuple(dict.fromkeys(k.lower() for k in keywords if k))
+
+        if use_automaton is None:
+            use_automaton = ahocorasick is not None
+        if use_automaton and ahocorasick is None:
+            raise ImportError("use_automaton=True には pyahocorasick が必要です")
+
+        self.automaton = self._build_automaton() if use_automaton else None
+        self.roots, self.children = self._build_containment()
+
+    def _build_automaton(self):
+        automaton = ahocorasick.Automaton()
+        for keyword in self.keywords:
+            automaton.add_word(keyword, keyword)
+        automaton.make_automaton()
+        return automaton
+
+    def _build_containment(self):
+        """各キーワードを、それを含む最小のキーワードの子として木にする"""
+        # 短い順に並べると、親候補は必ず先に登場する
+        ordered = sorted(self.keywords, key=len)
+        parents = {}
+        for i, keyword in enumerate(ordered):
+            contained = [other for other in ordered[:i] if other in keyword]
+            # 最も長い(=最も近い)包含キーワードを親にする
+            parents[keyword] = max(contained, key=len) if contained else None
+
+        roots = []
+        children = {keyword: [] for keyword in ordered}
+        for keyword in ordered:
+            parent = parents[keyword]
+            if parent is None:
+                roots.append(keyword)
+            else:
+                children[parent].append(keyword)
+        return tuple(roots), {k: tuple(v) for k, v in children.items()}
+
+    def search(self, text):
+        """いずれかのキーワードを含むか(最初のヒットで打ち切り)"""
+        if self.automaton is not None and len(self.roots) >= AUTOMATON_MIN_KEYWORDS:
+            for _ in self.automaton.iter(text):
+                return True
+            return False
+        # 子キーワードは親を含むので、根だけ調べれば十分
+        for keyword in self.roots:
+            if keyword in text:
+                return True
+        return False
+
+    def find(self, text):
+        """テキストに含まれる全キーワードの集合"""
+        if self.automaton is not None:
+            return {keyword for _, keyword in self.automaton.iter(text)}
+
+        hits = set()
+        pending = [keyword for keyword in self.roots if keyword in text]
+        while pending:
+            keyword = pending.pop()
+            hits.add(keyword)
+            for child in self.children[keyword]:
+                if child in text:
+                    pending.append(child)
+        return hits
+
+    def __contains__(self, text):
+        return self.search(text)
+
+
+@lru_cache(maxsize=None)
+def _cached_matcher(keywords):
+    return KeywordMatcher(keywords)
+
+
+def get_matcher(keywords):
+    """同じキーワード集合のマッチャーはプロセス内で1回だけコンパイル"""
+    return _cached_matcher(tuple(keywords))
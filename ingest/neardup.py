@@ -0,0 +1,465 @@
+"""
+ソースをまたいだ重複商品の検出(MinHash + LSH)
+
+同じ商品でもソースによって商品名の表記が少しずつ違い、バーコードがないことも多い。
+商品名の単語集合(ブランド名の単語は除く)の MinHash 署名を作り、署名を BANDS 個の
+帯に分けて、どれかの帯が一致した商品だけを候補にする(LSH)。候補の組は
+- 単語集合のJaccard係数が THRESHOLD 以上(単語のハッシュから正確に計算)
+- ブランド(正式名に正規化)が同じか、どちらかが不明
+- 商品名の数値(容量・粒数など)が食い違わない(一方の数値の集合が他方に含まれる。
+  64bitのマスクで絞り込んでから、残った組を数値の集合どうしで確かめる)
+なら同じ商品とみなし、連結成分をクラスタにする。
+ソースを指定した場合は別のソースの行どうしだけを比べ、1クラスタに同じソースの行は1つだけにする
+(同じソース内の重複は dedup/ids の識別子で除去済みで、名前が似ているのは味・容量違いの
+別商品であることが多い)。
+短い商品名を介して別の商品がつながらないよう、クラスタの代表と似ていない行は切り離し、
+切り離した行どうしで同じ手順をくり返す。
+
+全ペアを比べないので、件数にほぼ比例する時間で100万件規模でも処理できる。
+1件あたりに保持するのは帯のキー(BANDS × 8バイト)と単語のハッシュ(単語数 × 4バイト)だけで、
+署名の計算・バケット分け・Jaccard係数・連結成分はすべて numpy の配列演算で行う。
+"""
+
+import hashlib
+
+import numpy as np
+
+from .brands import normalize_brand
+from .ids import normalize_text
+
+NUM_PERM = 64
+BANDS = 16
+
+# 同じ商品とみなす単語集合のJaccard係数の下限
+THRESHOLD = 0.8
+
+# まとめて処理する件数・組数(一時配列のメモリを抑える)
+BATCH_SIZE = 100000
+
+# 同じバケット内で組にする行の範囲(並べて何行先まで)
+WINDOW = 8
+
+# 代表と似ていない行を切り離して組み直す回数の上限
+MAX_REFINE_ROUNDS = 10
+
+SEED = 1
+
+# MinHash のハッシュ族 (a * h + b) mod P
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+# ブランド不明として扱う値(どのブランドとも矛盾しない)
+UNKNOWN_BRANDS = frozenset(('', 'unknown'))
+
+
+def brand_key(brand):
+    """比較用のブランド(正式名に正規化。不明なら空文字)"""
+    key = normalize_text(normalize_brand(brand)) if brand else ''
+    return '' if key in UNKNOWN_BRANDS else key
+
+
+def brand_words(brand):
+    """商品名から除くブランド名の単語(元の表記と正式名)"""
+    if not brand:
+        return frozenset()
+    return frozenset(normalize_text(brand).split()) | frozenset(brand_key(brand).split())
+
+
+def product_tokens(name, brand=None, words=None):
+    """商品名の単語集合(商品名に含まれるブランド名の単語は除く。words は brand_words() の結果)"""
+    tokens = set(normalize_text(name).split()) if name else set()
+    return tokens - (brand_words(brand) if words is None else words)
+
+
+def number_tokens(tokens):
+    """数値の単語を並べたタプル"""
+    return tuple(sorted(token for token in tokens if token.isdigit()))
+
+
+def number_mask(numbers, hash_token):
+    """数値の単語の集合を64bitのマスクに(包含関係の絞り込み用。hash_token は TokenHashes)"""
+    mask = 0
+    for token in numbers:
+        mask |= 1 << (hash_token(token) & 63)
+    return mask
+
+
+def ragged_index(starts, lengths):
+    """starts[i] から lengths[i] 個ずつの添字を連結した配列"""
+    total = int(lengths.sum())
+    ends = np.cumsum(lengths)
+    return np.arange(total) - np.repeat(ends - lengths, lengths) + np.repeat(starts, lengths)
+
+
+class TokenHashes:
+    """単語 → 32bitハッシュ(実行ごとに変わらない blake2b。語彙ごとに1回だけ計算)"""
+
+    def __init__(self):
+        self.cache = {}
+
+    def __call__(self, token):
+        try:
+            return self.cache[token]
+        except KeyError:
+            value = int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=4).digest(), 'little')
+            self.cache[token] = value
+            return value
+
+
+class NumberSets:
+    """
+    各行の商品名の数値の集合
+
+    masks は各行の number_mask()、ids は各行の数値の集合の番号(sets の添字)。
+    マスクの包含は集合の包含の必要条件なので、マスクで残った組のうち
+    集合が違うものだけを集合どうしで比べる(ビットの衝突で別の数値を同じとみなさない)。
+    """
+
+    def __init__(self, masks, ids, sets):
+        self.masks = masks
+        self.ids = ids
+        self.sets = sets
+
+    def compatible(self, left, right):
+        """行の組ごとに、一方の数値の集合が他方に含まれるか"""
+        masks, ids = self.masks, self.ids
+        common = masks[left] & masks[right]
+        keep = (common == masks[left]) | (common == masks[right])
+        check = np.flatnonzero(keep & (ids[left] != ids[right]))
+        if len(check):
+            codes, inverse = np.unique(
+                np.stack((ids[left[check]], ids[right[check]]), axis=1), axis=0, return_inverse=True
+            )
+            sets = self.sets
+            contained = np.fromiter(
+                (sets[a] <= sets[b] or sets[b] <= sets[a] for a, b in codes), bool, len(codes)
+            )
+            keep[check] = contained[inverse.ravel()]
+        return keep
+
+
+class TokenTable:
+    """全行の単語ハッシュ(連結した配列 + 行ごとの開始位置と個数)"""
+
+    def __init__(self, hashes, lengths):
+        self.hashes = hashes
+        self.lengths = lengths
+        self.offsets = np.cumsum(lengths) - lengths
+
+    def jaccard(self, left, right):
+        """行の組ごとの単語集合のJaccard係数"""
+        count = len(left)
+        left_lengths = self.lengths[left]
+        right_lengths = self.lengths[right]
+        tokens = np.concatenate((
+            self.hashes[ragged_index(self.offsets[left], left_lengths)],
+            self.hashes[ragged_index(self.offsets[right], right_lengths)],
+        ))
+        pairs = np.concatenate((
+            np.repeat(np.arange(count), left_lengths),
+            np.repeat(np.arange(count), right_lengths),
+        ))
+        # 組ごとに単語を並べ、隣り合う同じ単語 = 両方の行にある単語
+        order = np.lexsort((tokens, pairs))
+        tokens, pairs = tokens[order], pairs[order]
+        shared = (pairs[1:] == pairs[:-1]) & (tokens[1:] == tokens[:-1])
+        intersection = np.bincount(pairs[1:][shared], minlength=count)
+        union = left_lengths + right_lengths - intersection
+        return np.divide(intersection, union, out=np.zeros(count), where=union > 0)
+
+
+class MinHashLSH:
+    """
+    MinHash署名のLSHで候補の組を作り、Jaccard係数で確かめて重複クラスタを求める
+
+    band_keys() で単語ハッシュから帯のキー(件数 × bands)を作り、
+    clusters() で各行のクラスタの代表行を返す。
+    """
+
+    def __init__(self, num_perm=NUM_PERM, bands=BANDS, threshold=THRESHOLD, seed=SEED):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) は bands ({bands}) で割り切れる必要があります")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, 1 << 61, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, 1 << 61, size=num_perm, dtype=np.uint64)
+        self.hash_token = TokenHashes()
+        self.candidates = 0
+        self.verified = 0
+
+    def token_hashes(self, token_sets):
+        """単語集合のリスト → (連結した単語ハッシュ(uint32), 行ごとの単語数)"""
+        hash_token = self.hash_token
+        lengths = np.fromiter((len(tokens) for tokens in token_sets), np.int64, len(token_sets))
+        hashes = np.fromiter(
+            (hash_token(token) for tokens in token_sets for token in tokens), np.uint32, int(lengths.sum())
+        )
+        return hashes, lengths
+
+    def band_keys(self, hashes, lengths, start=0):
+        """
+        行ごとの MinHash 署名を帯に分け、帯ごとに64bitのキーにまとめる
+
+        単語がない行は行番号(start からの通し番号)をキーにする(他の行と同じバケットにならない)。
+        """
+        count = len(lengths)
+        keys = np.empty((count, self.bands), dtype=np.uint64)
+        empty = np.flatnonzero(lengths == 0)
+        keys[empty] = ((np.uint64(1) << np.uint64(63)) | (start + empty).astype(np.uint64))[:, None]
+        present = np.flatnonzero(lengths)
+        if not len(present):
+            return keys
+        offsets = np.cumsum(lengths[present]) - lengths[present]
+        hashes = hashes.astype(np.uint64)
+        for band in range(self.bands):
+            key = np.zeros(len(present), dtype=np.uint64)
+            for k in range(band * self.rows, (band + 1) * self.rows):
+                values = ((self.a[k] * hashes + self.b[k]) % MERSENNE_PRIME) & MAX_HASH
+                key = (key * np.uint64(0x100000001B3)) ^ np.minimum.reduceat(values, offsets)
+            keys[present, band] = key
+        return keys
+
+    def candidate_pairs(self, keys, accept=None, window=WINDOW):
+        """
+        どれかの帯のキーが一致した行の組(accept(left, right) があれば True の組だけ)
+
+        帯ごとにキーで並べ、同じバケット内で window 行先までの行と組にする
+        (window + 1 行以下のバケットは全組)。大きなバケット(よくある単語だけが一致)では
+        次の帯のキーで並べ、他の帯も一致する行どうしが近くに来るようにする。
+        """
+        count = len(keys)
+        pairs = []
+        for band in range(self.bands):
+            column = keys[:, band]
+            order = np.lexsort((keys[:, (band + 1) % self.bands], column))
+            for step in range(1, min(window, count - 1) + 1):
+                same = column[order[step:]] == column[order[:-step]]
+                if not same.any():
+                    break
+                left, right = order[:-step][same], order[step:][same]
+                if accept is not None:
+                    keep = accept(left, right)
+                    left, right = left[keep], right[keep]
+                pairs.append(np.stack((left, right), axis=1))
+        if not pairs:
+            return np.empty((0, 2), dtype=np.int64)
+        pairs = np.concatenate(pairs)
+        pairs.sort(axis=1)
+        # 複数の帯で見つかった同じ組を1つに
+        codes = np.unique(pairs[:, 0] * count + pairs[:, 1])
+        return np.stack(np.divmod(codes, count), axis=1)
+
+    def similar(self, table, left, right, numbers=None, brands=None, sources=None, batch_size=BATCH_SIZE):
+        """行の組ごとに、Jaccard係数が threshold 以上でブランド・数値が食い違わない(別ソースの)組か"""
+        keep = compatible(left, right, numbers, brands, sources)
+        check = np.flatnonzero(keep)
+        for start in range(0, len(check), batch_size):
+            batch = check[start:start + batch_size]
+            keep[batch] = table.jaccard(left[batch], right[batch]) >= self.threshold
+        return keep
+
+    def clusters(self, keys, table, quality=None, numbers=None, brands=None, sources=None):
+        """
+        各行のクラスタの代表行(quality が最大、同点なら最初の行。重複がなければ自分自身)
+
+        numbers は各行の数値の集合(NumberSets)、brands は各行のブランド番号(0は不明)、
+        sources は各行のソース番号(同じソースの組は除く)。
+        連結成分のうち代表と似ていない行は切り離し、切り離した行どうしの組だけで組み直す。
+        """
+        count = len(keys)
+        # ブランド・数値・ソースの条件は候補を作りながら確かめる(重複除去する組を減らす)
+        pairs = self.candidate_pairs(keys, lambda left, right: compatible(left, right, numbers, brands, sources))
+        self.candidates = len(pairs)
+        pairs = pairs[self.similar(table, pairs[:, 0], pairs[:, 1])]
+        self.verified = len(pairs)
+
+        canonical = np.arange(count)
+        active = np.ones(count, dtype=bool)
+        for _ in range(MAX_REFINE_ROUNDS):
+            pairs = pairs[active[pairs[:, 0]] & active[pairs[:, 1]]]
+            if not len(pairs):
+                break
+            labels = connected_components(count, pairs)
+            rows = np.flatnonzero(active)
+            canonical[rows] = canonical_rows(labels, quality)[rows]
+            members = rows[canonical[rows] != rows]
+            detached = ~self.similar(table, members, canonical[members], numbers, brands, sources)
+            if sources is not None:
+                # 1クラスタに同じソースの行は1つだけ(別ソースの行を介してつながった容量違いなど)
+                detached |= duplicate_sources(rows, canonical, quality, sources)[canonical[rows] != rows]
+            detached = members[detached]
+            if not len(detached):
+                break
+            canonical[detached] = detached
+            active[:] = False
+            active[detached] = True
+        return canonical
+
+
+def compatible(left, right, numbers=None, brands=None, sources=None):
+    """行の組ごとに、ブランド・数値が食い違わない(sources があれば別ソースの)組か"""
+    keep = np.ones(len(left), dtype=bool)
+    if numbers is not None:
+        keep &= numbers.compatible(left, right)
+    if brands is not None:
+        keep &= (brands[left] == brands[right]) | (brands[left] == 0) | (brands[right] == 0)
+    if sources is not None:
+        keep &= sources[left] != sources[right]
+    return keep
+
+
+def duplicate_sources(rows, canonical, quality, sources):
+    """rows のうち、同じクラスタに同じソースのより良い行(quality が大きい、同点なら前の行)がある行のマスク"""
+    quality = np.zeros(len(canonical)) if quality is None else np.asarray(quality)
+    order = np.lexsort((rows, -quality[rows], sources[rows], canonical[rows]))
+    ordered = rows[order]
+    later = np.zeros(len(rows), dtype=bool)
+    later[1:] = (canonical[ordered[1:]] == canonical[ordered[:-1]]) & (sources[ordered[1:]] == sources[ordered[:-1]])
+    mask = np.empty(len(rows), dtype=bool)
+    mask[order] = later
+    return mask
+
+
+def connected_components(count, pairs):
+    """辺のリストから各頂点の連結成分の番号(成分内の最小の頂点番号)"""
+    labels = np.arange(count)
+    if not len(pairs):
+        return labels
+    left, right = pairs[:, 0], pairs[:, 1]
+    while True:
+        smaller = np.minimum(labels[left], labels[right])
+        before = labels.copy()
+        np.minimum.at(labels, left, smaller)
+        np.minimum.at(labels, right, smaller)
+        # ポインタジャンプで代表まで縮める
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+        if np.array_equal(before, labels):
+            return labels
+
+
+def canonical_rows(labels, quality=None):
+    """クラスタごとの代表行(quality が最大、同点なら最初の行)を各行について返す"""
+    count = len(labels)
+    quality = np.zeros(count) if quality is None else np.asarray(quality)
+    rows = np.arange(count)
+    order = np.lexsort((rows, -quality, labels))
+    first = np.ones(count, dtype=bool)
+    first[1:] = labels[order[1:]] != labels[order[:-1]]
+    best = order[first]
+    # ラベル → そのクラスタの代表行
+    canonical = np.empty(count, dtype=np.int64)
+    canonical[labels[best]] = best
+    return canonical[labels]
+
+
+class NearDuplicates:
+    """
+    商品(名前・ブランド)の重複クラスタ
+
+    add() で商品を登録し、find() でクラスタを求める。add() に source を渡すと
+    別のソースの商品どうしだけを重複とみなす。単語集合は batch_size 件ごとに
+    帯のキーと単語ハッシュの配列にして捨てる。
+    clusters() は (代表行, [行...]) を2件以上のクラスタについて生成する。
+    """
+
+    def __init__(self, lsh=None, batch_size=BATCH_SIZE):
+        self.lsh = lsh or MinHashLSH()
+        self.batch_size = batch_size
+        self.pending = []
+        self.key_blocks = []
+        self.hash_blocks = []
+        self.length_blocks = []
+        self.count = 0
+        self.numbers = []
+        self.number_ids = []
+        self.number_sets = {(): 0}  # 数値のタプル → 番号
+        self.quality = []
+        self.brands = []
+        self.brand_ids = {'': 0}
+        self.brand_memo = {}  # 元のブランド → (ブランド番号, 除く単語)
+        self.sources = []
+        self.source_ids = {}
+        self.canonical = None
+
+    def add(self, name, brand=None, quality=0, source=None):
+        """商品を登録して行番号を返す(quality が大きい行ほどクラスタの代表に選ばれやすい)"""
+        try:
+            brand_id, words = self.brand_memo[brand]
+        except KeyError:
+            brand_id = self.brand_ids.setdefault(brand_key(brand), len(self.brand_ids))
+            words = brand_words(brand)
+            self.brand_memo[brand] = brand_id, words
+        tokens = product_tokens(name, words=words)
+        self.pending.append(tokens)
+        numbers = number_tokens(tokens)
+        self.numbers.append(number_mask(numbers, self.lsh.hash_token))
+        self.number_ids.append(self.number_sets.setdefault(numbers, len(self.number_sets)))
+        self.brands.append(brand_id)
+        self.quality.append(quality)
+        if source is not None:
+            self.sources.append(self.source_ids.setdefault(source, len(self.source_ids)))
+        self.count += 1
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+        return self.count - 1
+
+    def flush(self):
+        """未処理の単語集合を帯のキーと単語ハッシュにする"""
+        if self.pending:
+            hashes, lengths = self.lsh.token_hashes(self.pending)
+            self.key_blocks.append(self.lsh.band_keys(hashes, lengths, self.count - len(self.pending)))
+            self.hash_blocks.append(hashes)
+            self.length_blocks.append(lengths)
+            self.pending = []
+
+    def __len__(self):
+        return self.count
+
+    def find(self):
+        """各行のクラスタの代表行の配列"""
+        if self.sources and len(self.sources) != self.count:
+            raise ValueError("source はすべての商品に指定するか、どれにも指定しないでください")
+        self.flush()
+        if not self.count:
+            self.canonical = np.arange(0)
+            return self.canonical
+        keys = np.concatenate(self.key_blocks)
+        table = TokenTable(np.concatenate(self.hash_blocks), np.concatenate(self.length_blocks))
+        self.key_blocks, self.hash_blocks, self.length_blocks = [keys], [table.hashes], [table.lengths]
+        self.canonical = self.lsh.clusters(
+            keys, table,
+            quality=np.asarray(self.quality),
+            numbers=NumberSets(
+                np.array(self.numbers, dtype=np.uint64), np.array(self.number_ids, dtype=np.int64),
+                [frozenset(numbers) for numbers in self.number_sets],
+            ),
+            brands=np.array(self.brands, dtype=np.int32),
+            sources=np.array(self.sources, dtype=np.int32) if self.sources else None,
+        )
+        return self.canonical
+
+    def duplicated(self):
+        """代表ではない(重複として除く)行のマスク"""
+        return self.canonical != np.arange(len(self.canonical))
+
+    def clusters(self):
+        duplicated = self.duplicated()
+        members = {}
+        for row in np.flatnonzero(np.isin(self.canonical, self.canonical[duplicated])):
+            members.setdefault(int(self.canonical[row]), []).append(int(row))
+        yield from members.items()
+
+    def report(self):
+        duplicated = self.duplicated()
+        duplicates = int(duplicated.sum())
+        clusters = len(np.unique(self.canonical[duplicated]))
+        print(f"🔍 LSHの重複候補 {self.lsh.candidates:,}組 → 類似度 {self.lsh.threshold:.0%} 以上 {self.lsh.verified:,}組")
+        print(f"📊 {len(self):,}件中 {clusters:,}クラスタ・重複 {duplicates:,}件 "
+              f"(重複除去後 {len(self) - duplicates:,}件)")
@@ -0,0 +1,233 @@
+"""
+マルチプロセスでのフィルタ+整形(大きなJSONダンプ向け)
+
+生データのストリームを chunk_size 件ずつのチャンクに分けてプロセスプールに渡し、
+各ワーカーでサプリ判定・normalize()・カテゴリ判定とブランド/カテゴリの集計を1つのジョブで行う。
+結果は投入した順に取り出すので、レコードの順番は逐次処理と変わらない。
+同時に処理中のチャンクは workers * 2 個までに抑える(メモリは一定)。
+
+normalize() に渡す index は逐次処理(SupplementFilter → Normalize)と同じく、フィルタを
+通った商品だけを数えた位置。前のチャンクのフィルタ結果が揃うまで決まらないので、ワーカーでは
+DeferredIndex を渡し、位置を使った商品(名前・IDの位置からの代替値など、まれ)だけを
+親プロセスでチャンクの開始位置が決まってから整形し直す。
+ワーカー内で発行したIDとカテゴリのヒット数は親プロセスの索引・判定器にまとめ直す
+(IDの衝突はストリーム全体で確かめ、逐次処理と同じIDになる)。
+JSONの解析とチャンクの受け渡しは親プロセスで逐次に行うので、速くなるのはその分を除いた
+部分だけ(プロセス数ごとの上限は python -m ingest.bench parallel で確かめられる)。
+"""
+
+import os
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from .classify import DEFAULT_CLASSIFIER
+from .pipeline import Transform
+
+CHUNK_SIZE = 2000
+
+# ワーカープロセス内の状態(initializer で設定)
+_worker = {}
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def chunked(items, size):
+    """(開始位置, size件のリスト) を順に生成"""
+    items = iter(items)
+    start = 0
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield start, chunk
+        start += len(chunk)
+
+
+class IndexNeeded(Exception):
+    """整形にフィルタ後の位置が必要(親プロセスで整形し直す)"""
+
+
+class DeferredIndex:
+    """
+    ワーカーで normalize() に渡す、まだ決まっていない位置
+
+    足し引きはそのまま DeferredIndex を返し、文字列化・整数化された時点で IndexNeeded を送出する。
+    """
+
+    def __add__(self, other):
+        return self
+
+    __radd__ = __sub__ = __add__
+
+    def needed(self, *args):
+        raise IndexNeeded
+
+    __format__ = __str__ = __int__ = __index__ = needed
+
+
+DEFERRED_INDEX = DeferredIndex()
+
+
+class ChunkResult:
+    """1チャンク分の整形結果"""
+
+    __slots__ = ('records', 'count', 'deferred', 'brands', 'categories', 'claims', 'hits')
+
+    def __init__(self, records, count, deferred, brands, categories, claims, hits):
+        self.records = records  # 位置を使う商品の分は None
+        self.count = count  # フィルタを通った件数
+        self.deferred = deferred  # (records の位置, フィルタ後のチャンク内の位置, 商品)
+        self.brands = brands
+        self.categories = categories
+        self.claims = claims  # ワーカーで発行したID: (records の位置, prefix, ダイジェスト)
+        self.hits = hits  # ワーカーのカテゴリのヒット数(親プロセスで実行したときは None)
+
+
+def _init_worker(source, product_filter):
+    _worker['source'] = source
+    _worker['filter'] = product_filter
+    # 発行したIDを記録して親プロセスに返す
+    ids = getattr(source, 'ids', None)
+    if ids is not None:
+        ids.assigned = []
+
+
+def normalize_chunk(products, start=None, source=None, product_filter=None):
+    """
+    1チャンク分をフィルタ・整形して ChunkResult を返す
+
+    start はフィルタ後のチャンクの開始位置。None(ワーカー)なら DeferredIndex で整形し、
+    位置を使った商品とエラーになった商品は deferred に残す。
+    """
+    in_worker = source is None
+    if in_worker:
+        source, product_filter = _worker['source'], _worker['filter']
+        DEFAULT_CLASSIFIER.reset()
+    ids = getattr(source, 'ids', None)
+    assigned = ids.assigned if ids is not None and ids.assigned is not None else None
+    records = []
+    deferred = []
+    brands = Counter()
+    categories = Counter()
+    claims = []
+    count = 0
+    for product in products:
+        if product_filter is not None and not product_filter.matches(product):
+            continue
+        offset = count
+        count += 1
+        if assigned is not None:
+            assigned.clear()
+        if start is None:
+            hits = DEFAULT_CLASSIFIER.hits[:]
+            try:
+                record = source.normalize(product, DEFERRED_INDEX)
+            except Exception:
+                # 位置を使う商品(と、位置付きで報告するエラー)は親プロセスで整形し直す。
+                # 途中まで数えたカテゴリは戻す
+                DEFAULT_CLASSIFIER.hits = hits
+                deferred.append((len(records), offset, product))
+                records.append(None)
+                continue
+        else:
+            try:
+                record = source.normalize(product, start + offset)
+            except Exception as e:
+                print(f"⚠️ 商品 {start + offset} 処理エラー: {e}")
+                continue
+        if record is None:
+            continue
+        if assigned:
+            claims.extend((len(records), prefix, digest)
+                          for dsld_id, prefix, digest in assigned if dsld_id == record['dsld_id'])
+        records.append(record)
+        brands[record['brand']] += 1
+        categories[record['category']] += 1
+    return ChunkResult(records, count, deferred, brands, categories, claims,
+                       DEFAULT_CLASSIFIER.hits if in_worker else None)
+
+
+class ParallelNormalize(Transform):
+    """
+    SupplementFilter + Normalize (+ BrandStats の集計) をプロセスプールで実行
+
+    source の設定(キー推定の結果など)は最初のチャンクを読んだ後に各ワーカーへ1回だけ渡す。
+    workers=1 ならプロセスを起動せずに同じ処理を逐次で行う。
+    """
+
+    def __init__(self, source, product_filter=None, stats=None, workers=None, chunk_size=CHUNK_SIZE):
+        self.source = source
+        self.product_filter = product_filter
+        self.stats = stats
+        self.workers = workers or default_workers()
+        self.chunk_size = chunk_size
+
+    def merge(self, result, start):
+        """チャンクの結果をまとめ、レコードのリストを返す(start はフィルタ後のチャンクの開始位置)"""
+        records = result.records
+        brands, categories = result.brands, result.categories
+        if result.hits is not None:
+            DEFAULT_CLASSIFIER.merge(result.hits)
+        # ワーカーで発行したIDを、全体の索引で衝突を確かめて確定する
+        ids = getattr(self.source, 'ids', None)
+        for position, prefix, digest in result.claims:
+            records[position].dsld_id = ids.claim(prefix, digest)
+        # 位置を使う商品は、位置が決まったここで整形する
+        for position, offset, product in result.deferred:
+            index = start + offset
+            try:
+                record = self.source.normalize(product, index)
+            except Exception as e:
+                print(f"⚠️ 商品 {index} 処理エラー: {e}")
+                continue
+            if record is not None:
+                records[position] = record
+                brands[record['brand']] += 1
+                categories[record['category']] += 1
+        if result.deferred:
+            records = [record for record in records if record is not None]
+        if self.stats is not None:
+            self.stats.merge(brands, categories)
+        return records
+
+    def __call__(self, products):
+        chunks = (chunk for _, chunk in chunked(products, self.chunk_size))
+        if self.workers == 1:
+            index = 0
+            for chunk in chunks:
+                result = normalize_chunk(chunk, index, self.source, self.product_filter)
+                yield from self.merge(result, index)
+                index += result.count
+        else:
+            yield from self.run_pool(chunks)
+        if self.stats is not None:
+            self.stats.report()
+
+    def run_pool(self, chunks):
+        # 最初のチャンクを読んだ時点でソースのキー推定が終わっている
+        first = next(chunks, None)
+        if first is None:
+            return
+        print(f"⚙️ {self.workers}プロセスで整形中 (チャンク {self.chunk_size:,}件)")
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_init_worker, initargs=(self.source, self.product_filter)
+        )
+        pending = deque()
+        index = 0
+        try:
+            pending.append(executor.submit(normalize_chunk, first))
+            for chunk in chunks:
+                if len(pending) >= self.workers * 2:
+                    result = pending.popleft().result()
+                    yield from self.merge(result, index)
+                    index += result.count
+                pending.append(executor.submit(normalize_chunk, chunk))
+            while pending:
+                result = pending.popleft().result()
+                yield from self.merge(result, index)
+                index += result.count
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,86 @@
+"""
+パイプライン本体: Source / Transform / Sink の基底クラスと実行器
+"""
+
+
+class Source:
+    """生の商品データを1件ずつ生成するステージ"""
+
+    name = 'source'
+
+    def __iter__(self):
+        raise NotImplementedError
+
+    def normalize(self, product, index):
+        """生データを出力レコード(dict)に整形。対象外ならNoneを返す"""
+        raise NotImplementedError
+
+
+class Transform:
+    """レコードのストリームを受け取りストリームを返すステージ"""
+
+    def apply(self, record):
+        """1件を変換。Noneを返すとそのレコードは捨てられる"""
+        return record
+
+    def __call__(self, records):
+        for record in records:
+            result = self.apply(record)
+            if result is not None:
+                yield result
+
+
+class Sink:
+    """レコードを書き出すステージ"""
+
+    def open(self):
+        pass
+
+    def write(self, record):
+        raise NotImplementedError
+
+    def finish(self):
+        """ストリームを最後まで処理できたときだけ close() の前に呼ばれる"""
+        pass
+
+    def close(self):
+        pass
+
+
+class Pipeline:
+    """Source → Transform群 → Sink群 をジェネレータで連結"""
+
+    def __init__(self, source, transforms=(), sinks=(), progress_every=1000):
+        self.source = source
+        self.transforms = list(transforms)
+        self.sinks = list(sinks)
+        self.progress_every = progress_every
+
+    def stream(self):
+        """変換済みレコードのジェネレータ(Sinkを介さず使う場合)"""
+        records = iter(self.source)
+        for transform in self.transforms:
+            records = transform(records)
+        return records
+
+    def run(self):
+        """パイプラインを最後まで流して書き出し件数を返す"""
+        for sink in self.sinks:
+            sink.open()
+
+        count = 0
+        try:
+            for record in self.stream():
+                for sink in self.sinks:
+                    sink.write(record)
+                count += 1
+                if self.progress_every and count % self.progress_every == 0:
+                    print(f"⏳ {count:,}件 処理中...")
+            for sink in self.sinks:
+                sink.finish()
+        finally:
+            for sink in self.sinks:
+                sink.close()
+
+        print(f"✅ {count:,}件の商品を処理完了")
+        return count
@@ -0,0 +1,52 @@
+"""
+トークンバケットによるレート制限(スレッドセーフ)
+
+複数スレッドから同じAPIを叩くときに、全体のリクエスト数を公開レート以下に抑える。
+"""
+
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    rate: 1秒あたりに補充されるトークン数
+    capacity: 溜められるトークンの上限(=最大バースト)
+    """
+
+    def __init__(self, rate, capacity=1, clock=time.monotonic, sleep=time.sleep):
+        if rate <= 0:
+            raise ValueError("rate は正の数で指定してください")
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = capacity
+        self.updated = clock()
+        self.lock = threading.Lock()
+        self.waited = 0.0
+
+    @classmethod
+    def per_minute(cls, requests, capacity=1, **kwargs):
+        """1分あたりのリクエスト数で指定"""
+        return cls(requests / 60, capacity, **kwargs)
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens=1):
+        """トークンが溜まるまで待ってから消費し、待った秒数を返す"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    self.waited += waited
+                    return waited
+                wait = (tokens - self.tokens) / self.rate
+            # 待機中は他のスレッドもロックを取れるよう、ロックの外で眠る
+            self.sleep(wait)
+            waited += wait
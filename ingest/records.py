@@ -0,0 +1,69 @@
+"""
+整形済みの商品レコード
+
+dict の代わりに __slots__ のクラスで持ち、1件ごとのキー表を持たない。
+ブランド・カテゴリ・容量のように同じ値が大量に繰り返される文字列は intern して
+1つの文字列を共有する。name_ja は翻訳されるまで name_en をそのまま返す(別に保持しない)。
+Sink などからは読み取り専用の Mapping(record['brand'], record.get('upc'))として扱える。
+"""
+
+import sys
+from collections.abc import Mapping
+
+# 出力順のフィールド(name_ja 以降の任意フィールドはソースによって有無が異なる)
+FIELDS = ('dsld_id', 'name_en', 'name_ja', 'brand', 'serving_size', 'category',
+          'barcode', 'upc', 'fdc_id', 'brand_owner', 'data_type')
+
+DEFAULT_SERVING_SIZE = '1 serving'
+
+
+def intern_value(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+class Product(Mapping):
+    """1商品分の出力レコード"""
+
+    __slots__ = ('dsld_id', 'name_en', '_name_ja', 'brand', 'serving_size', 'category',
+                 'barcode', 'upc', 'fdc_id', 'brand_owner', 'data_type')
+
+    def __init__(self, dsld_id, name_en, brand, category, serving_size=DEFAULT_SERVING_SIZE, name_ja=None,
+                 **extra):
+        self.dsld_id = dsld_id
+        self.name_en = name_en
+        self._name_ja = None if name_ja == name_en else name_ja
+        self.brand = intern_value(brand)
+        self.serving_size = intern_value(serving_size)
+        self.category = intern_value(category)
+        for key, value in extra.items():
+            if key not in FIELDS:
+                raise TypeError(f"Product に {key!r} フィールドはありません")
+            setattr(self, key, intern_value(value) if key == 'brand_owner' else value)
+
+    @property
+    def name_ja(self):
+        return self.name_en if self._name_ja is None else self._name_ja
+
+    @name_ja.setter
+    def name_ja(self, value):
+        self._name_ja = None if value == self.name_en else value
+
+    def __getitem__(self, key):
+        if key not in FIELDS:
+            raise KeyError(key)
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            # このソースでは設定されていない任意フィールド
+            raise KeyError(key) from None
+
+    def __iter__(self):
+        for key in FIELDS:
+            if key == 'name_ja' or hasattr(self, key):
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"Product({dict(self)!r})"
@@ -0,0 +1,208 @@
+"""
+ソースのキー/カラムの推定(サンプリング)と、推定結果の保存
+
+先頭の SAMPLE_WINDOW 件からリザーバーサンプリングで SAMPLE_SIZE 件を選び、
+名前のヒントに合う候補のキーを「充足率 × 値の形式」で採点して役割ごとに1つ選ぶ。
+(例: UPCは数字だけの8〜14桁、商品名はURLや数字だけではない適度な長さの文字列、
+カテゴリはブランドと同じ値ばかりのキーを避ける)
+
+推定結果はソース名とキーの一覧から作ったフィンガープリントごとに SchemaStore に保存し、
+次回同じ構造の入力なら推定を省略する。保存ファイルを書き換えればマッピングを手で直せる。
+"""
+
+import hashlib
+import json
+import os
+import random
+
+from .ids import detect_identity_keys
+
+SCHEMA_PATH = 'ingest_schema.json'
+
+# 推定に使う先頭の件数と、その中から選ぶサンプル数
+SAMPLE_WINDOW = 5000
+SAMPLE_SIZE = 500
+SAMPLE_SEED = 0
+
+# 役割 → キー名に含まれるべき語(推定は上から順に行い、選ばれたキーは後の役割の候補から外す)
+ROLE_HINTS = {
+    'name': ('name', 'title', 'product'),
+    'brand': ('brand',),
+    'upc': ('upc', 'barcode', 'gtin', 'code', 'sku'),
+    'category': ('category', 'section', 'type'),
+}
+
+ROLE_LABELS = {
+    'name': '🏷️  商品名',
+    'brand': '🏢 ブランド',
+    'upc': '🏷️  UPC',
+    'category': '📂 カテゴリ',
+}
+
+MAX_NAME_LENGTH = 300
+MAX_BRAND_LENGTH = 100
+MAX_CATEGORY_LENGTH = 200
+
+
+def reservoir_sample(items, k=SAMPLE_SIZE, rng=None):
+    """items から一様に k 件を選ぶ(1パス・k件分のメモリ)。順番は入力順"""
+    rng = rng or random.Random(SAMPLE_SEED)
+    reservoir = []
+    for i, item in enumerate(items):
+        if i < k:
+            reservoir.append((i, item))
+        else:
+            j = rng.randint(0, i)
+            if j < k:
+                reservoir[j] = (i, item)
+    reservoir.sort(key=lambda pair: pair[0])
+    return [item for _, item in reservoir]
+
+
+def value_text(value):
+    """値を比較用の文字列に(欠損・NaNは空文字)"""
+    if value is None or value != value:
+        return ''
+    text = str(value).strip()
+    return '' if text == 'nan' else text
+
+
+def is_url(text):
+    return text.startswith(('http://', 'https://', 'www.'))
+
+
+def is_barcode(text):
+    return text.isdigit() and 8 <= len(text) <= 14
+
+
+def is_label(text, limit):
+    """URLや数字だけではない、limit 文字以下の文字列"""
+    return len(text) <= limit and any(c.isalpha() for c in text) and not is_url(text)
+
+
+def score_key(role, values, chosen):
+    """(充足率, 形式の適合率, スコア)。chosen は選択済みの役割 → そのキーの値"""
+    filled = [(i, value) for i, value in enumerate(values) if value]
+    if not values or not filled:
+        return 0.0, 0.0, 0.0
+    fill = len(filled) / len(values)
+    if role == 'name':
+        shape = sum(is_label(value, MAX_NAME_LENGTH) and len(value) >= 3 for _, value in filled)
+    elif role == 'brand':
+        shape = sum(is_label(value, MAX_BRAND_LENGTH) for _, value in filled)
+    elif role == 'upc':
+        shape = sum(is_barcode(value) for _, value in filled)
+    else:
+        # ブランドと同じ値が入っているカテゴリ列(例: iHerbの 'Category 1')は選ばない
+        brands = chosen.get('brand')
+        shape = sum(
+            is_label(value, MAX_CATEGORY_LENGTH) and not (brands and brands[i] == value)
+            for i, value in filled
+        )
+    shape /= len(filled)
+    return fill, shape, fill * shape
+
+
+def infer_schema(keys, rows):
+    """
+    サンプルの行(dict または Mapping)から役割ごとのキーを選ぶ
+
+    ヒントに合う候補がすべて0点なら、従来どおり最初の候補を選ぶ。
+    sku/url は detect_identity_keys() で選ぶ。
+    """
+    keys = list(keys)
+    columns = {}
+    mapping = {}
+    chosen = {}
+    for role, hints in ROLE_HINTS.items():
+        candidates = [
+            key for key in keys
+            if key not in mapping.values() and any(hint in str(key).lower() for hint in hints)
+        ]
+        scored = []
+        for key in candidates:
+            if key not in columns:
+                columns[key] = [value_text(row.get(key)) for row in rows]
+            scored.append((key, *score_key(role, columns[key], chosen)))
+        # 同点なら先に現れたキー
+        best = max(scored, key=lambda item: item[3], default=None)
+        mapping[role] = best[0] if best else None
+        if best:
+            chosen[role] = columns[best[0]]
+        summary = ', '.join(f"{key}={total:.2f}" for key, _, _, total in scored)
+        if best:
+            print(f"{ROLE_LABELS[role]}: {best[0]} (充足率 {best[1]:.0%}, 形式 {best[2]:.0%}) 候補: [{summary}]")
+        else:
+            print(f"{ROLE_LABELS[role]}: なし")
+    mapping['sku'], mapping['url'] = detect_identity_keys(keys)
+    return mapping
+
+
+def fingerprint(source, keys):
+    """ソース名とキーの一覧(順不同)から作る構造のフィンガープリント"""
+    text = '\x1f'.join([source, *sorted(str(key) for key in keys)])
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class SchemaStore:
+    """
+    フィンガープリント → 推定済みのマッピング(JSONファイル)
+
+    refresh=True なら保存済みのマッピングを使わずに推定し直して上書きする。
+    """
+
+    def __init__(self, path=SCHEMA_PATH, refresh=False):
+        self.path = path
+        self.refresh = refresh
+        self.hits = 0
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.mappings = json.load(f)
+        else:
+            self.mappings = {}
+
+    def get(self, source, keys):
+        if self.refresh:
+            return None
+        entry = self.mappings.get(fingerprint(source, keys))
+        if entry is None:
+            return None
+        # 保存後にキー名が変わっていないか(手で書き換えた場合も含めて)確認
+        mapping = entry['mapping']
+        if any(key is not None and key not in keys for key in mapping.values()):
+            return None
+        self.hits += 1
+        return mapping
+
+    def put(self, source, keys, mapping):
+        self.mappings[fingerprint(source, keys)] = {
+            'source': source,
+            'keys': [str(key) for key in keys],
+            'mapping': mapping,
+        }
+        partial = self.path + '.partial'
+        with open(partial, 'w', encoding='utf-8') as f:
+            json.dump(self.mappings, f, ensure_ascii=False, indent=2)
+        os.replace(partial, self.path)
+
+
+def detect_schema(source, keys, sample, store=None):
+    """
+    保存済みのマッピングがあればそれを、なければ sample() のサンプルから推定して保存する
+
+    sample はサンプルの行のリストを返す関数(保存済みなら呼ばない)。
+    """
+    keys = list(keys)
+    if store is not None:
+        mapping = store.get(source, keys)
+        if mapping is not None:
+            print(f"📐 保存済みのマッピングを使用 ({store.path}): "
+                  + ', '.join(f"{role}={key}" for role, key in mapping.items()))
+            return mapping
+    rows = sample()
+    print(f"🔍 {len(rows):,}件のサンプルからキーを推定中...")
+    mapping = infer_schema(keys, rows)
+    if store is not None:
+        store.put(source, keys, mapping)
+        print(f"💾 マッピングを保存: {store.path}")
+    return mapping
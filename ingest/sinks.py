@@ -0,0 +1,411 @@
+"""
+共通Sinkステージ(SQL / CSV)
+
+SQLは2形式:
+- SqlInsertSink: 複数行INSERT文(Supabase SQLエディタでそのまま実行できる)
+- SqlCopySink: COPY ... FROM STDIN(psql用。大量投入はこちらが速い)
+
+投入モードは2種類:
+- replace: 既存データを削除してから全件投入(従来どおり)
+- upsert: 一時テーブルに全件入れてから dsld_id で突き合わせ、内容が変わった行だけ
+  INSERT/UPDATE する。user_supplements は削除しない。tombstone=True なら今回の
+  取り込みに含まれなかった自分の行に discontinued_at を付ける
+
+snapshot を指定すると(upsertモードのみ)、前回の実行から追加・変更された行だけを
+書き出し、消えた行は discontinued_at で廃番扱いにする(ingest.snapshot)。
+差分はSQLファイルを投入してから `python -m ingest.snapshot apply <SQLファイル>` で確定する。
+"""
+
+import csv
+import os
+from datetime import datetime
+
+from .pipeline import Sink
+from .snapshot import SnapshotStore
+
+SUPPLEMENT_COLUMNS = ('dsld_id', 'name_en', 'name_ja', 'brand', 'serving_size', 'category')
+
+WIPE_TABLES = ('user_supplements', 'supplement_nutrients', 'supplements', 'nutrients')
+
+# ユーザー検索用特別商品
+SPECIAL_PRODUCTS_SQL = """
+-- ユーザー検索用特別商品
+INSERT INTO supplements (dsld_id, name_en, name_ja, brand, serving_size, category) VALUES
+('DSLD_19121619', 'NOW Foods Vitamin C-1000 Sustained Release', 'NOW Foods ビタミンC-1000 徐放性', 'NOW Foods', '1 tablet', 'vitamins')
+ON CONFLICT (dsld_id) DO NOTHING;
+"""
+
+# upsertモードの一時テーブル
+UPSERT_STAGE_TABLE = 'supplements_import'
+UPSERT_KEY = 'dsld_id'
+
+# スナップショットとの差分を取る単位
+SNAPSHOT_CHUNK = 1000
+
+# SQLファイル書き出しのバッファサイズ
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# 値の種類が少ないカラムはエスケープ結果をキャッシュする
+QUOTE_CACHE_COLUMNS = ('brand', 'serving_size', 'category')
+QUOTE_CACHE_LIMIT = 100000
+
+
+def sql_quote(value):
+    """SQL文字列リテラルとしてエスケープ(NoneはNULL、NUL文字は除去)"""
+    if value is None:
+        return 'NULL'
+    text = str(value)
+    if '\x00' in text:
+        text = text.replace('\x00', '')
+    return "'" + text.replace("'", "''") + "'"
+
+
+# COPY テキスト形式で特殊な文字(NUL文字は除去)
+COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r', '\x00': None})
+
+
+def copy_quote(value):
+    """COPY テキスト形式の1フィールドとしてエスケープ(Noneは \\N)"""
+    if value is None:
+        return '\\N'
+    return str(value).translate(COPY_ESCAPES)
+
+
+def copy_path(path):
+    """INSERT形式のファイル名からCOPY形式のファイル名(import_x.sql → import_x.copy.sql)"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.copy{ext or '.sql'}"
+
+
+PARTIAL_SUFFIX = '.partial'
+
+
+class FileSink(Sink):
+    """
+    ファイルに書き出すSinkの基底
+
+    書き込み中は path + '.partial' に書き、ストリームを最後まで処理できたとき
+    (finish)だけ path に置き換える。取得エラーなどで途中終了した取り込みが
+    完全なデータとして残らないようにする。
+    """
+
+    path = None
+    finished = False
+
+    @property
+    def partial_path(self):
+        return self.path + PARTIAL_SUFFIX
+
+    def open_file(self, **kwargs):
+        self.finished = False
+        return open(self.partial_path, 'w', **kwargs)
+
+    def finish(self):
+        self.finished = True
+
+    def commit_file(self):
+        """完了していれば本来のファイル名に置き換える"""
+        if self.finished:
+            os.replace(self.partial_path, self.path)
+            print(f"✅ {self.path} を生成完了")
+        else:
+            print(f"⚠️ 処理が途中で終了したため {self.partial_path} に書き出しました"
+                  f"({self.path} は更新していません)")
+
+
+class SqlInsertSink(FileSink):
+    """
+    supplementsテーブル用のINSERT文を書き出す
+
+    各行はエスケープしてすぐにバッファ付きファイルへ書き込み、batch_size 行ごとに
+    INSERT文を区切る。メモリ使用量は件数にもバッチサイズにも依存しない。
+    """
+
+    def __init__(self, path, title, footer='', wipe_tables=WIPE_TABLES,
+                 batch_size=1000, table='supplements', columns=SUPPLEMENT_COLUMNS,
+                 buffer_size=WRITE_BUFFER_SIZE, mode='replace', tombstone=False, source_name=None,
+                 snapshot=None):
+        if mode not in ('replace', 'upsert'):
+            raise ValueError(f"未対応の投入モード: {mode}")
+        if tombstone and mode != 'upsert':
+            raise ValueError("tombstone は upsert モードでのみ使えます")
+        if snapshot and mode != 'upsert':
+            raise ValueError("snapshot は upsert モードでのみ使えます")
+        if mode == 'upsert' and UPSERT_KEY not in columns:
+            raise ValueError(f"upsert モードには {UPSERT_KEY} カラムが必要です")
+        self.path = path
+        self.title = title
+        self.footer = footer
+        self.wipe_tables = wipe_tables
+        self.batch_size = batch_size
+        self.mode = mode
+        self.tombstone = tombstone
+        self.snapshot = snapshot
+        self.store = None
+        self.pending = []
+        # upsert/tombstone で「自分の行」を見分ける名前(省略時は出力ファイル名)
+        self.source_name = source_name or os.path.splitext(os.path.basename(path))[0]
+        self.target = table
+        self.table = UPSERT_STAGE_TABLE if mode == 'upsert' else table
+        self.columns = columns
+        self.buffer_size = buffer_size
+        self.insert_header = f"INSERT INTO {self.table} ({', '.join(columns)}) VALUES\n"
+        self.file = None
+        self.batch_rows = 0
+        self.batch_count = 0
+        self.total = 0
+        self.quote_cache = {}
+
+    escape = staticmethod(sql_quote)
+
+    def open(self):
+        if self.snapshot:
+            self.store = SnapshotStore(self.columns, self.snapshot, self.source_name, UPSERT_KEY)
+            self.pending = []
+        self.file = self.open_file(encoding='utf-8', buffering=self.buffer_size)
+        self.file.write(f"-- {self.title}\n")
+        self.file.write(f"-- 処理日時: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        if self.mode == 'upsert':
+            self.file.write(self.upsert_prologue())
+            self.file.write(f"\n-- 全商品を一時テーブル {self.table} に投入\n")
+            return
+        if self.wipe_tables:
+            self.file.write("\n-- 既存データを完全削除\n")
+            for table in self.wipe_tables:
+                self.file.write(f"DELETE FROM {table};\n")
+        self.file.write("\n-- 全商品を投入\n")
+
+    def upsert_prologue(self):
+        """upsert用の管理カラム追加と一時テーブル作成"""
+        columns = ', '.join(f"{column} TEXT" for column in self.columns)
+        return (
+            f"\n-- 差分投入(upsert): 変更のあった商品だけ更新し、ユーザーデータは残す\n"
+            f"ALTER TABLE {self.target} ADD COLUMN IF NOT EXISTS import_source TEXT;\n"
+            f"ALTER TABLE {self.target} ADD COLUMN IF NOT EXISTS discontinued_at TIMESTAMP;\n"
+            f"DROP TABLE IF EXISTS {self.table};\n"
+            f"CREATE TEMP TABLE {self.table} (seq BIGSERIAL, {columns});\n"
+        )
+
+    def upsert_epilogue(self):
+        """一時テーブルから本テーブルへの反映(内容が同じ行は更新しない)と廃番処理"""
+        target = self.target
+        columns = ', '.join(self.columns)
+        values = [column for column in self.columns if column != UPSERT_KEY] + ['import_source']
+        assignments = ',\n    '.join(f"{column} = EXCLUDED.{column}" for column in values)
+        current = ', '.join(f"{target}.{column}" for column in values)
+        excluded = ', '.join(f"EXCLUDED.{column}" for column in values)
+        source = sql_quote(self.source_name)
+
+        sql = (
+            f"\n-- 変更分だけ反映(同じdsld_idが複数あれば後の行を採用)\n"
+            f"INSERT INTO {target} ({columns}, import_source)\n"
+            f"SELECT DISTINCT ON ({UPSERT_KEY}) {columns}, {source}\n"
+            f"FROM {self.table}\n"
+            f"ORDER BY {UPSERT_KEY}, seq DESC\n"
+            f"ON CONFLICT ({UPSERT_KEY}) DO UPDATE SET\n"
+            f"    {assignments},\n"
+            f"    discontinued_at = NULL,\n"
+            f"    updated_at = NOW()\n"
+            f"WHERE ({current}) IS DISTINCT FROM ({excluded})\n"
+            f"   OR {target}.discontinued_at IS NOT NULL;\n"
+        )
+        if self.store is not None:
+            if self.finished:
+                sql += self.snapshot_tombstones()
+        # 0件の取り込み(取得失敗など)で全商品を廃番にしない
+        elif self.tombstone and self.total:
+            sql += (
+                f"\n-- 今回の取り込みに含まれなかった {self.source_name} の商品を廃番扱いにする\n"
+                f"UPDATE {target} SET discontinued_at = NOW(), updated_at = NOW()\n"
+                f"WHERE import_source = {source}\n"
+                f"  AND discontinued_at IS NULL\n"
+                f"  AND NOT EXISTS (SELECT 1 FROM {self.table} s WHERE s.{UPSERT_KEY} = {target}.{UPSERT_KEY});\n"
+            )
+        return sql + f"\nDROP TABLE {self.table};\n"
+
+    def snapshot_tombstones(self):
+        """スナップショットで削除と判定された商品を廃番扱いにするUPDATE文"""
+        sql = ''
+        ids = []
+        for dsld_id in self.store.deleted_ids():
+            ids.append(sql_quote(dsld_id))
+            if len(ids) >= self.batch_size:
+                sql += self.tombstone_statement(ids)
+                ids = []
+        if ids:
+            sql += self.tombstone_statement(ids)
+        if sql:
+            sql = f"\n-- 前回の実行から消えた {self.source_name} の商品を廃番扱いにする\n" + sql
+        return sql
+
+    def tombstone_statement(self, literals):
+        # 同じ dsld_id を共有する他のソースの商品は廃番にしない(--tombstone と同じ条件)
+        return (
+            f"UPDATE {self.target} SET discontinued_at = NOW(), updated_at = NOW()\n"
+            f"WHERE import_source = {sql_quote(self.source_name)}\n"
+            f"  AND discontinued_at IS NULL AND {UPSERT_KEY} IN ({', '.join(literals)});\n"
+        )
+
+    def quote(self, column, value):
+        """カラム値をエスケープ(低カーディナリティのカラムはキャッシュ)"""
+        if column not in QUOTE_CACHE_COLUMNS:
+            return self.escape(value)
+        quoted = self.quote_cache.get(value)
+        if quoted is None:
+            quoted = self.escape(value)
+            if len(self.quote_cache) < QUOTE_CACHE_LIMIT:
+                self.quote_cache[value] = quoted
+        return quoted
+
+    def literals(self, record):
+        """1行分のエスケープ済み値。直前のカラムと同じ値(name_en/name_ja)は再エスケープしない"""
+        values = []
+        previous = literal = None
+        for column in self.columns:
+            value = record[column]
+            if literal is None or value is not previous:
+                literal = self.quote(column, value)
+                previous = value
+            values.append(literal)
+        return values
+
+    def render(self, record):
+        """1行分の VALUES タプル"""
+        return f"({', '.join(self.literals(record))})"
+
+    def write(self, record):
+        if self.store is None:
+            self.write_row(record)
+            return
+        self.pending.append(record)
+        if len(self.pending) >= SNAPSHOT_CHUNK:
+            self.flush_pending()
+
+    def flush_pending(self):
+        """溜めたレコードのうちスナップショットから変わったものだけ書き出す"""
+        for record in self.store.diff(self.pending):
+            self.write_row(record)
+        self.pending = []
+
+    def finish(self):
+        if self.store is not None:
+            self.flush_pending()
+        super().finish()
+
+    def write_row(self, record):
+        row = self.render(record)
+        if self.batch_rows == 0:
+            self.batch_count += 1
+            self.file.write(f"\n-- バッチ {self.batch_count}\n")
+            self.file.write(self.insert_header)
+            self.file.write(row)
+        else:
+            self.file.write(",\n")
+            self.file.write(row)
+        self.batch_rows += 1
+        self.total += 1
+        if self.batch_rows >= self.batch_size:
+            self.end_batch()
+
+    def end_batch(self):
+        if self.batch_rows:
+            self.file.write(";\n")
+            self.batch_rows = 0
+
+    def close(self):
+        if self.file is None:
+            return
+        self.end_batch()
+        if self.mode == 'upsert':
+            self.file.write(self.upsert_epilogue())
+        self.file.write(f"\n-- 総商品数: {self.total:,}件\n")
+        self.file.write(self.footer)
+        self.file.close()
+        self.file = None
+        self.commit_file()
+        if self.store is not None:
+            self.close_snapshot()
+
+    def close_snapshot(self):
+        """最後まで処理できたときだけ差分を保留中として保存する(確定はSQLファイルの投入後)"""
+        if self.finished:
+            staged = self.store.stage(self.path)
+            self.store.report()
+            if staged:
+                print(f"📋 差分は未確定です。{self.path} の投入に成功したら "
+                      f"`python -m ingest.snapshot apply {self.path}` で確定してください"
+                      f"(load-into-postgres.sh は自動で確定します)")
+        else:
+            self.store.rollback()
+            print(f"⚠️ 処理が途中で終了したため {self.snapshot} は更新しません")
+        self.store.close()
+        self.store = None
+
+
+class SqlCopySink(SqlInsertSink):
+    """
+    supplementsテーブル用の COPY ... FROM STDIN(テキスト形式)を書き出す
+
+    psql -f で実行する(Supabase SQLエディタはSTDINを扱えない)。
+    全行を1つのCOPYにまとめるので batch_size は使わない。
+    """
+
+    escape = staticmethod(copy_quote)
+
+    def __init__(self, path, title, **kwargs):
+        super().__init__(path, title, **kwargs)
+        self.insert_header = f"\nCOPY {self.table} ({', '.join(self.columns)}) FROM STDIN;\n"
+
+    def render(self, record):
+        return '\t'.join(self.literals(record))
+
+    def write_row(self, record):
+        if self.batch_rows == 0:
+            self.batch_count += 1
+            self.file.write(self.insert_header)
+        self.file.write(self.render(record))
+        self.file.write('\n')
+        self.batch_rows += 1
+        self.total += 1
+
+    def end_batch(self):
+        if self.batch_rows:
+            self.file.write("\\.\n")
+            self.batch_rows = 0
+
+
+def sql_sink(path, title, copy=False, **kwargs):
+    """INSERT形式、または copy=True ならCOPY形式(ファイル名は copy_path(path))のSQL Sink"""
+    kwargs.setdefault('source_name', os.path.splitext(os.path.basename(path))[0])
+    if copy:
+        return SqlCopySink(copy_path(path), title, **kwargs)
+    return SqlInsertSink(path, title, **kwargs)
+
+
+class CsvSink(FileSink):
+    """レコードをCSVに書き出す(fieldnames省略時は最初のレコードのキー)"""
+
+    def __init__(self, path, fieldnames=None):
+        self.path = path
+        self.fieldnames = fieldnames
+        self.file = None
+        self.writer = None
+
+    def open(self):
+        self.file = self.open_file(newline='', encoding='utf-8')
+
+    def write(self, record):
+        if self.writer is None:
+            fieldnames = self.fieldnames or list(record.keys())
+            self.writer = csv.DictWriter(self.file, fieldnames=fieldnames, extrasaction='ignore',
+                                         lineterminator='\n')
+            self.writer.writeheader()
+        self.writer.writerow(record)
+
+    def close(self):
+        if self.file is None:
+            return
+        self.file.close()
+        self.file = None
+        self.writer = None
+        self.commit_file()
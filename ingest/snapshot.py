@@ -0,0 +1,230 @@
+"""
+実行間の変更検出用スナップショット(SQLite)
+
+dsld_id ごとに出力レコードの内容ハッシュを保存しておき、次回の実行では
+追加・変更された行と、今回現れなかった(削除された)dsld_id だけを取り出す。
+スコープ(取り込みスクリプトごとの名前)単位で管理するので、1つのファイルを
+複数のスクリプトで共有できる。
+
+差分はSQLファイルをデータベースに投入して初めて反映されるので、生成時には
+「保留中」として保存するだけにし、投入に成功してから apply で確定する。
+
+  python -m ingest.snapshot apply <SQLファイル>     投入成功後に確定(load-into-postgres.sh が実行)
+  python -m ingest.snapshot discard <SQLファイル>   投入しないSQLファイルの保留分を捨てる
+  python -m ingest.snapshot status                  保留中の差分の一覧
+
+確定していない保留分は、同じスコープで次に生成したときに捨てられ、
+前回確定したスナップショットとの差分を取り直す(投入しなかった削除も失われない)。
+"""
+
+import hashlib
+import os
+import sqlite3
+import sys
+
+SNAPSHOT_PATH = 'ingest_snapshot.sqlite'
+
+# 1回の問い合わせで引くdsld_idの数(SQLiteのプレースホルダー上限より小さく)
+LOOKUP_CHUNK = 500
+
+# ハッシュ計算時のカラム区切り(値に現れない制御文字)
+FIELD_SEPARATOR = '\x1f'
+
+
+def content_hash(record, columns):
+    """出力カラムの内容ハッシュ(16バイトのhex)"""
+    text = FIELD_SEPARATOR.join('' if record.get(c) is None else str(record[c]) for c in columns)
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def connect(path):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    # snapshots: 投入済み(確定)の内容 / pending: 生成したが未投入の実行の内容
+    for table in ('snapshots', 'pending'):
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            " scope TEXT NOT NULL, dsld_id TEXT NOT NULL, hash TEXT NOT NULL, run INTEGER NOT NULL,"
+            " PRIMARY KEY (scope, dsld_id))"
+        )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS pending_runs ("
+        " scope TEXT PRIMARY KEY, output TEXT NOT NULL, run INTEGER NOT NULL, rows INTEGER NOT NULL)"
+    )
+    conn.commit()
+    return conn
+
+
+class SnapshotStore:
+    """
+    dsld_id → 内容ハッシュ のスナップショット
+
+    diff() でチャンクごとに確定済みのスナップショットとの差分を取り、最後まで処理できたら
+    stage() で保留中として保存、途中で失敗したら rollback() する。
+    保留分は SQLファイルの投入後に apply() で確定する。
+    """
+
+    def __init__(self, columns, path=SNAPSHOT_PATH, scope='default', key='dsld_id'):
+        self.path = path
+        self.scope = scope
+        self.columns = columns
+        self.key = key
+        self.conn = connect(path)
+        (last_run,) = self.conn.execute(
+            "SELECT MAX(COALESCE((SELECT MAX(run) FROM snapshots WHERE scope = ?), 0),"
+            "           COALESCE((SELECT run FROM pending_runs WHERE scope = ?), 0))",
+            (scope, scope),
+        ).fetchone()
+        self.run = last_run + 1
+        # 投入されなかった前回の保留分は捨てる(確定済みとの差分を取り直す)
+        self.stale = self.conn.execute("SELECT output FROM pending_runs WHERE scope = ?", (scope,)).fetchone()
+        self.conn.execute("DELETE FROM pending WHERE scope = ?", (scope,))
+        self.conn.execute("DELETE FROM pending_runs WHERE scope = ?", (scope,))
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.deleted = 0
+
+    @property
+    def seen(self):
+        return self.inserted + self.updated + self.unchanged
+
+    def known_hashes(self, ids):
+        """dsld_id の列に対するハッシュ(今回すでに現れたものは今回の値、なければ確定済みの値)"""
+        known = {}
+        for start in range(0, len(ids), LOOKUP_CHUNK):
+            chunk = ids[start:start + LOOKUP_CHUNK]
+            placeholders = ', '.join('?' * len(chunk))
+            for table in ('snapshots', 'pending'):
+                known.update(self.conn.execute(
+                    f"SELECT dsld_id, hash FROM {table} WHERE scope = ? AND dsld_id IN ({placeholders})",
+                    [self.scope, *chunk],
+                ))
+        return known
+
+    def diff(self, records):
+        """レコードのリストのうち追加・変更されたものを返し、今回の内容を保留分に記録する"""
+        key = self.key
+        known = self.known_hashes(list({record[key] for record in records}))
+        changed = []
+        rows = []
+        for record in records:
+            digest = content_hash(record, self.columns)
+            previous = known.get(record[key])
+            if previous is None:
+                self.inserted += 1
+                changed.append(record)
+            elif previous != digest:
+                self.updated += 1
+                changed.append(record)
+            else:
+                self.unchanged += 1
+            known[record[key]] = digest
+            rows.append((self.scope, record[key], digest, self.run))
+        self.conn.executemany("INSERT OR REPLACE INTO pending VALUES (?, ?, ?, ?)", rows)
+        return changed
+
+    def deleted_ids(self):
+        """確定済みで今回1度も現れなかった dsld_id(0件の実行では何も削除扱いにしない)"""
+        if not self.seen:
+            return
+        cursor = self.conn.execute(
+            "SELECT dsld_id FROM snapshots s WHERE scope = ?"
+            " AND NOT EXISTS (SELECT 1 FROM pending p WHERE p.scope = s.scope AND p.dsld_id = s.dsld_id)"
+            " ORDER BY dsld_id",
+            (self.scope,),
+        )
+        for (dsld_id,) in cursor:
+            self.deleted += 1
+            yield dsld_id
+
+    def stage(self, output):
+        """今回の内容を output(SQLファイル)の保留分として保存する。0件の実行は保存しない"""
+        if not self.seen:
+            self.conn.rollback()
+            return False
+        self.conn.execute(
+            "INSERT INTO pending_runs VALUES (?, ?, ?, ?)",
+            (self.scope, os.path.abspath(output), self.run, self.seen),
+        )
+        self.conn.commit()
+        return True
+
+    def rollback(self):
+        self.conn.rollback()
+
+    def close(self):
+        self.conn.close()
+
+    def report(self):
+        print(f"\n📊 変更検出 ({self.scope}):")
+        if self.stale:
+            print(f"  ⚠️ 投入されなかった前回の差分({self.stale[0]})は破棄し、確定済みの状態と比較しました")
+        print(f"  追加: {self.inserted:,}件")
+        print(f"  更新: {self.updated:,}件")
+        print(f"  削除: {self.deleted:,}件")
+        print(f"  変更なし: {self.unchanged:,}件")
+
+
+def pending_scope(conn, output):
+    row = conn.execute(
+        "SELECT scope, rows FROM pending_runs WHERE output = ?", (os.path.abspath(output),)
+    ).fetchone()
+    return row
+
+
+def apply(output, path=SNAPSHOT_PATH):
+    """output(SQLファイル)の保留分を確定済みのスナップショットにする。保留分がなければFalse"""
+    conn = connect(path)
+    try:
+        row = pending_scope(conn, output)
+        if row is None:
+            return False
+        scope, _ = row
+        with conn:
+            conn.execute("DELETE FROM snapshots WHERE scope = ?", (scope,))
+            conn.execute("INSERT INTO snapshots SELECT * FROM pending WHERE scope = ?", (scope,))
+            conn.execute("DELETE FROM pending WHERE scope = ?", (scope,))
+            conn.execute("DELETE FROM pending_runs WHERE scope = ?", (scope,))
+        return True
+    finally:
+        conn.close()
+
+
+def discard(output, path=SNAPSHOT_PATH):
+    """output(SQLファイル)の保留分を捨てる(確定済みのスナップショットはそのまま)"""
+    conn = connect(path)
+    try:
+        row = pending_scope(conn, output)
+        if row is None:
+            return False
+        with conn:
+            conn.execute("DELETE FROM pending WHERE scope = ?", (row[0],))
+            conn.execute("DELETE FROM pending_runs WHERE scope = ?", (row[0],))
+        return True
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    command, *files = sys.argv[1:] or ['status']
+    if not os.path.exists(SNAPSHOT_PATH):
+        print(f"📂 {SNAPSHOT_PATH} がありません(--snapshot を使った実行がまだありません)")
+        exit(0)
+    if command == 'status':
+        conn = connect(SNAPSHOT_PATH)
+        runs = conn.execute("SELECT scope, output, rows FROM pending_runs ORDER BY scope").fetchall()
+        conn.close()
+        print(f"📋 未投入の差分: {len(runs)}件")
+        for scope, output, rows in runs:
+            print(f"  {scope}: {output} ({rows:,}件)")
+    elif command in ('apply', 'discard') and files:
+        for output in files:
+            if (apply if command == 'apply' else discard)(output):
+                print(f"✅ {output} の差分を{'確定' if command == 'apply' else '破棄'}しました")
+            else:
+                print(f"📋 {output} に未投入の差分はありません")
+    else:
+        print("使い方: python -m ingest.snapshot [status | apply <SQLファイル>... | discard <SQLファイル>...]")
+        exit(1)
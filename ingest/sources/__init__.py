@@ -0,0 +1,9 @@
+"""
+データソースプラグイン
+
+- iherb_json: iHerb JSONダンプ
+- kaggle_csv: Kaggle iHerb CSVデータセット
+- openfoodfacts: Open Food Facts API
+- usda: USDA FoodData Central API
+- paging: 検索APIをキーワード×ページで並行巡回する共通の基底クラス
+"""
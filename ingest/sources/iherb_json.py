@@ -0,0 +1,113 @@
+"""
+iHerb JSONダンプのソース(archive.zip 内のJSONを展開せずに読み込む)
+"""
+
+from functools import partial
+from itertools import chain, islice
+
+from ..pipeline import Source
+from ..records import Product
+from ..brands import DEFAULT_BRAND_INDEX
+from ..classify import classify_category
+from ..ids import IdIndex, IHERB_NAMESPACE, identity_key
+from ..jsonstream import iter_products
+from ..schema import SAMPLE_WINDOW, detect_schema, reservoir_sample
+
+ARCHIVE_PATH = 'archive.zip'
+ARCHIVE_MEMBER = 'iherb_data_uk_data_2022_12.json'
+
+
+class IherbJsonSource(Source):
+    """
+    iHerb JSONダンプから商品を1件ずつ生成
+
+    cache(DatasetCache)を渡すと解析済みの商品を列形式で保存し、同じ入力なら次回はそこから読む。
+    キーは先頭の商品のサンプルから推定する(schema)。schema(SchemaStore)を渡すと推定結果を保存し、
+    同じ構造の入力なら次回は推定を省略する。
+    """
+
+    name = 'iherb_json'
+
+    def __init__(self, path=ARCHIVE_PATH, member=ARCHIVE_MEMBER, array_key=None, cache=None, schema=None):
+        self.path = path
+        self.member = member
+        self.array_key = array_key
+        self.cache = cache
+        self.schema = schema
+        self.name_key = None
+        self.brand_key = None
+        self.upc_key = None
+        self.category_key = None
+        self.sku_key = None
+        self.url_key = None
+        self.ids = IdIndex()
+
+    def __iter__(self):
+        target = f"{self.path}:{self.member}" if self.member else self.path
+        print(f"📂 {target} をストリーム読み込み中...")
+        products = self.products()
+
+        first = next(products, None)
+        if first is None:
+            return
+
+        # 推定に使う先頭の商品(保存済みのマッピングがあれば読み込まない)
+        window = [first]
+
+        def sample():
+            window.extend(islice(products, SAMPLE_WINDOW - 1))
+            return reservoir_sample(window)
+
+        mapping = detect_schema(self.name, first.keys(), sample, self.schema)
+        self.name_key = mapping['name']
+        self.brand_key = mapping['brand']
+        self.upc_key = mapping['upc']
+        self.category_key = mapping['category']
+        self.sku_key, self.url_key = mapping['sku'], mapping['url']
+        print(f"🔑 IDキー: SKU={self.sku_key} / URL={self.url_key}")
+
+        yield from chain(window, products)
+
+    def products(self):
+        """商品dictのストリーム(キャッシュがあればそこから)"""
+        read = partial(iter_products, self.path, self.member, self.array_key)
+        if self.cache is None:
+            return read()
+        return self.cache.records(self.cache.key('json', self.path, self.member, self.array_key), read)
+
+    def normalize(self, product, index):
+        # 商品名
+        product_name = str(product[self.name_key]) if self.name_key in product else f"iHerb Product {index+1}"
+        if len(product_name) > 250:
+            product_name = product_name[:250] + "..."
+
+        # ブランド(ブランド辞書にあれば正式名に)
+        brand = DEFAULT_BRAND_INDEX.canonical(str(product.get(self.brand_key, "Unknown")))
+        if len(brand) > 100:
+            brand = brand[:100]
+
+        # UPC/バーコード
+        upc = str(product.get(self.upc_key, ""))
+
+        # DSLD ID生成
+        if upc and upc.isdigit() and len(upc) >= 8:
+            dsld_id = f"DSLD_{upc}"
+        else:
+            dsld_id = self.stable_id(product, index)
+
+        category = classify_category(product_name, str(product.get(self.category_key, "")))
+
+        return Product(dsld_id, product_name, brand, category)
+
+    def stable_id(self, product, index):
+        """UPCがない商品のID(SKU → URL → ブランド+商品名から決定的に生成)"""
+        key = identity_key(
+            IHERB_NAMESPACE,
+            sku=product.get(self.sku_key) if self.sku_key else None,
+            url=product.get(self.url_key) if self.url_key else None,
+            brand=product.get(self.brand_key) if self.brand_key else None,
+            name=product.get(self.name_key) if self.name_key else None,
+        )
+        if key is None:
+            return f"DSLD_IHERB_{index+1:08d}"
+        return self.ids.assign('DSLD_IHERB_', key)
@@ -0,0 +1,302 @@
+"""
+Kaggle iHerb CSVデータセットのソース
+"""
+
+import os
+import zipfile
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from ..pipeline import Source
+from ..records import Product
+from ..brands import DEFAULT_BRAND_INDEX
+from ..classify import classify_category
+from ..frames import clean_text, truncate, classify_frame
+from ..ids import IdIndex, IHERB_NAMESPACE, identity_key
+from ..rowindex import index_rows
+from ..schema import detect_schema, reservoir_sample
+
+# read_csv を分割読み込みする行数
+CHUNK_ROWS = 10000
+
+POSSIBLE_FILES = [
+    'iherb-products-dataset.zip',
+    'archive.zip',
+    'iherb_products.csv',
+    'products.csv'
+]
+
+
+def print_download_instructions():
+    print("\n📥 手動ダウンロード手順:")
+    print("1. https://www.kaggle.com/datasets/crawlfeeds/iherb-products-dataset")
+    print("2. 'Download'ボタンをクリック")
+    print("3. ダウンロードしたZIPファイルをこのフォルダに保存:")
+    print(f"   {os.getcwd()}/")
+    print("4. このスクリプトを再実行")
+
+
+def select_csv_member(archive, member=None):
+    """ZIP内のCSVメンバーを選択(明示指定がなければiherbを含む名前を優先)"""
+    names = archive.namelist()
+    print(f"📋 ZIP内容: {names}")
+    if member is not None:
+        if member not in names:
+            raise FileNotFoundError(f"ZIPにメンバー {member} がありません")
+        return member
+
+    csv_members = [name for name in names if name.lower().endswith('.csv')]
+    preferred = [name for name in csv_members if 'iherb' in name.lower()]
+    candidates = preferred or csv_members
+    if not candidates:
+        raise FileNotFoundError("ZIPにCSVファイルが含まれていません")
+    return candidates[0]
+
+
+def has_csv_member(zip_file):
+    """ZIPにCSVメンバーが含まれているか"""
+    with zipfile.ZipFile(zip_file) as archive:
+        return any(name.lower().endswith('.csv') for name in archive.namelist())
+
+
+@contextmanager
+def open_csv(path, member=None):
+    """CSVファイル、またはZIP内のCSVメンバーを展開せずにバイナリストリームで開く"""
+    if not zipfile.is_zipfile(path):
+        with open(path, 'rb') as f:
+            yield f
+        return
+
+    with zipfile.ZipFile(path) as archive:
+        member = select_csv_member(archive, member)
+        info = archive.getinfo(member)
+        print(f"✅ CSVメンバー: {member} ({info.file_size/1024/1024:.1f} MB, 展開なし)")
+        with archive.open(member) as f:
+            yield f
+
+
+def find_dataset(possible_files=POSSIBLE_FILES):
+    """既知のファイル名からデータセット(ZIPまたはCSV)を探して返す"""
+    print("📂 Kaggleデータセットファイルを検索中...")
+
+    for filename in possible_files:
+        if os.path.exists(filename):
+            if filename.endswith('.zip'):
+                if not has_csv_member(filename):
+                    print(f"⚠️ {filename} にCSVファイルが含まれていないためスキップ")
+                    continue
+                print(f"✅ ZIPファイル発見: {filename}")
+            else:
+                print(f"✅ CSVファイル発見: {filename}")
+            return filename
+
+    print("❌ Kaggleデータセットが見つかりません")
+    print_download_instructions()
+    return None
+
+
+def find_latest_zip():
+    """カレントディレクトリの最新ZIPのファイル名を返す"""
+    print("🔍 新しいデータセットファイルを検索中...")
+
+    zip_files = [f for f in os.listdir('.') if f.endswith('.zip')]
+    if not zip_files:
+        print("❌ ZIPファイルが見つかりません")
+        print_download_instructions()
+        return None
+
+    latest_zip = max(zip_files, key=os.path.getmtime)
+    file_size = os.path.getsize(latest_zip)
+    print(f"📦 ZIPファイル: {latest_zip}")
+    print(f"📏 ファイルサイズ: {file_size:,} bytes ({file_size/1024/1024:.1f} MB)")
+
+    if file_size < 2 * 1024 * 1024:  # 2MB未満
+        print("⚠️ ファイルサイズが小さすぎます")
+        print("💡 実際のiHerbデータセットは数MBあるはずです")
+
+    if not has_csv_member(latest_zip):
+        print(f"❌ {latest_zip} にCSVファイルが含まれていません")
+        return None
+    return latest_zip
+
+
+def cell_text(value):
+    """セル値を文字列化(NaNは空文字)"""
+    if value is None or pd.isna(value):
+        return ""
+    text = str(value)
+    return "" if text == 'nan' else text
+
+
+class KaggleCsvSource(Source):
+    """
+    Kaggle iHerb CSV(ZIP内メンバーも可)からDataFrameのチャンクを生成
+
+    normalize_frame() でチャンク単位に整形する(frames.FrameNormalize)。
+    行単位の normalize() も同じ結果を返す。
+    商品名は name_limit 文字、ブランドは brand_limit 文字で切り詰める(None なら切り詰めない)。
+    ファイル全体を CHUNK_ROWS 行ずつ処理するので、行数が多くてもメモリは一定。
+    progress=True なら先に行数を数えて(rowindex)チャンクごとに進捗を表示する。
+    cache(DatasetCache)を渡すと解析済みのチャンクを保存し、同じ入力なら次回はそこから読む。
+    カラムは最初のチャンクのサンプルから推定する(schema)。schema(SchemaStore)を渡すと推定結果を
+    保存し、同じカラム構成の入力なら次回は推定を省略する。
+    """
+
+    name = 'kaggle_csv'
+
+    def __init__(self, csv_file, member=None, max_rows=None, name_limit=200, brand_limit=None,
+                 id_prefix='DSLD_', fallback_prefix='DSLD_IHERB_', default_brand='Unknown', progress=True,
+                 cache=None, schema=None):
+        self.csv_file = csv_file
+        self.member = member
+        self.max_rows = max_rows
+        self.progress = progress
+        self.cache = cache
+        self.schema = schema
+        self.name_limit = name_limit
+        self.brand_limit = brand_limit
+        self.id_prefix = id_prefix
+        self.fallback_prefix = fallback_prefix
+        self.default_brand = default_brand
+        self.title_col = None
+        self.brand_col = None
+        self.category_col = None
+        self.upc_col = None
+        self.sku_col = None
+        self.url_col = None
+        self.ids = IdIndex()
+
+    def read(self):
+        """CSVをDataFrameのチャンク単位で読み込み(キャッシュがあればそこから)"""
+        if self.cache is None:
+            return self.read_csv()
+        key = self.cache.key('csv', self.csv_file, self.member, self.max_rows, CHUNK_ROWS)
+        return self.cache.frames(key, self.read_csv)
+
+    def read_csv(self):
+        """CSVを解析してDataFrameのチャンク単位で読み込み"""
+        print(f"📊 {self.csv_file} を分析中...")
+        rows = 0
+        with open_csv(self.csv_file, self.member) as f:
+            index = None
+            if self.progress:
+                index = index_rows(f, every=CHUNK_ROWS)
+                f.seek(0)
+                print(f"📏 {index.rows:,}行 ({index.size / 2**20:.1f} MB)")
+            # 型はチャンクごとに推測されるので、全カラムを文字列のまま読む
+            # (空欄を含むチャンクのUPCが float になり、先頭の0も消えるのを防ぐ)
+            chunks = pd.read_csv(f, nrows=self.max_rows, chunksize=CHUNK_ROWS, encoding='utf-8',
+                                 dtype=str, keep_default_na=False)
+            for chunk in chunks:
+                rows += len(chunk)
+                if index is not None:
+                    print(f"⏳ 読み込み {index.progress(rows)}")
+                yield chunk
+        if self.max_rows and rows >= self.max_rows:
+            print(f"⚠️ 大きなファイルのため最初の{rows:,}行のみ処理")
+        print(f"✅ データ読み込み完了: {rows:,}行")
+
+    def detect(self, df):
+        def sample():
+            rows = reservoir_sample(range(len(df)))
+            columns = {col: clean_text(df.iloc[rows], col).tolist() for col in df.columns}
+            return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+        mapping = detect_schema(self.name, df.columns, sample, self.schema)
+        self.title_col = mapping['name']
+        self.brand_col = mapping['brand']
+        self.category_col = mapping['category']
+        self.upc_col = mapping['upc']
+        self.sku_col, self.url_col = mapping['sku'], mapping['url']
+        print(f"🔑 IDカラム: SKU={self.sku_col} / URL={self.url_col}")
+
+    def __iter__(self):
+        for i, df in enumerate(self.read()):
+            if i == 0:
+                self.detect(df)
+            yield df
+
+    def normalize_frame(self, df, start):
+        """チャンクをカラム演算でまとめて出力レコードのDataFrameに整形"""
+        positions = np.arange(start + 1, start + len(df) + 1)
+
+        # 商品名
+        raw_names = clean_text(df, self.title_col)
+        fallback_names = pd.Series([f"iHerb Product {i}" for i in positions], index=df.index, dtype='string')
+        names = truncate(raw_names.mask(raw_names == '', fallback_names), self.name_limit, '...')
+
+        # ブランド(ブランド辞書にあれば正式名に。同じ値は1回だけ照合する)
+        raw_brands = clean_text(df, self.brand_col)
+        brands = raw_brands.mask(raw_brands == '', self.default_brand)
+        codes, uniques = pd.factorize(brands)
+        canonical = np.array([DEFAULT_BRAND_INDEX.canonical(brand) for brand in uniques], dtype=object)
+        brands = truncate(pd.Series(canonical[codes], index=df.index, dtype='string'), self.brand_limit)
+
+        # UPC/バーコード → DSLD ID(UPCがない行だけ同一性キーから生成)
+        upcs = clean_text(df, self.upc_col)
+        valid_upc = (upcs.str.isdigit() & (upcs.str.len() >= 8)).to_numpy(bool)
+        dsld_ids = (self.id_prefix + upcs).to_numpy(object)
+        missing = np.flatnonzero(~valid_upc)
+        if len(missing):
+            skus = clean_text(df, self.sku_col).to_numpy(object)
+            urls = clean_text(df, self.url_col).to_numpy(object)
+            raw_brands = raw_brands.to_numpy(object)
+            raw_names = raw_names.to_numpy(object)
+            for i in missing:
+                dsld_ids[i] = self.stable_id(skus[i], urls[i], raw_brands[i], raw_names[i], start + i)
+
+        categories = classify_frame(names, clean_text(df, self.category_col))
+
+        return pd.DataFrame({
+            'dsld_id': dsld_ids,
+            'name_en': names.to_numpy(object),
+            'name_ja': names.to_numpy(object),  # 日本語翻訳は後で
+            'brand': brands.to_numpy(object),
+            'serving_size': '1 serving',
+            'category': categories.to_numpy(object),
+            'upc': upcs.to_numpy(object),
+        })
+
+    def normalize(self, row, index):
+        # 商品名
+        product_name = cell_text(row[self.title_col]) if self.title_col else ""
+        if not product_name:
+            product_name = f"iHerb Product {index+1}"
+        if self.name_limit and len(product_name) > self.name_limit:
+            product_name = product_name[:self.name_limit] + "..."
+
+        # ブランド(ブランド辞書にあれば正式名に)
+        brand = cell_text(row[self.brand_col]) if self.brand_col else ""
+        brand = DEFAULT_BRAND_INDEX.canonical(brand or self.default_brand)
+        if self.brand_limit and len(brand) > self.brand_limit:
+            brand = brand[:self.brand_limit]
+
+        # UPC/バーコード
+        upc = cell_text(row[self.upc_col]) if self.upc_col else ""
+
+        # DSLD ID生成
+        if upc and upc.isdigit() and len(upc) >= 8:
+            dsld_id = f"{self.id_prefix}{upc}"
+        else:
+            dsld_id = self.stable_id(
+                cell_text(row[self.sku_col]) if self.sku_col else "",
+                cell_text(row[self.url_col]) if self.url_col else "",
+                cell_text(row[self.brand_col]) if self.brand_col else "",
+                cell_text(row[self.title_col]) if self.title_col else "",
+                index,
+            )
+
+        category_text = cell_text(row[self.category_col]) if self.category_col else ""
+        category = classify_category(product_name, category_text)
+
+        # name_ja は日本語翻訳まで name_en と同じ
+        return Product(dsld_id, product_name, brand, category, upc=upc)
+
+    def stable_id(self, sku, url, brand, name, index):
+        """UPCがない商品のID(SKU → URL → ブランド+商品名から決定的に生成)"""
+        key = identity_key(IHERB_NAMESPACE, sku=sku, url=url, brand=brand, name=name)
+        if key is None:
+            return f"{self.fallback_prefix}{index+1:08d}"
+        return self.ids.assign(self.fallback_prefix, key)
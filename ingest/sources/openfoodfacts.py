@@ -0,0 +1,226 @@
+"""
+Open Food Facts APIのソース
+"""
+
+import math
+
+from ..records import Product
+from ..brands import DEFAULT_BRAND_INDEX
+from ..classify import classify_category
+from ..dedup import DedupIndex, dedup_key
+from ..ids import IdIndex, identity_key
+from ..httpclient import HttpClient
+from ..ratelimit import TokenBucket
+from .paging import MAX_WORKERS, PagedSearchSource
+
+SEARCH_URL = "https://world.openfoodfacts.org/cgi/search.pl"
+
+# 検索APIの公開レート制限(10リクエスト/分)
+SEARCH_RATE_PER_MINUTE = 10
+PAGE_SIZE = 100
+
+# ページの商品のこの割合以上が既出なら、そのキーワードの残りのページは取得しない
+REDUNDANT_PAGE_RATIO = 0.9
+
+# 主要サプリメントブランドとキーワード
+SUPPLEMENT_SEARCH_TERMS = [
+    'supplement',
+    'vitamin',
+    'NOW Foods',
+    'Nature Way',
+    'Solgar',
+    'Garden of Life',
+    'Jarrow Formulas',
+    'Life Extension',
+    'Thorne',
+    'Pure Encapsulations',
+    'Doctor Best',
+    'Bluebonnet',
+    'Country Life',
+    'Swanson',
+    'Source Naturals',
+    'Kirkland',
+    'Nature Made',
+    'Centrum',
+    'One A Day',
+    'multivitamin',
+    'omega 3',
+    'fish oil',
+    'magnesium',
+    'calcium',
+    'zinc',
+    'iron',
+    'probiotics'
+]
+
+
+def off_text(product):
+    """カテゴリ・商品名・ブランドを小文字で連結(サプリ判定用)"""
+    return ' '.join(
+        (product.get(key) or '').lower()
+        for key in ('categories', 'product_name', 'brands')
+    )
+
+
+def fetch_page(client, search_term, page, page_size=PAGE_SIZE, base_url=SEARCH_URL):
+    """検索結果の1ページ分のレスポンス(JSON)。取得できなければ FetchError"""
+    params = {
+        'search_terms': search_term,
+        'search_simple': '1',
+        'action': 'process',
+        'json': '1',
+        'page_size': page_size,
+        'page': page
+    }
+    return client.get_json(base_url, params=params)
+
+
+def last_page(data, page_size):
+    """レスポンスの総件数から最終ページ番号(不明ならNone)"""
+    try:
+        return max(1, math.ceil(int(data['count']) / page_size))
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class OpenFoodFactsSource(PagedSearchSource):
+    """
+    検索キーワードごとに全ページを巡回して商品を生成
+
+    全体のリクエスト数はトークンバケットで公開レート以下に抑える。
+    再試行しても取得できないページがあれば FetchError で中断する(途中までの結果を
+    完全なデータとして扱わない)。
+    """
+
+    name = 'openfoodfacts'
+
+    # バーコードがない商品のIDの接頭辞
+    fallback_prefix = 'DSLD_SUPP_'
+
+    def __init__(self, search_terms=SUPPLEMENT_SEARCH_TERMS, product_filter=None,
+                 max_per_term=500, rate_per_minute=SEARCH_RATE_PER_MINUTE, workers=MAX_WORKERS,
+                 page_size=PAGE_SIZE, base_url=SEARCH_URL, client=None, cache=None, checkpoint=None,
+                 shard=None, stop_when_seen=None):
+        super().__init__(search_terms, max_per_term, page_size, workers, checkpoint, shard, stop_when_seen)
+        self.product_filter = product_filter
+        # レート制限は再試行を含む全リクエストにかける
+        self.client = client or HttpClient(limiter=TokenBucket.per_minute(rate_per_minute), per_host=workers,
+                                           cache=cache)
+        self.base_url = base_url
+        self.ids = IdIndex()
+
+    @property
+    def checkpoint_source(self):
+        # 同じ検索は NOW Foods 専用ソースとも共有できるよう、ソース名ではなく検索条件で記録する
+        return f"openfoodfacts:{self.base_url}:{self.page_size}"
+
+    def fetch_page(self, search_term, page):
+        return fetch_page(self.client, search_term, page, self.page_size, self.base_url)
+
+    def page_items(self, data):
+        return data.get('products')
+
+    def last_page(self, data):
+        return last_page(data, self.page_size)
+
+    def __iter__(self):
+        seen = DedupIndex()
+        print(f"🔍 {len(self.search_terms)}個のキーワードで商品を取得中...")
+
+        for term_idx, (search_term, pages) in enumerate(self.terms(), 1):
+            print(f"\n🔍 [{term_idx}/{len(self.search_terms)}] '{search_term}' で検索中...")
+            term_count = 0
+
+            for page, products in pages:
+                if self.product_filter:
+                    products = [p for p in products if self.product_filter(p)]
+                print(f"📄 ページ {page}: {len(products)}件")
+
+                new = 0
+                for product in products:
+                    term_count += 1
+                    # 重複除去（商品コード基準、なければブランド+商品名）
+                    key = dedup_key(product.get('code'), product.get('brands'), product.get('product_name'))
+                    if seen.add(key):
+                        new += 1
+                        yield product
+
+                # 1つのキーワードで最大件数まで
+                if self.max_per_term and term_count >= self.max_per_term:
+                    break
+                if self.redundant(page, new, len(products)):
+                    break
+
+            print(f"✅ '{search_term}': {term_count}件取得")
+
+        print(f"\n🎯 重複除去後: {len(seen)}件 (重複 {seen.duplicates}件)")
+        if self.stopped_terms:
+            print(f"⏭️ 既出が多く途中で打ち切ったキーワード: {self.stopped_terms}個")
+
+    def product_name(self, product, product_id):
+        name_en = product.get('product_name_en') or product.get('product_name') or ''
+        return name_en or f"Supplement Product {product_id}"
+
+    def brand(self, product, name_en):
+        """ブランド判定(brands の各ブランド → 商品名中のブランド名の順にブランド辞書で照合)"""
+        brands = product.get('brands', '')
+        brand = DEFAULT_BRAND_INDEX.lookup(brands) or DEFAULT_BRAND_INDEX.search(name_en)
+        if brand:
+            return brand
+        if brands:
+            return brands[:50]  # 長すぎる場合は制限
+        return "Unknown"
+
+    def fallback_id(self, product, product_id):
+        """バーコードがない商品のID(URL → ブランド+商品名から決定的に生成)"""
+        key = identity_key(
+            'openfoodfacts',
+            url=product.get('url'),
+            brand=product.get('brands'),
+            name=product.get('product_name_en') or product.get('product_name'),
+        )
+        if key is None:
+            return f"{self.fallback_prefix}{product_id:08d}"
+        return self.ids.assign(self.fallback_prefix, key)
+
+    def normalize(self, product, index):
+        product_id = index + 1
+
+        name_en = self.product_name(product, product_id)
+        if len(name_en) > 200:
+            name_en = name_en[:200] + "..."
+
+        brand = self.brand(product, name_en)
+        category = classify_category(name_en, product.get('categories', ''))
+
+        # バーコード
+        barcode = product.get('code', '')
+        if barcode and barcode.isdigit():
+            dsld_id = f"DSLD_{barcode}"
+        else:
+            dsld_id = self.fallback_id(product, product_id)
+
+        # 日本語名はとりあえず英語名と同じ(name_ja は未設定なら name_en を返す)
+        return Product(dsld_id, name_en, brand, category, barcode=barcode)
+
+
+class NowFoodsSource(OpenFoodFactsSource):
+    """NOW Foodsの全商品(フィルタ・件数制限なし)"""
+
+    name = 'openfoodfacts_now_foods'
+
+    fallback_prefix = 'DSLD_NOW_'
+
+    def __init__(self, rate_per_minute=SEARCH_RATE_PER_MINUTE, **kwargs):
+        super().__init__(search_terms=['NOW Foods'], max_per_term=None, rate_per_minute=rate_per_minute,
+                         **kwargs)
+
+    def product_name(self, product, product_id):
+        name_en = product.get('product_name_en') or product.get('product_name') or ''
+        return name_en or f"NOW Foods Product {product_id}"
+
+    def brand(self, product, name_en):
+        brands = product.get('brands', '')
+        if not brands:
+            return "NOW Foods"
+        return DEFAULT_BRAND_INDEX.canonical(brands)
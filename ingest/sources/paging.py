@@ -0,0 +1,131 @@
+"""
+検索APIをキーワード×ページで巡回するソースの共通部分
+
+キーワードとページはスレッドプールで並行に取得し、商品はキーワード順・ページ順に
+生成する(重複除去の結果は逐次取得と変わらない)。1ページ目で総ページ数が分かったら
+先読み分のページを投入し、件数上限に達したキーワードの残りのページは取得しない。
+stop_when_seen を指定すると、取得したページのうちその割合以上が既出の商品だった
+キーワードも、そこで残りのページの取得をやめる(重なりの大きいキーワード向け)。
+このときは先読みをせず、前のページの重複除去が終わってから次のページを投入する
+(既出ばかりと分かるキーワードのページを先に取りに行かない)。
+"""
+
+import math
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from ..pipeline import Source
+
+MAX_WORKERS = 4
+
+
+class PagedSearchSource(Source):
+    """
+    fetch_page() / page_items() / last_page() をサブクラスで実装する
+
+    checkpoint を渡すと取得したページを記録し、記録済みのページは再取得しない。
+    shard=(i, n) ならキーワードの i 番目から n 個おきだけを巡回する(分担巡回)。
+    """
+
+    def __init__(self, search_terms, max_per_term=None, page_size=100, workers=MAX_WORKERS, checkpoint=None,
+                 shard=None, stop_when_seen=None):
+        if shard:
+            index, count = shard
+            search_terms = search_terms[index - 1::count]
+        self.search_terms = search_terms
+        self.max_per_term = max_per_term
+        self.page_size = page_size
+        self.workers = workers
+        # 1キーワードあたりの先読みページ数(件数上限があればちょうど足りる分。1ページで足りれば0)
+        if max_per_term:
+            self.lookahead = math.ceil(max_per_term / page_size) - 1
+        else:
+            self.lookahead = workers * 2
+        # 既出の割合で打ち切るなら、次のページは前のページを確かめてから取得する
+        if stop_when_seen is not None:
+            self.lookahead = min(self.lookahead, 1)
+        self.checkpoint = checkpoint
+        self.stop_when_seen = stop_when_seen
+        self.stopped_terms = 0
+
+    # チェックポイントの記録名(ページの内容を決める条件を含める)
+    @property
+    def checkpoint_source(self):
+        return f"{self.name}:{self.page_size}"
+
+    def fetch_page(self, search_term, page):
+        """1ページ分のレスポンス。取得できなければ FetchError"""
+        raise NotImplementedError
+
+    def page_items(self, data):
+        """レスポンス中の商品リスト"""
+        raise NotImplementedError
+
+    def last_page(self, data):
+        """レスポンスから最終ページ番号(不明ならNone)"""
+        return None
+
+    def redundant(self, page, new, total):
+        """このページの大半が既出なら、キーワードの残りのページは取りに行かない"""
+        if self.stop_when_seen is None or not total or (total - new) / total < self.stop_when_seen:
+            return False
+        print(f"⏭️ ページ {page}: {total - new}/{total}件が既出のため、このキーワードの残りのページを省略")
+        self.stopped_terms += 1
+        return True
+
+    def fetch(self, search_term, page):
+        if self.checkpoint is None:
+            return self.fetch_page(search_term, page)
+        return self.checkpoint.fetch(
+            self.checkpoint_source, search_term, page, lambda: self.fetch_page(search_term, page)
+        )
+
+    def plan_term(self, executor, search_term):
+        """1ページ目を取得し、総ページ数が分かったら先読み分のページを投入(stop_when_seen があれば投入しない)"""
+        first = self.fetch(search_term, 1)
+        last = self.last_page(first) if first else None
+        pending = deque()
+        if first and self.page_items(first) and self.stop_when_seen is None:
+            self.prefetch(executor, search_term, pending, 2, last)
+        return first, last, pending
+
+    def prefetch(self, executor, search_term, pending, next_page, last):
+        """先読み中のページが lookahead 件になるまで投入し、次に投入するページ番号を返す"""
+        while len(pending) < self.lookahead and (last is None or next_page <= last):
+            pending.append((next_page, executor.submit(self.fetch, search_term, next_page)))
+            next_page += 1
+        return next_page
+
+    def term_pages(self, executor, search_term, planned):
+        """1キーワード分の (ページ番号, 商品リスト) を順番に生成"""
+        first, last, pending = planned.result()
+        next_page = pending[-1][0] + 1 if pending else 2
+        page, data = 1, first
+        try:
+            while data and self.page_items(data):
+                yield page, self.page_items(data)
+                next_page = self.prefetch(executor, search_term, pending, next_page, last)
+                if not pending:
+                    return
+                page, future = pending.popleft()
+                data = future.result()
+        finally:
+            # 件数上限に達した・途中で止めた場合、未着手のページは取得しない
+            for _, future in pending:
+                future.cancel()
+
+    def terms(self):
+        """(キーワード, ページの生成器) を順番に生成"""
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            # 全キーワードの1ページ目を先に投入しておく
+            planned = [executor.submit(self.plan_term, executor, term) for term in self.search_terms]
+            for search_term, plan in zip(self.search_terms, planned):
+                pages = self.term_pages(executor, search_term, plan)
+                try:
+                    yield search_term, pages
+                finally:
+                    pages.close()
+        finally:
+            # エラーで中断したときに、残りのページを取りに行かない
+            executor.shutdown(wait=True, cancel_futures=True)
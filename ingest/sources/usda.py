@@ -0,0 +1,161 @@
+"""
+USDA FoodData Central APIのソース
+"""
+
+import os
+
+from ..records import Product
+from ..brands import DEFAULT_BRAND_INDEX
+from ..classify import classify_category
+from ..httpclient import HttpClient
+from ..ratelimit import TokenBucket
+from .paging import MAX_WORKERS, PagedSearchSource
+
+# USDA FoodData Central API設定
+# APIキーは環境変数 FDC_API_KEY(または --api-key=)で指定。なければ無料の DEMO_KEY
+DEMO_KEY = "DEMO_KEY"
+API_KEY = DEMO_KEY
+API_KEY_ENV = "FDC_API_KEY"
+BASE_URL = "https://api.nal.usda.gov/fdc/v1"
+
+# 1ページの最大件数(APIの上限)
+PAGE_SIZE = 200
+
+# APIキーごとのレート制限(DEMO_KEYはIPあたり30リクエスト/時・50リクエスト/日)
+API_RATE_PER_HOUR = 1000
+DEMO_KEY_RATE_PER_HOUR = 30
+
+# DEMO_KEY での1キーワードあたりの件数上限(1ページ分 = 全キーワードで10リクエスト)
+DEMO_KEY_MAX_PER_TERM = PAGE_SIZE
+
+# normalize() で使うフィールドだけを保持する
+FIELDS = ("fdcId", "description", "brandOwner", "brandName", "gtinUpc", "dataType")
+
+# 主要なサプリメント検索キーワード
+SEARCH_TERMS = [
+    "NOW Foods",
+    "Nature's Way",
+    "Solgar",
+    "Garden of Life",
+    "Jarrow Formulas",
+    "vitamin C",
+    "vitamin D",
+    "magnesium",
+    "omega 3",
+    "multivitamin"
+]
+
+
+def search_page(client, query, page=1, page_size=PAGE_SIZE, api_key=API_KEY):
+    """
+    検索結果の1ページ分(取得できなければ FetchError)
+
+    商品は FIELDS だけに絞って返す(栄養成分の配列などは持ち回らない)。
+    """
+    url = f"{BASE_URL}/foods/search"
+    params = {
+        "api_key": api_key,
+        "query": query,
+        "dataType": ["Branded"],  # ブランド商品のみ
+        "pageSize": page_size,
+        "pageNumber": page
+    }
+    data = client.get_json(url, params=params)
+    return {
+        "totalHits": data.get("totalHits"),
+        "totalPages": data.get("totalPages"),
+        "foods": [{key: food[key] for key in FIELDS if key in food} for food in data.get("foods") or []],
+    }
+
+
+def default_api_key():
+    """環境変数 FDC_API_KEY のAPIキー(なければ DEMO_KEY)"""
+    return os.environ.get(API_KEY_ENV) or DEMO_KEY
+
+
+class UsdaSource(PagedSearchSource):
+    """
+    複数キーワードの検索結果を全ページ巡回し、fdcIdで重複除去しながら生成
+
+    ページはスレッドプールで並行に取得し、全体のリクエスト数はAPIキーの
+    レート制限以下に抑える。max_per_term を指定すると1キーワードあたりの件数を制限する。
+    api_key を省略すると FDC_API_KEY、それもなければ DEMO_KEY を使う。DEMO_KEY では
+    全ページの巡回に何時間もかかる(途中で1日の上限にも達する)ので、max_per_term の
+    省略時は1キーワード1ページ(DEMO_KEY_MAX_PER_TERM)に抑える。
+    """
+
+    name = 'usda'
+
+    def __init__(self, search_terms=SEARCH_TERMS, max_per_term=None, page_size=PAGE_SIZE, api_key=None,
+                 workers=MAX_WORKERS, rate_per_hour=None, client=None, cache=None, checkpoint=None, shard=None,
+                 stop_when_seen=None):
+        api_key = api_key or default_api_key()
+        self.demo = api_key == DEMO_KEY
+        if self.demo and max_per_term is None:
+            max_per_term = DEMO_KEY_MAX_PER_TERM
+        super().__init__(search_terms, max_per_term, page_size, workers, checkpoint, shard, stop_when_seen)
+        self.api_key = api_key
+        if rate_per_hour is None:
+            rate_per_hour = DEMO_KEY_RATE_PER_HOUR if self.demo else API_RATE_PER_HOUR
+        # 並列数分(DEMO_KEYは1時間の上限分)だけ続けて投げられるようにし、それ以降は時間あたりのレートで補充
+        capacity = max(workers, DEMO_KEY_RATE_PER_HOUR) if self.demo else workers
+        limiter = TokenBucket(rate_per_hour / 3600, capacity=capacity)
+        self.client = client or HttpClient(limiter=limiter, per_host=workers, cache=cache)
+
+    def fetch_page(self, search_term, page):
+        return search_page(self.client, search_term, page, self.page_size, self.api_key)
+
+    def page_items(self, data):
+        return data.get("foods")
+
+    def last_page(self, data):
+        return data.get("totalPages")
+
+    def __iter__(self):
+        seen = set()
+        total = 0
+        if self.demo:
+            print(f"⚠️ DEMO_KEY は{DEMO_KEY_RATE_PER_HOUR}リクエスト/時に制限されるため、1キーワード"
+                  f"{self.max_per_term}件までにします(全件取得には {API_KEY_ENV} または --api-key= でAPIキーを指定)")
+        for term, pages in self.terms():
+            print(f"🔍 検索中: {term}")
+            term_count = 0
+            for page, supplements in pages:
+                term_count += len(supplements)
+
+                # 重複除去（fdcId基準）
+                new = 0
+                for supp in supplements:
+                    fdc_id = supp.get("fdcId")
+                    if fdc_id and fdc_id not in seen:
+                        seen.add(fdc_id)
+                        new += 1
+                        yield supp
+
+                if self.max_per_term and term_count >= self.max_per_term:
+                    break
+                if self.redundant(page, new, len(supplements)):
+                    break
+            print(f"✅ {term}: {term_count}件取得")
+            total += term_count
+
+        print(f"📊 総件数: {total}件")
+        print(f"📊 重複除去後: {len(seen)}件")
+
+    def normalize(self, supplement, index):
+        brand_owner = supplement.get("brandOwner", "")
+        brand_name = supplement.get("brandName", "")
+        description = supplement.get("description", "")
+
+        # ブランド名の決定(ブランド名 → 販売元の順にブランド辞書で照合)
+        brand = (DEFAULT_BRAND_INDEX.lookup(brand_name) or DEFAULT_BRAND_INDEX.lookup(brand_owner)
+                 or brand_owner or brand_name or "Unknown")
+
+        # name_ja は後で翻訳可能(それまでは name_en と同じ)
+        return Product(
+            f"USDA_{supplement.get('fdcId')}", description, brand, classify_category(description),
+            upc=supplement.get("gtinUpc", ""),
+            fdc_id=supplement.get("fdcId"),
+            brand_owner=brand_owner,
+            data_type=supplement.get("dataType"),
+        )
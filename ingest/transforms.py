@@ -0,0 +1,108 @@
+"""
+共通Transformステージ
+"""
+
+from .pipeline import Transform
+from .brands import DEFAULT_BRAND_INDEX
+from .keywords import SUPPLEMENT_KEYWORDS
+from .matcher import get_matcher
+
+
+def product_text(product):
+    """全ての文字列フィールドを小文字で連結(サプリ判定用)"""
+    return ' '.join(value.lower() for value in product.values() if isinstance(value, str))
+
+
+class SupplementFilter(Transform):
+    """キーワードを含む商品だけを通す"""
+
+    def __init__(self, keywords=SUPPLEMENT_KEYWORDS, text=product_text):
+        self.matcher = get_matcher(keywords)
+        self.text = text
+
+    def matches(self, product):
+        return self.matcher.search(self.text(product))
+
+    def apply(self, product):
+        return product if self.matches(product) else None
+
+
+class Normalize(Transform):
+    """Sourceの normalize() で生データを出力レコードに整形"""
+
+    def __init__(self, source):
+        self.source = source
+
+    def __call__(self, products):
+        for i, product in enumerate(products):
+            try:
+                record = self.source.normalize(product, i)
+            except Exception as e:
+                print(f"⚠️ 商品 {i} 処理エラー: {e}")
+                continue
+            if record is not None:
+                yield record
+
+
+class Tap(Transform):
+    """通過するデータをそのまま別のSinkにも書き出す"""
+
+    def __init__(self, sink):
+        self.sink = sink
+
+    def __call__(self, records):
+        self.sink.open()
+        try:
+            for record in records:
+                self.sink.write(record)
+                yield record
+            self.sink.finish()
+        finally:
+            self.sink.close()
+
+
+class BrandStats(Transform):
+    """ブランド・カテゴリの件数を集計し、最後に表示(ブランド辞書にないブランドも報告)"""
+
+    def __init__(self, top=20, brand_index=DEFAULT_BRAND_INDEX):
+        self.top = top
+        self.brand_index = brand_index
+        self.brands = {}
+        self.categories = {}
+
+    def apply(self, record):
+        brand = record['brand']
+        category = record['category']
+        self.brands[brand] = self.brands.get(brand, 0) + 1
+        self.categories[category] = self.categories.get(category, 0) + 1
+        return record
+
+    def merge(self, brands, categories):
+        """別プロセスで集計した件数を加算"""
+        for brand, count in brands.items():
+            self.brands[brand] = self.brands.get(brand, 0) + count
+        for category, count in categories.items():
+            self.categories[category] = self.categories.get(category, 0) + count
+
+    def __call__(self, records):
+        yield from super().__call__(records)
+        self.report()
+
+    def report(self):
+        print(f"\n📊 トップブランド:")
+        for brand, count in sorted(self.brands.items(), key=lambda x: x[1], reverse=True)[:self.top]:
+            print(f"  {brand}: {count:,}件")
+
+        unmatched = sorted(
+            ((brand, count) for brand, count in self.brands.items() if not self.brand_index.is_known(brand)),
+            key=lambda x: x[1], reverse=True,
+        )
+        if unmatched:
+            print(f"\n⚠️ ブランド辞書にないブランド: {len(unmatched):,}種類 / "
+                  f"{sum(count for _, count in unmatched):,}件 (ingest/brands.py の BRAND_ALIASES に追加できます)")
+            for brand, count in unmatched[:self.top]:
+                print(f"  {brand}: {count:,}件")
+
+        print(f"\n📊 カテゴリ別統計:")
+        for cat, count in sorted(self.categories.items(), key=lambda x: x[1], reverse=True):
+            print(f"  {cat}: {count:,}件")
@@ -0,0 +1,21 @@
+import pytest
+
+from ingest.brands import BrandIndex
+
+
+@pytest.mark.parametrize('name', ['Snow Foods', 'Know Foods', 'Snow Food', 'Wow Foods', 'Snow Foods Inc'])
+def test_short_leading_word_near_miss_is_not_matched(name):
+    assert BrandIndex().match(name) == (None, 'unmatched')
+
+
+@pytest.mark.parametrize('name, expected, how', [
+    ('NOW Foods', 'NOW Foods', 'exact'),
+    ('now', 'NOW Foods', 'exact'),
+    ('NOW Foods Inc', 'NOW Foods', 'prefix'),
+    ('Now Foodz', 'NOW Foods', 'fuzzy'),
+    ('Solgarr', 'Solgar', 'fuzzy'),
+    ('Jarow Formulas', 'Jarrow Formulas', 'fuzzy'),
+    ('Sourse Naturals', 'Source Naturals', 'fuzzy'),
+])
+def test_known_brands_and_typos_still_match(name, expected, how):
+    assert BrandIndex().match(name) == (expected, how)
@@ -0,0 +1,29 @@
+from ingest.cli import crawl_checkpoint
+from ingest.sources.openfoodfacts import NowFoodsSource, OpenFoodFactsSource
+from ingest.sources.usda import UsdaSource
+
+
+def test_each_source_has_its_own_default_checkpoint(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    checkpoints = [crawl_checkpoint(source.name, ['--resume'])
+                   for source in (UsdaSource, OpenFoodFactsSource, NowFoodsSource)]
+    try:
+        assert len({checkpoint.path for checkpoint in checkpoints}) == 3
+        checkpoints[0].record('usda', 'vitamin C', 1, {'foods': []})
+        checkpoints[1].record('openfoodfacts', 'vitamin', 1, {'products': []})
+        checkpoints[0].discard()
+
+        # 別のスクリプトの巡回完了で、途中の記録が消えない
+        assert ('openfoodfacts', 'vitamin', 1) in checkpoints[1]
+        assert (tmp_path / checkpoints[1].path).exists()
+    finally:
+        for checkpoint in checkpoints:
+            checkpoint.close()
+
+
+def test_resume_with_explicit_path(tmp_path):
+    path = str(tmp_path / 'mine.jsonl')
+    checkpoint = crawl_checkpoint('usda', [f'--resume={path}'])
+    checkpoint.close()
+    assert checkpoint.path == path
+    assert crawl_checkpoint('usda', []) is None
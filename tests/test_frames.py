@@ -0,0 +1,54 @@
+import pandas as pd
+import pytest
+
+from ingest import frames
+from ingest.frames import FrameSupplementFilter, supplement_mask
+
+
+def legacy_mask(df, keywords):
+    mask = pd.Series(False, index=df.index)
+    for col in df.columns:
+        for keyword in keywords:
+            mask |= df[col].astype(str).str.lower().str.contains(keyword, na=False, regex=False)
+    return mask
+
+
+@pytest.fixture(params=['pyarrow', 'pandas'])
+def engine(request, monkeypatch):
+    if request.param == 'pandas':
+        monkeypatch.setattr(frames, 'pa', None)
+    return request.param
+
+
+def test_mask_matches_per_column_loop(engine):
+    df = pd.DataFrame({
+        'name': ['Vitamin C 1000mg', 'Chocolate Bar', None, 'ビタミン MAGNESIUM', 'Snack (now-food)'],
+        'brand': ['NOW Foods', 'Hershey', 'Solgar', '', None],
+        'category': ['Supplements', 'Snacks', 'Omega-3 Fish Oil', 'Minerals', 'Food'],
+    }, index=[10, 11, 12, 13, 14])
+    keywords = ['vitamin', 'omega', 'magnesium', 'now-food', 'fish oil']
+
+    mask = supplement_mask(df, keywords)
+
+    assert mask.index.equals(df.index)
+    assert mask.tolist() == legacy_mask(df, keywords).tolist() == [True, False, True, True, True]
+
+
+def test_keywords_do_not_match_across_columns(engine):
+    df = pd.DataFrame({'name': ['Fish'], 'category': ['Oil']})
+
+    assert supplement_mask(df, ['fish oil', 'fishoil']).tolist() == [False]
+
+
+def test_regex_characters_are_literal(engine):
+    df = pd.DataFrame({'name': ['Vitamin C+E', 'Vitamin CE', 'Omega.3']})
+
+    assert supplement_mask(df, ['c+e', 'omega.3']).tolist() == [True, False, True]
+
+
+def test_filter_keeps_matching_rows(engine):
+    df = pd.DataFrame({'name': ['NOW Foods Zinc', 'Other'], 'upc': ['1', '2']})
+    stage = FrameSupplementFilter(['now food'])
+
+    assert stage.apply(df)['name'].tolist() == ['NOW Foods Zinc']
+    assert stage.matched == 1 and stage.rows == 2
@@ -0,0 +1,44 @@
+import io
+import json
+
+import pytest
+
+from ingest.jsonstream import _Reader
+
+DOCUMENT = {
+    'prices': [2.75, -1.5e3, 10, 0.125, 1e-2],
+    'flags': [True, False, None],
+    'products': [{'name': 'Fish Oil', 'price': 12.99, 'count': 120}, {'name': 'Zinc', 'price': 7}],
+}
+
+
+def reader(text, chunk_size):
+    return _Reader(io.StringIO(text), chunk_size=chunk_size)
+
+
+@pytest.mark.parametrize('chunk_size', range(1, 12))
+def test_numbers_split_across_chunks(chunk_size):
+    values = DOCUMENT['prices'] + DOCUMENT['flags']
+    text = json.dumps(values)
+    assert list(reader(text, chunk_size).iter_array()) == values
+
+
+@pytest.mark.parametrize('chunk_size', range(1, 12))
+def test_object_with_numeric_arrays_split_across_chunks(chunk_size):
+    text = json.dumps(DOCUMENT)
+    counts = {}
+    r = reader(text, chunk_size)
+    for key in r.iter_object():
+        counts[key] = r.count_array()
+    assert counts == {key: len(value) for key, value in DOCUMENT.items()}
+
+    r = reader(text, chunk_size)
+    for key in r.iter_object():
+        if key == 'products':
+            assert list(r.iter_array()) == DOCUMENT['products']
+        else:
+            r.skip()
+
+
+def test_number_at_end_of_input():
+    assert reader('42', 1).decode() == 42
@@ -0,0 +1,60 @@
+import csv
+
+from ingest.frames import FrameNormalize
+from ingest.sources import kaggle_csv
+from ingest.sources.kaggle_csv import KaggleCsvSource
+
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Product Name', 'Brand', 'UPC', 'Category'])
+        writer.writerows(rows)
+
+
+def normalized(path):
+    source = KaggleCsvSource(str(path), progress=False)
+    stage = FrameNormalize(source)
+    return [record for df in source for record in stage.apply(df).to_dict('records')]
+
+
+def test_blank_upc_does_not_change_other_ids_in_chunk(tmp_path, monkeypatch):
+    monkeypatch.setattr(kaggle_csv, 'CHUNK_ROWS', 2)
+    path = tmp_path / 'products.csv'
+    write_csv(path, [
+        ['Vitamin C 1000 mg', 'NOW Foods', '733739016812', 'Vitamins'],
+        ['Fish Oil', 'NOW Foods', '733739016829', 'Supplements'],
+        # 2つ目のチャンク: 空欄のUPCと先頭が0のUPC
+        ['Zinc Picolinate', 'Thorne', '', 'Minerals'],
+        ['Magnesium', 'Solgar', '033984017590', 'Minerals'],
+    ])
+
+    records = normalized(path)
+
+    assert [record['dsld_id'] for record in records[:2]] == ['DSLD_733739016812', 'DSLD_733739016829']
+    assert records[2]['dsld_id'].startswith('DSLD_IHERB_')
+    assert records[2]['upc'] == ''
+    assert records[3]['dsld_id'] == 'DSLD_033984017590'
+    assert records[3]['upc'] == '033984017590'
+
+
+def test_id_does_not_depend_on_neighbouring_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(kaggle_csv, 'CHUNK_ROWS', 2)
+    alone = tmp_path / 'alone.csv'
+    mixed = tmp_path / 'mixed.csv'
+    write_csv(alone, [['Magnesium', 'Solgar', '033984017590', 'Minerals']])
+    write_csv(mixed, [['Zinc', 'Thorne', '', 'Minerals'], ['Magnesium', 'Solgar', '033984017590', 'Minerals']])
+
+    assert normalized(alone)[0]['dsld_id'] == normalized(mixed)[1]['dsld_id']
+
+
+def test_name_limit_none_keeps_full_names(tmp_path):
+    path = tmp_path / 'products.csv'
+    name = 'NOW Foods Vitamin C ' + 'x' * 300
+    write_csv(path, [[name, 'NOW Foods', '733739016812', 'Vitamins']])
+    source = KaggleCsvSource(str(path), name_limit=None, progress=False)
+    stage = FrameNormalize(source)
+    chunk = next(iter(source))
+
+    assert stage.apply(chunk).to_dict('records')[0]['name_en'] == name
+    assert source.normalize(chunk.iloc[0], 0)['name_en'] == name
@@ -0,0 +1,38 @@
+import os
+import subprocess
+import sys
+
+from ingest.neardup import MinHashLSH, NearDuplicates, TokenHashes, number_mask
+
+# 数値以外の単語が10語同じ(1語違ってもJaccard係数は 10/12 ≥ 0.8)
+NAME = "Vitamin C {} mg Buffered With Rose Hips Bioflavonoids Veg Capsules Daily Immune Support"
+
+
+def find(names):
+    finder = NearDuplicates(MinHashLSH())
+    for source, name in enumerate(names):
+        finder.add(name, 'NOW Foods', source=f'source{source}')
+    return list(finder.find())
+
+
+def test_number_mask_is_stable_across_hash_seeds():
+    code = "from ingest.neardup import TokenHashes, number_mask; print(number_mask(('60', '500', '1000'), TokenHashes()))"
+    masks = {
+        subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                       env={**os.environ, 'PYTHONHASHSEED': seed}).stdout
+        for seed in ('0', '1', '2')
+    }
+    assert len(masks) == 1
+
+
+def test_numbers_sharing_a_mask_bit_are_not_merged():
+    hash_token = TokenHashes()
+    # 500 と 60 はマスクの同じビットになる
+    assert number_mask(('500',), hash_token) == number_mask(('60',), hash_token)
+
+    assert find([NAME.format(500), NAME.format(60)]) == [0, 1]
+
+
+def test_same_numbers_and_contained_numbers_are_merged():
+    assert find([NAME.format(500), NAME.format(500)]) == [0, 0]
+    assert find([NAME.format(500), NAME.format('500 250')]) == [0, 0]
@@ -0,0 +1,93 @@
+import copy
+
+import pytest
+
+from ingest.classify import DEFAULT_CLASSIFIER
+from ingest.parallel import ParallelNormalize, _init_worker, normalize_chunk
+from ingest.sources.iherb_json import IherbJsonSource
+from ingest.transforms import Normalize, SupplementFilter
+
+
+def make_source():
+    source = IherbJsonSource('unused.json')
+    source.name_key, source.brand_key, source.upc_key = 'name', 'brand', 'upc'
+    source.category_key, source.sku_key, source.url_key = 'category', 'sku', None
+    return source
+
+
+def make_products(count=60):
+    products = []
+    for i in range(count):
+        product = {'brand': 'NOW Foods', 'category': 'Supplements'}
+        if i % 3:
+            # フィルタで落ちる商品
+            product.update(name=f'Chocolate Bar {i}', brand='Hershey', category='Snacks')
+        elif i % 2:
+            # 名前も識別子もない商品(位置からの名前・ID)
+            product['category'] = 'Vitamin'
+        else:
+            product.update(name=f'Vitamin C {i} mg', sku=f'SKU-{i}')
+        products.append(product)
+    return products
+
+
+def serial(products):
+    source = make_source()
+    return [dict(record) for record in Normalize(source)(SupplementFilter()(products))]
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_parallel_output_matches_serial(workers):
+    products = make_products()
+    expected = serial(products)
+
+    stage = ParallelNormalize(make_source(), SupplementFilter(), workers=workers, chunk_size=7)
+    records = [dict(record) for record in stage(products)]
+
+    assert records == expected
+    assert 'iHerb Product 2' in {record['name_en'] for record in records}
+    assert 'DSLD_IHERB_00000002' in {record['dsld_id'] for record in records}
+
+
+def test_classifier_hits_are_merged_from_workers():
+    products = make_products()
+    DEFAULT_CLASSIFIER.reset()
+    serial(products)
+    expected = DEFAULT_CLASSIFIER.hit_counts()
+
+    DEFAULT_CLASSIFIER.reset()
+    list(ParallelNormalize(make_source(), SupplementFilter(), workers=2, chunk_size=7)(products))
+
+    assert DEFAULT_CLASSIFIER.hit_counts() == expected
+
+
+def test_worker_ids_are_checked_against_the_parent_index(monkeypatch):
+    parent = make_source()
+    monkeypatch.setattr('ingest.parallel._worker', {})
+    _init_worker(copy.deepcopy(parent), None)
+    products = [{'name': 'Vitamin C', 'brand': 'NOW Foods', 'sku': 'A'}]
+    result = normalize_chunk(products)
+    worker_id = result.records[0]['dsld_id']
+
+    # 別のワーカーが同じIDを先に別の商品に発行していた
+    parent.ids.owners[worker_id] = 'OTHER'
+    records = ParallelNormalize(parent, workers=2).merge(result, 0)
+
+    assert records[0]['dsld_id'] != worker_id
+    assert records[0]['dsld_id'].startswith(worker_id)
+    assert parent.ids.collisions == 1
+
+
+def test_positional_fallbacks_are_filled_in_by_the_parent(monkeypatch):
+    monkeypatch.setattr('ingest.parallel._worker', {})
+    _init_worker(make_source(), SupplementFilter())
+    products = [{'name': 'Vitamin C', 'sku': 'A'}, {'name': 'Chocolate'}, {'category': 'Vitamin'}]
+    result = normalize_chunk(products)
+
+    # 名前もIDもない商品だけが親プロセスに回る
+    assert result.count == 2
+    assert [(position, offset) for position, offset, _ in result.deferred] == [(1, 1)]
+
+    records = ParallelNormalize(make_source(), workers=2).merge(result, 40)
+    assert [record['name_en'] for record in records] == ['Vitamin C', 'iHerb Product 42']
+    assert records[1]['dsld_id'] == 'DSLD_IHERB_00000042'
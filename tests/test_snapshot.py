@@ -0,0 +1,55 @@
+from ingest import snapshot
+from ingest.sinks import SqlInsertSink, SUPPLEMENT_COLUMNS
+
+
+def record(dsld_id, name):
+    return dict(zip(SUPPLEMENT_COLUMNS, (dsld_id, name, name, 'NOW Foods', '1 serving', 'vitamins')))
+
+
+def generate(tmp_path, records):
+    path = str(tmp_path / 'import_test.sql')
+    sink = SqlInsertSink(path, 'test', mode='upsert', snapshot=str(tmp_path / 'snapshot.sqlite'))
+    sink.open()
+    for item in records:
+        sink.write(item)
+    sink.finish()
+    sink.close()
+    with open(path, encoding='utf-8') as f:
+        return path, f.read()
+
+
+def test_snapshot_tombstones_only_touch_own_source(tmp_path):
+    path, _ = generate(tmp_path, [record('DSLD_1', 'A'), record('DSLD_2', 'B')])
+    snapshot.apply(path, str(tmp_path / 'snapshot.sqlite'))
+    _, sql = generate(tmp_path, [record('DSLD_1', 'A')])
+    update = sql[sql.index('UPDATE supplements SET discontinued_at'):]
+    assert "WHERE import_source = 'import_test'" in update.split(';')[0]
+    assert "'DSLD_2'" in update.split(';')[0]
+
+
+def test_deletions_survive_until_the_sql_is_applied(tmp_path):
+    database = str(tmp_path / 'snapshot.sqlite')
+    path, _ = generate(tmp_path, [record('DSLD_1', 'A'), record('DSLD_2', 'B')])
+    assert snapshot.apply(path, database)
+
+    # 生成したが投入しなかった実行
+    _, sql = generate(tmp_path, [record('DSLD_1', 'A')])
+    assert "'DSLD_2'" in sql
+
+    # 次の実行でも削除が検出され、変更のない行は出力されない
+    path, sql = generate(tmp_path, [record('DSLD_1', 'A')])
+    assert "'DSLD_2'" in sql
+    assert "('DSLD_1'" not in sql
+    assert snapshot.apply(path, database)
+
+    _, sql = generate(tmp_path, [record('DSLD_1', 'A')])
+    assert "'DSLD_2'" not in sql
+
+
+def test_discard_keeps_committed_snapshot(tmp_path):
+    database = str(tmp_path / 'snapshot.sqlite')
+    path, _ = generate(tmp_path, [record('DSLD_1', 'A')])
+    assert snapshot.discard(path, database)
+    assert not snapshot.apply(path, database)
+    _, sql = generate(tmp_path, [record('DSLD_1', 'A')])
+    assert "('DSLD_1'" in sql
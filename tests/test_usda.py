@@ -0,0 +1,67 @@
+from ingest.sources.usda import UsdaSource, SEARCH_TERMS, PAGE_SIZE
+
+
+class FakeClient:
+    """全キーワードに5ページ分の結果を返し、リクエストを記録する"""
+
+    def __init__(self):
+        self.requests = []
+
+    def get_json(self, url, params=None):
+        self.requests.append((params['query'], params['pageNumber'], params['api_key']))
+        page = params['pageNumber']
+        foods = [{'fdcId': f"{params['query']}-{page}-{i}", 'description': 'Vitamin C'} for i in range(PAGE_SIZE)]
+        return {'totalHits': 5 * PAGE_SIZE, 'totalPages': 5, 'foods': foods}
+
+
+def test_demo_key_fetches_one_page_per_term(monkeypatch):
+    monkeypatch.delenv('FDC_API_KEY', raising=False)
+    client = FakeClient()
+
+    items = list(UsdaSource(client=client))
+
+    assert len(client.requests) == len(SEARCH_TERMS)
+    assert {page for _, page, _ in client.requests} == {1}
+    assert {key for _, _, key in client.requests} == {'DEMO_KEY'}
+    assert len(items) == len(SEARCH_TERMS) * PAGE_SIZE
+
+
+def test_api_key_from_environment_fetches_all_pages(monkeypatch):
+    monkeypatch.setenv('FDC_API_KEY', 'secret')
+    client = FakeClient()
+
+    list(UsdaSource(search_terms=['NOW Foods'], client=client))
+
+    assert sorted(page for _, page, _ in client.requests) == [1, 2, 3, 4, 5]
+    assert {key for _, _, key in client.requests} == {'secret'}
+
+
+def test_explicit_api_key_overrides_environment(monkeypatch):
+    monkeypatch.setenv('FDC_API_KEY', 'secret')
+    client = FakeClient()
+
+    list(UsdaSource(search_terms=['NOW Foods'], api_key='other', max_per_term=PAGE_SIZE, client=client))
+
+    assert client.requests == [('NOW Foods', 1, 'other')]
+
+
+class OverlapClient(FakeClient):
+    """どのキーワードも同じ商品を返す"""
+
+    def get_json(self, url, params=None):
+        self.requests.append((params['query'], params['pageNumber'], params['api_key']))
+        page = params['pageNumber']
+        foods = [{'fdcId': f"{page}-{i}", 'description': 'Vitamin C'} for i in range(PAGE_SIZE)]
+        return {'totalHits': 5 * PAGE_SIZE, 'totalPages': 5, 'foods': foods}
+
+
+def test_stop_when_seen_does_not_prefetch_redundant_pages():
+    client = OverlapClient()
+
+    items = list(UsdaSource(search_terms=['vitamin', 'supplement'], api_key='secret', client=client,
+                            stop_when_seen=0.5))
+
+    assert len(items) == 5 * PAGE_SIZE
+    assert sorted(page for term, page, _ in client.requests if term == 'vitamin') == [1, 2, 3, 4, 5]
+    # 2つ目のキーワードは1ページ目で既出ばかりと分かるので、2ページ目以降は取りに行かない
+    assert [page for term, page, _ in client.requests if term == 'supplement'] == [1]